@@ -19,6 +19,52 @@ ALLOWED_HOSTS = []
 # Football API Key for external service
 FOOTBALL_API_KEY = os.getenv('FOOTBALL_API_KEY')
 
+# Football API location; point it at `manage.py run_standin_api` to work offline
+FOOTBALL_API_BASE_URL = os.getenv('FOOTBALL_API_BASE_URL', 'https://api-football-v1.p.rapidapi.com/v3')
+
+# 'live' talks to the API, 'record' also saves every response to FOOTBALL_API_RECORDINGS_DIR,
+# 'replay' serves the saved responses without any network access
+FOOTBALL_API_MODE = os.getenv('FOOTBALL_API_MODE', 'live')
+FOOTBALL_API_RECORDINGS_DIR = Path(os.getenv('FOOTBALL_API_RECORDINGS_DIR', BASE_DIR / 'recordings'))
+
+# Every API response is appended to gzip-compressed NDJSON segments here, partitioned by endpoint and
+# fetch date, so `manage.py reingest` can rebuild the tables without API calls. Set it empty to disable.
+FOOTBALL_API_ARCHIVE_DIR = os.getenv('FOOTBALL_API_ARCHIVE_DIR', str(BASE_DIR / 'archive')) or None
+FOOTBALL_API_ARCHIVE_SEGMENT_BYTES = 64 * 1024 * 1024
+
+# Each update run writes a JSON report (phase times, API latencies, cache hits, rows written, DB time,
+# quota left) under FOOTBALL_TELEMETRY_DIR/<date>/; the latest ones are served at /metrics/ for Prometheus.
+# Set it empty to disable.
+FOOTBALL_TELEMETRY_DIR = os.getenv('FOOTBALL_TELEMETRY_DIR', str(BASE_DIR / 'telemetry')) or None
+
+# Football API HTTP client: size of the keep-alive connection pool and request timeout (seconds)
+FOOTBALL_API_POOL_SIZE = int(os.getenv('FOOTBALL_API_POOL_SIZE', '10'))
+FOOTBALL_API_TIMEOUT = int(os.getenv('FOOTBALL_API_TIMEOUT', '30'))
+
+# Football API rate limit and how many requests the updater may have in flight at once
+FOOTBALL_API_REQUESTS_PER_MINUTE = int(os.getenv('FOOTBALL_API_REQUESTS_PER_MINUTE', '30'))
+FOOTBALL_API_BURST = int(os.getenv('FOOTBALL_API_BURST', '5'))
+FOOTBALL_API_MAX_CONCURRENCY = int(os.getenv('FOOTBALL_API_MAX_CONCURRENCY', '4'))
+
+# Team refresh pipeline: fetched teams waiting for the database writer, and teams written per batch
+FOOTBALL_PIPELINE_QUEUE_SIZE = int(os.getenv('FOOTBALL_PIPELINE_QUEUE_SIZE', '8'))
+FOOTBALL_PIPELINE_BATCH_SIZE = int(os.getenv('FOOTBALL_PIPELINE_BATCH_SIZE', '5'))
+
+# Daily request quota of the API plan, and how many requests to keep in reserve.
+# The token bucket and quota ledger are shared by every process through this file.
+FOOTBALL_API_DAILY_LIMIT = int(os.getenv('FOOTBALL_API_DAILY_LIMIT', '100'))
+FOOTBALL_API_QUOTA_RESERVE = int(os.getenv('FOOTBALL_API_QUOTA_RESERVE', '5'))
+FOOTBALL_API_RATE_LIMIT_PATH = Path(os.getenv('FOOTBALL_API_RATE_LIMIT_PATH', BASE_DIR / 'api_quota.sqlite3'))
+
+# Football API retries: attempts per request, backoff base and longest acceptable wait (seconds),
+# retries allowed per update run, and the circuit breaker's failure threshold and cool-down (seconds)
+FOOTBALL_API_MAX_ATTEMPTS = 4
+FOOTBALL_API_RETRY_BASE_DELAY = 1.0
+FOOTBALL_API_RETRY_MAX_DELAY = 30.0
+FOOTBALL_API_RETRY_BUDGET = 10
+FOOTBALL_API_CIRCUIT_FAILURES = 5
+FOOTBALL_API_CIRCUIT_RESET = 120
+
 # Application definition
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -66,9 +112,47 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Update workers write concurrently; wait this many seconds for a lock instead of failing at once
+        'OPTIONS': {'timeout': 20},
     }
 }
 
+# Rows per batched INSERT ... ON CONFLICT statement when the updater writes players, teams and fixtures
+FOOTBALL_DB_BATCH_SIZE = int(os.getenv('FOOTBALL_DB_BATCH_SIZE', '500'))
+
+# Delta sync: the longest fixture gap (days) caught up after an outage
+FOOTBALL_SYNC_MAX_GAP_DAYS = 7
+
+# Refresh scheduler: how long (seconds) refreshed data stays fresh, how stale (share of that)
+# data must be before it competes for quota, API calls left unplanned for live polling, and how
+# many times a run re-plans with the quota its estimates left over
+FOOTBALL_REFRESH_TTLS = {
+    'countries_and_leagues': 7 * 24 * 60 * 60,
+    'team': 7 * 24 * 60 * 60,
+    'venue': 7 * 24 * 60 * 60,
+}
+FOOTBALL_REFRESH_MIN_STALENESS = 0.5
+FOOTBALL_REFRESH_QUOTA_RESERVE = 20
+FOOTBALL_REFRESH_MAX_ROUNDS = 3
+
+# Live polling (seconds): between polls while matches are in play, while waiting for a late kick-off,
+# and at most between wake-ups when nothing is scheduled; plus API calls always left for the daily update
+FOOTBALL_LIVE_POLL_INTERVAL = 60
+FOOTBALL_LIVE_BETWEEN_INTERVAL = 300
+FOOTBALL_LIVE_IDLE_INTERVAL = 3600
+FOOTBALL_LIVE_QUOTA_RESERVE = 40
+
+# Queued update jobs (enqueue_update_jobs / run_update_worker). The default broker keeps messages as
+# files in FOOTBALL_JOBS_QUEUE_DIR, so workers on one machine need no server; 'memory://' suits tests.
+# A job not finished FOOTBALL_JOBS_LEASE_SECONDS after it was claimed or queued is delivered again.
+FOOTBALL_JOBS_BROKER_URL = os.getenv('FOOTBALL_JOBS_BROKER_URL', 'filesystem://')
+FOOTBALL_JOBS_QUEUE_DIR = Path(os.getenv('FOOTBALL_JOBS_QUEUE_DIR', BASE_DIR / 'job_queue'))
+FOOTBALL_JOBS_QUEUE = 'football-updates'
+FOOTBALL_JOBS_LEASE_SECONDS = 300
+FOOTBALL_JOBS_MAX_ATTEMPTS = 3
+# Seconds before a failed job is retried, doubled for each further attempt
+FOOTBALL_JOBS_RETRY_DELAY = 30
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -139,6 +223,26 @@ CACHES = {
     }
 }
 
+# Persistent tier of the Football API response cache, bounded to FOOTBALL_API_CACHE_MAX_BYTES
+FOOTBALL_API_CACHE_PATH = Path(os.getenv('FOOTBALL_API_CACHE_PATH', BASE_DIR / 'api_cache.sqlite3'))
+FOOTBALL_API_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Per-endpoint freshness (seconds) of cached API responses; see football_data.api_cache.DEFAULT_TTLS
+FOOTBALL_API_CACHE_TTLS = {
+    'countries': 7 * 24 * 60 * 60,
+    'leagues': 7 * 24 * 60 * 60,
+    'teams': 24 * 60 * 60,
+    'players': 24 * 60 * 60,
+    'fixtures': 60 * 60,
+    'fixtures:match_day': 5 * 60,
+    'fixtures:past': 24 * 60 * 60,
+}
+
+# Expired responses are kept this long (seconds) and served while a background refresh runs,
+# to read-only callers only (make_request(..., allow_stale=True)); the updater always gets fresh data
+FOOTBALL_API_CACHE_STALE_TTL = 24 * 60 * 60
+FOOTBALL_API_STALE_WHILE_REVALIDATE = True
+
 # Media files configuration
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
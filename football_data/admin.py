@@ -1,3 +1,16 @@
 from django.contrib import admin
+from .models import TrackedLeague, TrackedTeam
 
 # Register your models here.
+
+
+class TrackedTeamInline(admin.TabularInline):
+    model = TrackedTeam
+    extra = 1
+
+
+@admin.register(TrackedLeague)
+class TrackedLeagueAdmin(admin.ModelAdmin):
+    list_display = ('league_id', 'name', 'active', 'sync_fixtures', 'refresh_teams', 'priority')
+    list_editable = ('active', 'sync_fixtures', 'refresh_teams', 'priority')
+    inlines = [TrackedTeamInline]
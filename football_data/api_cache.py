@@ -0,0 +1,191 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# Default time-to-live (seconds) of cached responses per endpoint
+DEFAULT_TTLS = {
+    'countries': 7 * DAY,
+    'leagues': 7 * DAY,
+    'teams': DAY,
+    'players': DAY,
+    'fixtures': HOUR,
+    'fixtures:match_day': 5 * MINUTE,  # Fixtures of today change while matches are played
+    'fixtures:past': DAY,  # Fixtures of past dates are final
+    'fixtures:live': 0,  # In-play fixtures and status checks by id are polled; never cache them
+}
+DEFAULT_TTL = HOUR
+
+
+def _normalize_param(value):
+    # Renders a parameter value the way it is sent in the query string
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (list, tuple, set)):
+        return '-'.join(_normalize_param(v) for v in value)
+    return str(value).strip()
+
+
+def canonical_params(params):
+    # Sorted (name, value) pairs, so {'team': 33, 'season': 2024} and
+    # {'season': '2024', 'team': '33'} describe the same request
+    if not params:
+        return ()
+    return tuple(sorted(
+        (str(name), _normalize_param(value)) for name, value in params.items() if value is not None
+    ))
+
+
+def make_cache_key(endpoint, params=None):
+    # Cache key of a request: endpoint plus a digest of its canonical parameters
+    endpoint = endpoint.strip('/')
+    query = urlencode(canonical_params(params))
+    return f"football_api:{endpoint}:{hashlib.sha1(f'{endpoint}?{query}'.encode()).hexdigest()}"
+
+
+def ttl_for(endpoint, params=None, ttls=None):
+    # Returns how long a response for this endpoint and parameters stays fresh
+    ttls = {**DEFAULT_TTLS, **(ttls or {})}
+    if endpoint == 'fixtures' and params and (params.get('live') or params.get('ids')):
+        return ttls['fixtures:live']
+    if endpoint == 'fixtures' and params and params.get('date'):
+        requested = str(params['date'])
+        today = timezone.now().date().isoformat()
+        if requested == today:
+            return ttls['fixtures:match_day']
+        if requested < today:
+            return ttls['fixtures:past']
+    return ttls.get(endpoint, DEFAULT_TTL)
+
+
+class DiskCache:
+    """
+    SQLite-backed cache tier that survives process restarts.
+
+    Entries stay readable as stale until `stale_until`. When the stored
+    payloads exceed `max_bytes`, the least recently used entries are evicted.
+    """
+    def __init__(self, path, max_bytes):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                stale_until REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+        self._conn.commit()
+
+    def get(self, key):
+        # Returns (value, expires_at) or None when missing or past its stale window
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at, stale_until FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at, stale_until = row
+            if stale_until <= now:
+                self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute('UPDATE entries SET last_access = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+        return value, expires_at
+
+    def set(self, key, endpoint, value, ttl, stale_ttl=0):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'REPLACE INTO entries (key, endpoint, value, size, expires_at, stale_until, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, endpoint, value, len(value), now + ttl, now + ttl + stale_ttl, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Drops expired entries, then least recently used ones until the size bound holds
+        self._conn.execute('DELETE FROM entries WHERE stale_until <= ?', (time.time(),))
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute('SELECT key, size FROM entries ORDER BY last_access').fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            total -= size
+            evicted += 1
+        logger.debug(f"Evicted {evicted} entries from the API disk cache")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class TieredResponseCache:
+    """
+    Two-tier cache for API responses: Django's in-memory cache in front of a
+    persistent DiskCache.
+
+    Both tiers hold the raw response body compressed with zlib, never decoded
+    objects. get() returns (raw_bytes, fresh). A stale hit (fresh=False) comes
+    from the disk tier after the entry's TTL passed but within its stale window.
+    """
+    def __init__(self, path=None, max_bytes=None, ttls=None, stale_ttl=None):
+        path = path or getattr(settings, 'FOOTBALL_API_CACHE_PATH', settings.BASE_DIR / 'api_cache.sqlite3')
+        max_bytes = max_bytes or getattr(settings, 'FOOTBALL_API_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+        self.ttls = ttls or getattr(settings, 'FOOTBALL_API_CACHE_TTLS', {})
+        self.stale_ttl = stale_ttl if stale_ttl is not None else getattr(settings, 'FOOTBALL_API_CACHE_STALE_TTL', DAY)
+        self.disk = DiskCache(path, max_bytes)
+
+    def get(self, key):
+        value = cache.get(key)
+        if value is not None:
+            return zlib.decompress(value), True
+
+        entry = self.disk.get(key)
+        if entry is None:
+            return None, False
+        value, expires_at = entry
+        remaining = expires_at - time.time()
+        if remaining > 0:
+            # Promote to the memory tier for the rest of its lifetime
+            cache.set(key, value, remaining)
+            return zlib.decompress(value), True
+        return zlib.decompress(value), False
+
+    def set(self, key, endpoint, params, raw):
+        ttl = ttl_for(endpoint, params, self.ttls)
+        if ttl <= 0:
+            # Responses with a TTL of 0 are always fetched, and are not served stale either
+            return
+        value = zlib.compress(raw)
+        cache.set(key, value, ttl)
+        self.disk.set(key, endpoint, value, ttl, self.stale_ttl)
+
+    def close(self):
+        self.disk.close()
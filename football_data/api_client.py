@@ -1,63 +1,273 @@
+import json
 import time
-import random
 import requests
 import logging
 from django.conf import settings
-from django.core.cache import cache
 from datetime import datetime
-import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .api_cache import TieredResponseCache, make_cache_key
+from .exceptions import ApiRequestError, FootballApiError, QuotaExceeded, RetryBudgetExhausted
+from .http_session import build_session, timed_get, summarize_timings
+from .json_stream import find_errors, iter_chunks, iter_fixtures
+from .payload_archive import PayloadArchive
+from .rate_limiter import RateLimiter
+from .recordings import RecordingStore
+from .retry_policy import CircuitBreaker, RetryBudget, RetryPolicy
+from .single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 class FootballApiClient:
     # Base URL for the API
     BASE_URL = "https://api-football-v1.p.rapidapi.com/v3"
+
+    # Modes: talk to the API, talk to the API and save every response, or serve saved responses only
+    LIVE = 'live'
+    RECORD = 'record'
+    REPLAY = 'replay'
     
-    def __init__(self):
+    def __init__(self, pool_size=None, timeout=None, requests_per_minute=None, cache=None,
+                 stale_while_revalidate=None, rate_limiter=None, retry_policy=None, base_url=None,
+                 mode=None, recordings_dir=None, archive_dir=None, sleep=time.sleep):
         # Set up headers for API requests
         self.headers = {
             "X-RapidAPI-Key": settings.FOOTBALL_API_KEY,
             "X-RapidAPI-Host": "api-football-v1.p.rapidapi.com"
         }
+        # The base URL can point at a local stand-in server (see run_standin_api)
+        self.base_url = (base_url or getattr(settings, 'FOOTBALL_API_BASE_URL', None) or self.BASE_URL).rstrip('/')
+        self.mode = mode or getattr(settings, 'FOOTBALL_API_MODE', self.LIVE)
+        if self.mode not in (self.LIVE, self.RECORD, self.REPLAY):
+            raise ValueError(f"Unknown Football API client mode: {self.mode}")
+        self.recordings = RecordingStore(
+            recordings_dir or getattr(settings, 'FOOTBALL_API_RECORDINGS_DIR', settings.BASE_DIR / 'recordings')
+        )
+        # Every response received from the API is archived so the tables can be rebuilt offline (see reingest)
+        archive_dir = archive_dir or getattr(settings, 'FOOTBALL_API_ARCHIVE_DIR', None)
+        self.archive = PayloadArchive(
+            archive_dir, getattr(settings, 'FOOTBALL_API_ARCHIVE_SEGMENT_BYTES', None)
+        ) if archive_dir else None
         self.api_calls = 0  # Counter for API calls
+        self.pool_size = pool_size or getattr(settings, 'FOOTBALL_API_POOL_SIZE', 10)
+        self.timeout = timeout or getattr(settings, 'FOOTBALL_API_TIMEOUT', 30)
+        # Keep-alive session reused by every request so connections are pooled
+        self.session = build_session(self.headers, self.pool_size)
+        self.timings = []  # RequestTiming for every request sent over the network
+        # Requests may be issued from several threads (see AsyncFootballApiClient)
+        self._lock = threading.Lock()
+        # Token bucket and daily quota ledger shared with every other process using the API
+        self.rate_limiter = rate_limiter or RateLimiter(requests_per_minute=requests_per_minute)
+        # Retries are limited per attempt, per run, and cut short while the API is down
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = CircuitBreaker()
+        self.retry_budget = RetryBudget()
+        self.sleep = sleep  # Waits between retries (the simulator passes a virtual clock's)
+        # Responses are cached in memory and on disk so they survive process restarts
+        self.cache = cache or TieredResponseCache()
+        if stale_while_revalidate is None:
+            stale_while_revalidate = getattr(settings, 'FOOTBALL_API_STALE_WHILE_REVALIDATE', True)
+        self.stale_while_revalidate = stale_while_revalidate
+        self._revalidating = set()
+        self._refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='football-api-refresh')
+        # Identical requests in flight at the same time share one upstream call
+        self._in_flight = SingleFlight()
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'coalesced': 0}
+
+    def close(self):
+        # Wait for background refreshes, then release the pooled connections and the disk cache
+        self._refresh_executor.shutdown(wait=True)
+        self.session.close()
+        self.cache.close()
+        self.rate_limiter.close()
+        if self.archive is not None:
+            self.archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def record(self, counter, amount=1):
+        with self._lock:
+            self.stats[counter] += amount
+
+    @property
+    def cache_stats(self):
+        # Snapshot of the hit/miss/coalesced counters plus the hit rate
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_rate'] = (stats['hits'] + stats['stale_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def timing_summary(self):
+        # Totals of the connect/TLS/first-byte timings collected so far
+        return summarize_timings(self.timings)
 
-    def make_request(self, endpoint, params=None):
-        # Generate a unique cache key based on the endpoint and parameters
-        cache_key = hashlib.md5(f"{endpoint}_{str(params)}".encode()).hexdigest()
+    def quota_remaining(self):
+        # Requests left today across all processes, after the safety reserve
+        return self.rate_limiter.remaining()
+
+    def _sync_quota(self, response):
+        # RapidAPI reports the exact daily quota on every response
+        remaining = response.headers.get('x-ratelimit-requests-remaining')
+        if remaining is None:
+            return
+        try:
+            limit = response.headers.get('x-ratelimit-requests-limit')
+            self.rate_limiter.sync(int(remaining), int(limit) if limit else None)
+        except ValueError:
+            logger.debug(f"Ignoring malformed rate limit headers: {remaining}")
+
+    def make_request(self, endpoint, params=None, allow_stale=False):
+        # Returns the decoded JSON response of an endpoint
+        return json.loads(self.make_request_raw(endpoint, params, allow_stale))
+
+    def make_request_raw(self, endpoint, params=None, allow_stale=False):
+        # Returns the raw JSON body of an endpoint, from the cache when possible.
+        # Expired entries are only served to read-only callers that pass allow_stale: data that
+        # is written to the database (e.g. a match-day fixtures snapshot) must not be stale.
+        # Generate a unique cache key based on the endpoint and its normalized parameters
+        cache_key = make_cache_key(endpoint, params)
         
-        # Check if the response is cached
-        cached_response = cache.get(cache_key)
-        if cached_response:
-            return cached_response
+        # Check if the response is cached (memory first, then disk)
+        cached_response, fresh = self.cache.get(cache_key)
+        if cached_response is not None:
+            if fresh:
+                self.record('hits')
+                return cached_response
+            if allow_stale and self.stale_while_revalidate:
+                # Serve the expired entry now and refresh it in the background
+                self.record('stale_hits')
+                self._revalidate(cache_key, endpoint, params)
+                return cached_response
+
+        # Concurrent callers asking for the same resource wait for a single upstream call
+        raw, shared = self._in_flight.do(cache_key, self._fetch_and_store, cache_key, endpoint, params)
+        self.record('coalesced' if shared else 'misses')
+        return raw
+
+    def _fetch_and_store(self, cache_key, endpoint, params, refresh=False):
+        if not refresh:
+            # A call that finished just before this one became the leader may have filled the cache
+            cached_response, fresh = self.cache.get(cache_key)
+            if cached_response is not None and fresh:
+                return cached_response
+        raw = self._fetch(endpoint, params)
+        self.cache.set(cache_key, endpoint, params, raw)
+        return raw
+
+    def _revalidate(self, cache_key, endpoint, params):
+        # Schedules a background refresh of a stale cache entry, once per key
+        with self._lock:
+            if cache_key in self._revalidating:
+                return
+            self._revalidating.add(cache_key)
+        self._refresh_executor.submit(self._refresh, cache_key, endpoint, params)
 
-        url = f"{self.BASE_URL}/{endpoint}"
+    def _refresh(self, cache_key, endpoint, params):
+        try:
+            self._in_flight.do(cache_key, self._fetch_and_store, cache_key, endpoint, params, refresh=True)
+            logger.info(f"Refreshed stale cache entry for endpoint: {endpoint}")
+        except Exception as e:
+            logger.warning(f"Background refresh failed for endpoint {endpoint}: {str(e)}")
+        finally:
+            with self._lock:
+                self._revalidating.discard(cache_key)
+
+    def _fetch(self, endpoint, params=None):
+        # Requests the endpoint from the API, retrying transient failures as the retry policy allows
+        if self.mode == self.REPLAY:
+            return self._replay(endpoint, params)
+
+        url = f"{self.base_url}/{endpoint}"
         
         retries = 0
-        for i in range(5):  # Try up to 5 times
+        last_error = None
+        for attempt in range(1, self.retry_policy.max_attempts + 1):
+            # Fails fast without using quota while the API is known to be down
+            self.circuit_breaker.before_request()
+            response = None
             try:
                 # Make the API request
-                response = requests.get(url, headers=self.headers, params=params)
-                response.raise_for_status()
-                self.api_calls += 1
-
-                data = response.json()
-                # Cache the response for 1 hour
-                cache.set(cache_key, data, 3600)
-                
-                if retries > 0:
-                    logger.info(f"Request succeeded after {retries} retries for endpoint: {endpoint}")
-                
-                return data
+                self.rate_limiter.acquire()
+                response, timing = timed_get(self.session, url, endpoint, params=params, timeout=self.timeout)
+                with self._lock:
+                    self.timings.append(timing)
+                self._sync_quota(response)
+                logger.debug(
+                    f"{endpoint} timing: connect={timing.connect:.3f}s tls={timing.tls:.3f}s "
+                    f"first_byte={timing.first_byte:.3f}s total={timing.total:.3f}s"
+                )
+                status_code = response.status_code
+                last_error = f"HTTP {status_code}"
             except requests.exceptions.RequestException as e:
-                retries += 1
-                # Exponential backoff with a small random delay
-                wait_time = 2 ** i + random.uniform(0, 1)
-                logger.warning(f"Request failed (attempt {retries}). Retrying in {wait_time:.2f} seconds...")
-                time.sleep(wait_time)
+                status_code = None
+                last_error = str(e)
+
+            if status_code is not None and status_code < 400:
+                self.circuit_breaker.record_success()
+                with self._lock:
+                    self.api_calls += 1
+                raw = response.content
+                if self._check_api_errors(endpoint, raw):
+                    if retries > 0:
+                        logger.info(f"Request succeeded after {retries} retries for endpoint: {endpoint}")
+                    if self.mode == self.RECORD:
+                        self.recordings.save(endpoint, params, json.loads(raw), status_code)
+                    if self.archive is not None:
+                        self.archive.append(endpoint, params, raw)
+                    return raw
+                # Rate limited through the response body; retried like a 429
+                status_code = 429
+                last_error = "rate limit error in response body"
+
+            if not self.retry_policy.is_retryable(status_code):
+                # The API is up and answered; asking again will not change the answer
+                self.circuit_breaker.record_success()
+                logger.error(f"Request to endpoint {endpoint} failed with non-retryable {last_error}")
+                raise ApiRequestError(f"Request to endpoint {endpoint} failed with {last_error}", status_code)
+
+            if status_code != 429:
+                # Being rate limited says nothing about the API being down
+                self.circuit_breaker.record_failure()
+
+            if attempt == self.retry_policy.max_attempts:
+                break
+            wait_time = self.retry_policy.delay(attempt, response)
+            if wait_time > self.retry_policy.max_delay:
+                logger.error(f"API asked to wait {wait_time:.0f}s before retrying endpoint {endpoint}. Giving up.")
+                break
+            if not self.retry_budget.try_spend():
+                raise RetryBudgetExhausted(f"Retry budget of {self.retry_budget.max_retries} used up; last error for endpoint {endpoint}: {last_error}")
+            retries += 1
+            logger.warning(f"Request failed with {last_error} (attempt {attempt}). Retrying in {wait_time:.2f} seconds...")
+            self.sleep(wait_time)
         
         # Log error if all retries fail
-        logger.error(f"Failed to get response after {retries} retries for endpoint: {endpoint}")
-        raise Exception(f"Failed to get response after {retries} retries for endpoint: {endpoint}")
+        logger.error(f"Failed to get response after {retries} retries for endpoint: {endpoint} ({last_error})")
+        raise FootballApiError(f"Failed to get response after {retries} retries for endpoint: {endpoint}")
+
+    def _replay(self, endpoint, params):
+        # Serves a recorded response without touching the network or the quota
+        recording = self.recordings.load(endpoint, params)
+        if recording is None:
+            raise ApiRequestError(f"No recording for endpoint {endpoint} with params {params}", 404)
+        return json.dumps(recording['body']).encode()
+
+    def _check_api_errors(self, endpoint, raw):
+        # API-Football reports some failures in the body of a 200 response.
+        # Returns True if the data is usable, False if the request was rate limited.
+        errors = find_errors(raw)
+        if not errors or not isinstance(errors, dict):
+            return True
+        if 'rateLimit' in errors:
+            return False
+        if 'requests' in errors:
+            raise QuotaExceeded(f"API refused request to endpoint {endpoint}: {errors['requests']}")
+        raise ApiRequestError(f"API returned errors for endpoint {endpoint}: {errors}")
 
     # Methods for specific API endpoints
     def get_countries(self):
@@ -80,4 +290,33 @@ class FootballApiClient:
 
     def get_fixtures(self, date):
         params = {"date": date}
+        return self.make_request("fixtures", params)
+
+    def get_fixtures_range(self, league, season, date_from, date_to):
+        # The API only accepts a from/to window together with a league and season
+        params = {"league": league, "season": season, "from": date_from, "to": date_to}
+        return self.make_request("fixtures", params)
+
+    def iter_fixtures(self, date, league_ids=None, stats=None):
+        # Yields the fixtures of a date one at a time, decoding only those of the given leagues.
+        # Only the decoding is incremental: the body is fetched (or read from the cache) whole,
+        # because it is cached, archived and checked for errors before any fixture is used.
+        raw = self.make_request_raw("fixtures", {"date": date})
+        return iter_fixtures(iter_chunks(raw), league_ids, stats)
+
+    def iter_fixtures_range(self, league, season, date_from, date_to, stats=None):
+        # Counterpart of get_fixtures_range() decoding one fixture at a time, as iter_fixtures()
+        params = {"league": league, "season": season, "from": date_from, "to": date_to}
+        raw = self.make_request_raw("fixtures", params)
+        return iter_fixtures(iter_chunks(raw), None, stats)
+
+    def iter_live_fixtures(self, league_ids, stats=None):
+        # Yields the in-play fixtures of the given leagues (one request for all of them)
+        params = {"live": "-".join(str(league_id) for league_id in sorted(league_ids, key=int))}
+        raw = self.make_request_raw("fixtures", params)
+        return iter_fixtures(iter_chunks(raw), league_ids, stats)
+
+    def get_fixtures_by_ids(self, fixture_ids):
+        # The API accepts up to 20 ids per request
+        params = {"ids": "-".join(str(fixture_id) for fixture_id in fixture_ids)}
         return self.make_request("fixtures", params)
\ No newline at end of file
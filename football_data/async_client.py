@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from .api_cache import make_cache_key
+from .api_client import FootballApiClient
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncFootballApiClient:
+    """
+    Asyncio front-end for FootballApiClient.
+
+    Exposes the same get_* methods as coroutines so independent fetches can be
+    awaited together. Each request runs on a worker thread through the wrapped
+    client's pooled session, with at most `max_concurrency` in flight. The
+    wrapped client keeps enforcing the rate limit across all of them.
+    Tasks awaiting an identical request share one in-flight call.
+    """
+    def __init__(self, client=None, max_concurrency=None):
+        self.client = client or FootballApiClient()
+        self.max_concurrency = max_concurrency or getattr(settings, 'FOOTBALL_API_MAX_CONCURRENCY', 4)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='football-api')
+        self._semaphore = None
+        self._semaphore_loop = None
+        self._in_flight = {}
+
+    @property
+    def api_calls(self):
+        return self.client.api_calls
+
+    @property
+    def cache_stats(self):
+        return self.client.cache_stats
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.client.close()
+
+    def _get_semaphore(self):
+        # A semaphore belongs to one event loop; every asyncio.run() starts a new one
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def make_request(self, endpoint, params=None):
+        loop = asyncio.get_running_loop()
+        cache_key = make_cache_key(endpoint, params)
+        task = self._in_flight.get(cache_key)
+        if task is None or task.get_loop() is not loop:
+            task = loop.create_task(self._request(endpoint, params))
+            self._in_flight[cache_key] = task
+            task.add_done_callback(lambda done: self._forget(cache_key, done))
+        else:
+            self.client.record('coalesced')
+        # Shielded so one cancelled caller does not cancel the call the others are waiting on
+        return await asyncio.shield(task)
+
+    def _forget(self, cache_key, task):
+        if self._in_flight.get(cache_key) is task:
+            del self._in_flight[cache_key]
+
+    async def _request(self, endpoint, params):
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self.client.make_request, endpoint, params)
+
+    async def fetch_fixtures(self, date, league_ids=None):
+        # Fetches the fixtures of a date and decodes those of the given leagues, both on a worker thread
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, lambda: list(self.client.iter_fixtures(date, league_ids))
+            )
+
+    # Methods for specific API endpoints
+    async def get_countries(self):
+        return await self.make_request("countries")
+
+    async def get_leagues(self):
+        return await self.make_request("leagues")
+
+    async def get_teams(self, league, season):
+        params = {"league": league, "season": season}
+        return await self.make_request("teams", params)
+
+    async def get_team_info(self, team_id):
+        params = {"id": team_id}
+        return await self.make_request("teams", params)
+
+    async def get_players(self, team, season, page=1):
+        params = {"team": team, "season": season, "page": page}
+        return await self.make_request("players", params)
+
+    async def get_fixtures(self, date):
+        params = {"date": date}
+        return await self.make_request("fixtures", params)
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from django.db import transaction
+from .exceptions import QuotaExceeded, UpstreamUnavailable
+from .models import SyncWatermark
+from .pipeline import WritePipeline
+
+logger = logging.getLogger(__name__)
+
+# Journal entries are SyncWatermark rows of this entity, one per completed league and date
+JOURNAL_ENTITY = 'backfill_fixtures'
+
+
+def journal_scope(league_id, day):
+    return f"{league_id}:{day.isoformat()}"
+
+
+class FixtureBackfill:
+    """
+    Loads the fixtures of past dates for a set of leagues.
+
+    One request per date covers every league. Dates are fetched
+    concurrently (within the client's rate limit and quota) while the
+    calling thread writes them through the updater's batched upsert path.
+    Each date's fixtures and its journal entries are committed in one
+    transaction, so after a crash or a quota stop the next run fetches
+    exactly the dates that were not committed.
+    """
+    def __init__(self, updater, league_ids=None):
+        self.updater = updater
+        self.league_ids = [str(league_id) for league_id in (league_ids or updater.fixture_leagues)]
+        self.stats = {'days_done': 0, 'days_failed': 0, 'days_skipped': 0, 'created': 0, 'updated': 0, 'unchanged': 0}
+
+    def pending_days(self, start, end):
+        # Returns {day: [league ids]} for the dates in [start, end] not yet journaled for every league
+        done = set(
+            SyncWatermark.objects.filter(entity=JOURNAL_ENTITY).values_list('scope', flat=True)
+        )
+        pending = {}
+        day = start
+        while day <= end:
+            leagues = [league_id for league_id in self.league_ids if journal_scope(league_id, day) not in done]
+            if leagues:
+                pending[day] = leagues
+            day += timedelta(days=1)
+        return pending
+
+    def run(self, start, end):
+        pending = self.pending_days(start, end)
+        total_days = (end - start).days + 1
+        logger.info(f"Backfilling fixtures from {start} to {end}: {len(pending)} of {total_days} dates to fetch")
+        if not pending:
+            return self.stats
+
+        # One date per write batch, so each date is checkpointed as soon as it is stored
+        pipeline = WritePipeline(self.write_days, batch_size=1)
+        try:
+            pipeline.run(lambda p: asyncio.run(self._produce(pending, p)))
+        finally:
+            self.updater.log_pipeline_stats(pipeline, 'Backfill', 'dates')
+        return self.stats
+
+    async def _produce(self, pending, pipeline):
+        async def produce(day, league_ids):
+            started = time.monotonic()
+            try:
+                fixtures = await self.updater.async_client.fetch_fixtures(day.isoformat(), league_ids)
+            except Exception as e:
+                fixtures = e
+            await pipeline.aput((day, league_ids, fixtures), time.monotonic() - started)
+
+        await pipeline.gather(*(produce(day, league_ids) for day, league_ids in sorted(pending.items())))
+
+    def write_days(self, items):
+        # Stores each fetched date with its journal entries; returns the number of dates committed
+        committed = 0
+        for day, league_ids, fixtures in items:
+            if isinstance(fixtures, UpstreamUnavailable):
+                raise fixtures
+            if isinstance(fixtures, QuotaExceeded):
+                self.stats['days_skipped'] += 1
+                continue
+            if isinstance(fixtures, Exception):
+                self.stats['days_failed'] += 1
+                logger.error(f"Error fetching fixtures for {day}: {str(fixtures)}")
+                continue
+
+            try:
+                with transaction.atomic():
+                    counts = self.updater.write_fixtures(fixtures) if fixtures else (0, 0, 0)
+                    SyncWatermark.advance(JOURNAL_ENTITY, [journal_scope(league_id, day) for league_id in league_ids], synced_until=day)
+            except Exception as e:
+                # Rows remembered inside the rolled back transaction do not exist
+                self.updater.identity_map.clear()
+                self.stats['days_failed'] += 1
+                logger.error(f"Error writing fixtures for {day}: {str(e)}")
+                continue
+
+            self.stats['days_done'] += 1
+            self.stats['created'] += counts[0]
+            self.stats['updated'] += counts[1]
+            self.stats['unchanged'] += counts[2]
+            committed += 1
+            logger.info(f"Backfilled {day}: {len(fixtures)} fixtures ({counts[0]} created, {counts[1]} updated, {counts[2]} unchanged)")
+        return committed
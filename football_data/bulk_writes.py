@@ -0,0 +1,93 @@
+import hashlib
+import json
+import logging
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Bookkeeping columns that are not part of the data a row was written from
+UNHASHED_FIELDS = ('last_updated', 'last_seen', 'source_hash')
+
+
+def batch_size():
+    # Rows per INSERT statement; Django lowers it further if the database needs that
+    return getattr(settings, 'FOOTBALL_DB_BATCH_SIZE', 500)
+
+
+def has_source_hash(model):
+    return any(field.name == 'source_hash' for field in model._meta.concrete_fields)
+
+
+def source_hash(obj, fields):
+    # Digest of the values a row is written with, so an unchanged payload gives the same hash
+    values = [getattr(obj, obj._meta.get_field(field).attname) for field in fields if field not in UNHASHED_FIELDS]
+    return hashlib.sha1(json.dumps(values, default=str, separators=(',', ':')).encode()).hexdigest()
+
+
+def bulk_upsert(model, objs, update_fields, size=None):
+    """
+    Inserts or updates `objs` by primary key with batched INSERT ... ON CONFLICT statements.
+
+    Returns `(created_ids, updated_ids, unchanged_ids)`. bulk_create() cannot
+    tell inserts from updates, so the primary keys that already exist are
+    read first, one query per batch. For models with a `source_hash` column,
+    rows whose hash matches the stored one are not rewritten; only their
+    `last_seen` is bumped, with one UPDATE per batch. If the same primary key
+    appears twice, the last object wins. Columns a model derives from others
+    in save() are filled through its `fill_derived_fields()`.
+    """
+    size = size or batch_size()
+    for obj in objs:
+        fill_derived_fields = getattr(obj, 'fill_derived_fields', None)
+        if fill_derived_fields is not None:
+            fill_derived_fields()
+    pk_name = model._meta.pk.name
+    hashed = has_source_hash(model)
+    if hashed:
+        update_fields = [field for field in update_fields if field not in ('source_hash', 'last_seen')]
+        update_fields += ['source_hash', 'last_seen']
+        now = timezone.now()
+        for obj in objs:
+            obj.source_hash = source_hash(obj, update_fields)
+            obj.last_seen = now
+
+    by_pk = {obj.pk: obj for obj in objs}
+    pks = list(by_pk)
+    created_ids = []
+    updated_ids = []
+    unchanged_ids = []
+    for start in range(0, len(pks), size):
+        batch_pks = pks[start:start + size]
+        if hashed:
+            existing = dict(model.objects.filter(pk__in=batch_pks).values_list('pk', 'source_hash'))
+        else:
+            existing = dict.fromkeys(model.objects.filter(pk__in=batch_pks).values_list('pk', flat=True))
+        to_write = []
+        unchanged = []
+        for pk in batch_pks:
+            if pk not in existing:
+                created_ids.append(pk)
+                to_write.append(by_pk[pk])
+            elif hashed and existing[pk] == by_pk[pk].source_hash:
+                unchanged.append(pk)
+            else:
+                updated_ids.append(pk)
+                to_write.append(by_pk[pk])
+        if to_write:
+            model.objects.bulk_create(
+                to_write,
+                batch_size=size,
+                update_conflicts=True,
+                unique_fields=[pk_name],
+                update_fields=update_fields,
+            )
+        if unchanged:
+            model.objects.filter(pk__in=unchanged).update(last_seen=now)
+            unchanged_ids.extend(unchanged)
+    return created_ids, updated_ids, unchanged_ids
+
+
+def bulk_insert_missing(model, objs, size=None):
+    # Inserts the objects whose primary key is not in the table yet and leaves existing rows untouched
+    model.objects.bulk_create(objs, batch_size=size or batch_size(), ignore_conflicts=True)
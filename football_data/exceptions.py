@@ -0,0 +1,37 @@
+class FootballApiError(Exception):
+    """
+    Base class for errors raised by the Football API client.
+    """
+
+
+class QuotaExceeded(FootballApiError):
+    """
+    Raised when the daily API quota (minus the configured reserve) is used up.
+    """
+
+
+class ApiRequestError(FootballApiError):
+    """
+    Raised for a response the API will not answer differently on retry (e.g. 400, 403, 404).
+    """
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class UpstreamUnavailable(FootballApiError):
+    """
+    Raised when the API is considered down for the rest of the run; updaters stop instead of moving on.
+    """
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    """
+    Raised without contacting the API while the circuit breaker is open.
+    """
+
+
+class RetryBudgetExhausted(UpstreamUnavailable):
+    """
+    Raised when a request needs a retry but the run has no retries left.
+    """
@@ -0,0 +1,133 @@
+import threading
+import time
+from dataclasses import dataclass
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Per-thread scratch space the timed connections write into while a request is in flight
+_local = threading.local()
+
+
+def _reset_connection_timings():
+    _local.connect = 0.0
+    _local.tls = 0.0
+
+
+def _record(name, value):
+    setattr(_local, name, getattr(_local, name, 0.0) + value)
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        # TCP connect (including DNS resolution)
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            _record('connect', time.perf_counter() - start)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            _record('connect', time.perf_counter() - start)
+
+    def connect(self):
+        # connect() runs _new_conn() and then the TLS handshake, so the TLS time is the remainder
+        connect_before = getattr(_local, 'connect', 0.0)
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            tcp = getattr(_local, 'connect', 0.0) - connect_before
+            _record('tls', max(time.perf_counter() - start - tcp, 0.0))
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connection pools record TCP connect and TLS handshake times.
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+
+@dataclass
+class RequestTiming:
+    """
+    Timing breakdown of a single HTTP request, in seconds.
+
+    `connect` and `tls` are zero when a kept-alive connection was reused.
+    `first_byte` is the time from sending the request to receiving the
+    response headers, excluding connection setup.
+    """
+    endpoint: str
+    connect: float
+    tls: float
+    first_byte: float
+    total: float
+
+    @property
+    def reused(self):
+        return self.connect == 0 and self.tls == 0
+
+
+def build_session(headers=None, pool_size=10):
+    # Create a keep-alive session backed by a pool of reusable connections
+    session = requests.Session()
+    adapter = TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Connection': 'keep-alive'})
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+def timed_get(session, url, endpoint, **kwargs):
+    # Perform a GET on the session and return the response with its timing breakdown
+    _reset_connection_timings()
+    start = time.perf_counter()
+    response = session.get(url, **kwargs)
+    total = time.perf_counter() - start
+
+    connect = getattr(_local, 'connect', 0.0)
+    tls = getattr(_local, 'tls', 0.0)
+    # response.elapsed covers sending the request until the headers were parsed
+    first_byte = max(response.elapsed.total_seconds() - connect - tls, 0.0)
+    return response, RequestTiming(endpoint, connect, tls, first_byte, total)
+
+
+def summarize_timings(timings):
+    # Aggregate a list of RequestTiming into totals suitable for logging
+    count = len(timings)
+    if not count:
+        return {'requests': 0, 'new_connections': 0, 'reused_connections': 0,
+                'connect': 0.0, 'tls': 0.0, 'first_byte': 0.0, 'total': 0.0}
+    reused = sum(1 for t in timings if t.reused)
+    return {
+        'requests': count,
+        'new_connections': count - reused,
+        'reused_connections': reused,
+        'connect': sum(t.connect for t in timings),
+        'tls': sum(t.tls for t in timings),
+        'first_byte': sum(t.first_byte for t in timings),
+        'total': sum(t.total for t in timings),
+    }
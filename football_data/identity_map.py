@@ -0,0 +1,102 @@
+import logging
+from .bulk_writes import bulk_insert_missing
+from .models import Season, TeamSeason
+
+logger = logging.getLogger(__name__)
+
+# Fields identifying a row when it is looked up from API data. Rows are identified by primary key
+# unless listed here; seasons have no API id, so they are found by league and year.
+NATURAL_KEYS = {
+    Season: ('league_id', 'year'),
+    TeamSeason: ('season_id', 'team_id'),
+}
+
+
+class IdentityMap:
+    """
+    Remembers which Country, League, Team, Season and TeamSeason rows exist during one update run.
+
+    Each model's keys are loaded with a single query the first time the model
+    is used, and rows the run creates are added as they are written. After
+    that, checking whether a row exists costs no database round trip. `hits`
+    counts the lookups answered from memory, i.e. the queries saved.
+    """
+    def __init__(self):
+        self._rows = {}  # model -> {key: primary key}
+        self.hits = 0
+        self.misses = 0
+        self.preload_queries = 0
+
+    def key_for(self, obj):
+        fields = NATURAL_KEYS.get(type(obj))
+        if fields is None:
+            return obj.pk
+        return tuple(getattr(obj, field) for field in fields)
+
+    def _rows_for(self, model):
+        rows = self._rows.get(model)
+        if rows is None:
+            fields = NATURAL_KEYS.get(model)
+            if fields is None:
+                rows = {pk: pk for pk in model.objects.values_list('pk', flat=True)}
+            else:
+                rows = {tuple(values): pk for pk, *values in model.objects.values_list('pk', *fields)}
+            self._rows[model] = rows
+            self.preload_queries += 1
+        return rows
+
+    def get(self, model, key):
+        # Returns the primary key of the row with this key, or None if it does not exist
+        pk = self._rows_for(model).get(key)
+        if pk is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return pk
+
+    def remember(self, objs):
+        # Records rows that were just written
+        for obj in objs:
+            self._rows_for(type(obj))[self.key_for(obj)] = obj.pk
+
+    def ensure(self, model, objs):
+        """
+        Inserts the objects whose key is not known yet; existing rows are not touched.
+
+        Only the unknown objects reach the database, so a batch whose rows all
+        exist costs nothing. Returns the number of objects inserted.
+        """
+        rows = self._rows_for(model)
+        missing = {}
+        for obj in objs:
+            key = self.key_for(obj)
+            if key in rows or key in missing:
+                self.hits += 1
+            else:
+                self.misses += 1
+                missing[key] = obj
+        if missing:
+            bulk_insert_missing(model, list(missing.values()))
+            self.remember(missing.values())
+        return len(missing)
+
+    def season_id(self, league_id, year, defaults):
+        # Returns the id of the league's season for `year`, creating it from `defaults` if needed
+        pk = self.get(Season, (league_id, year))
+        if pk is None:
+            season, _ = Season.objects.get_or_create(league_id=league_id, year=year, defaults=defaults)
+            self.remember([season])
+            pk = season.pk
+        return pk
+
+    def forget(self, model):
+        # Drops what is known about a model, e.g. after its rows were deleted
+        self._rows.pop(model, None)
+
+    def clear(self):
+        # Drops everything, e.g. after a rollback undid rows that were remembered
+        self._rows.clear()
+
+    @property
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'preload_queries': self.preload_queries}
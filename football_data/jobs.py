@@ -0,0 +1,247 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import socket
+import time
+from datetime import date
+from pathlib import Path
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from kombu import Connection
+from .models import UpdateJob
+
+logger = logging.getLogger(__name__)
+
+
+class JobFailed(Exception):
+    """
+    Raised by a job handler when the job did not complete and should be retried.
+    """
+
+
+def broker_connection(url=None):
+    # Connection to the job broker; the filesystem transport needs its message folder to exist
+    url = url or getattr(settings, 'FOOTBALL_JOBS_BROKER_URL', 'filesystem://')
+    transport_options = {}
+    if url.startswith('filesystem://'):
+        directory = Path(getattr(settings, 'FOOTBALL_JOBS_QUEUE_DIR', settings.BASE_DIR / 'job_queue'))
+        directory.mkdir(parents=True, exist_ok=True)
+        transport_options = {'data_folder_in': str(directory), 'data_folder_out': str(directory)}
+    return Connection(url, transport_options=transport_options)
+
+
+def job_key(kind, args, period=''):
+    # Idempotency key: the same kind, arguments and period (e.g. the day of a refresh) is the same job
+    digest = hashlib.sha1(json.dumps(args, sort_keys=True, separators=(',', ':')).encode()).hexdigest()[:16]
+    return f"{kind}:{period}:{digest}"
+
+
+class JobQueue:
+    """
+    Queues update jobs on the broker, keeping their state in UpdateJob rows.
+
+    Only the job key travels through the broker; what to do and whether it
+    was done is in the database. Enqueuing a job whose key exists does
+    nothing, and `requeue_expired()` delivers again every job whose lease
+    ran out, failing it once it was attempted `max_attempts` times. A
+    failed job is delivered again the same way once its retry delay passed.
+    """
+    def __init__(self, connection=None, name=None, lease_seconds=None, max_attempts=None, retry_delay=None):
+        self.connection = connection or broker_connection()
+        self.name = name or getattr(settings, 'FOOTBALL_JOBS_QUEUE', 'football-updates')
+        self.lease = timezone.timedelta(seconds=lease_seconds or getattr(settings, 'FOOTBALL_JOBS_LEASE_SECONDS', 300))
+        self.max_attempts = max_attempts or getattr(settings, 'FOOTBALL_JOBS_MAX_ATTEMPTS', 3)
+        self.retry_delay = retry_delay or getattr(settings, 'FOOTBALL_JOBS_RETRY_DELAY', 30)
+        self.queue = self.connection.SimpleQueue(self.name)
+
+    def close(self):
+        self.queue.close()
+        self.connection.release()
+
+    def publish(self, key):
+        self.queue.put({'key': key})
+
+    def retry_at(self, attempts):
+        # When a failed job is delivered again: exponential backoff with jitter, so jobs that failed
+        # together (e.g. on a locked database) do not collide again
+        delay = self.retry_delay * 2 ** (attempts - 1) * random.uniform(0.5, 1.5)
+        return timezone.now() + timezone.timedelta(seconds=delay)
+
+    def enqueue(self, jobs):
+        """
+        Queues (kind, args, period) jobs not queued before; returns (queued, duplicates).
+        """
+        lease_until = timezone.now() + self.lease
+        new = {}
+        for kind, args, period in jobs:
+            key = job_key(kind, args, period)
+            new.setdefault(key, UpdateJob(key=key, kind=kind, args=args, lease_until=lease_until))
+        existing = set(UpdateJob.objects.filter(key__in=list(new)).values_list('key', flat=True))
+        queued = [job for key, job in new.items() if key not in existing]
+        UpdateJob.objects.bulk_create(queued, ignore_conflicts=True)
+        for job in queued:
+            self.publish(job.key)
+        return len(queued), len(jobs) - len(queued)
+
+    def requeue_expired(self):
+        # Delivers again the jobs whose lease ran out (lost messages, workers that died mid-job);
+        # returns the number requeued
+        now = timezone.now()
+        requeued = 0
+        for job in UpdateJob.objects.filter(status__in=[UpdateJob.QUEUED, UpdateJob.RUNNING], lease_until__lt=now):
+            current = UpdateJob.objects.filter(pk=job.pk, status=job.status, lease_until=job.lease_until)
+            if job.attempts >= self.max_attempts:
+                current.update(status=UpdateJob.FAILED, error=f"Lease expired after {job.attempts} attempts", finished_at=now)
+                logger.error(f"Job {job.key} failed: lease expired after {job.attempts} attempts")
+            elif current.update(status=UpdateJob.QUEUED, worker='', lease_until=now + self.lease):
+                if job.status == UpdateJob.RUNNING:
+                    logger.warning(f"Job {job.key} was not finished by worker {job.worker}; delivering it again")
+                self.publish(job.key)
+                requeued += 1
+        return requeued
+
+
+class JobWorker:
+    """
+    Consumes update jobs and runs them through a DataUpdater.
+
+    A job is claimed by moving it from queued to running, so a message
+    delivered twice runs once. The message is acknowledged as soon as the
+    job is claimed: from then on the lease, not the broker, guards against
+    the worker dying. Failed jobs are queued again until they ran out of
+    attempts, after a backoff. The worker stops when the API quota is used up.
+    """
+    def __init__(self, updater, job_queue, name=None):
+        self.updater = updater
+        self.job_queue = job_queue
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.handlers = {
+            'fixtures_date': self.run_fixtures_date,
+            'league_fixtures': self.run_league_fixtures,
+            'team': self.run_team,
+            'countries_and_leagues': self.run_countries_and_leagues,
+            'clean_old_data': self.run_clean_old_data,
+        }
+        self.stats = {'done': 0, 'failed': 0, 'retried': 0, 'duplicates': 0, 'requeued': 0}
+
+    def run(self, max_jobs=None, idle_timeout=None):
+        # Processes jobs until max_jobs ran, nothing arrived for idle_timeout seconds, or the quota is used up
+        queue = self.job_queue.queue
+        check_every = min(self.job_queue.lease.total_seconds(), self.job_queue.retry_delay) / 4
+        last_check = None
+        idle_since = time.monotonic()
+        while max_jobs is None or self.stats['done'] + self.stats['failed'] < max_jobs:
+            if last_check is None or time.monotonic() - last_check >= check_every:
+                self.stats['requeued'] += self.job_queue.requeue_expired()
+                last_check = time.monotonic()
+            try:
+                message = queue.get(block=True, timeout=1)
+            except queue.Empty:
+                if idle_timeout is not None and time.monotonic() - idle_since >= idle_timeout:
+                    break
+                continue
+            if self.updater.quota_exhausted():
+                message.requeue()
+                logger.warning("API quota used up; worker stopping")
+                break
+            message.ack()
+            self.process(message.payload['key'])
+            idle_since = time.monotonic()
+        return self.stats
+
+    def claim(self, key):
+        now = timezone.now()
+        claimed = UpdateJob.objects.filter(key=key, status=UpdateJob.QUEUED).update(
+            status=UpdateJob.RUNNING, worker=self.name, attempts=F('attempts') + 1,
+            lease_until=now + self.job_queue.lease,
+        )
+        return UpdateJob.objects.get(key=key) if claimed else None
+
+    def process(self, key):
+        job = self.claim(key)
+        if job is None:
+            # Already run, or running elsewhere
+            self.stats['duplicates'] += 1
+            return
+        started = time.monotonic()
+        logger.info(f"Running job {job.key} {job.args} (attempt {job.attempts})")
+        self.updater.client.retry_budget.reset()
+        mine = UpdateJob.objects.filter(pk=job.pk, status=UpdateJob.RUNNING, worker=self.name)
+        try:
+            self.handlers[job.kind](job.args)
+        except Exception as e:
+            if job.attempts < self.job_queue.max_attempts:
+                # Delivered again by requeue_expired() once the retry delay passed
+                retry_at = self.job_queue.retry_at(job.attempts)
+                mine.update(status=UpdateJob.QUEUED, worker='', error=str(e), lease_until=retry_at)
+                self.stats['retried'] += 1
+                logger.warning(f"Job {job.key} failed (attempt {job.attempts}), retrying after {retry_at}: {str(e)}")
+            else:
+                mine.update(status=UpdateJob.FAILED, error=str(e), finished_at=timezone.now())
+                self.stats['failed'] += 1
+                logger.error(f"Job {job.key} failed after {job.attempts} attempts: {str(e)}")
+            return
+        mine.update(status=UpdateJob.DONE, error='', finished_at=timezone.now())
+        self.stats['done'] += 1
+        logger.info(f"Job {job.key} done in {time.monotonic() - started:.2f}s")
+
+    def run_fixtures_date(self, args):
+        counts = [0, 0, 0]
+        if self.updater.sync_fixture_day(date.fromisoformat(args['date']), args['league_ids'], {}, counts):
+            raise JobFailed(f"Some fixtures of {args['date']} were not written")
+
+    def run_league_fixtures(self, args):
+        counts = [0, 0, 0]
+        if self.updater.sync_league_fixtures(
+            args['league_id'], date.fromisoformat(args['date_from']), date.fromisoformat(args['date_to']), {}, counts
+        ):
+            raise JobFailed(f"Some fixtures of league {args['league_id']} were not written")
+
+    def run_team(self, args):
+        if args['players']:
+            written = self.updater.update_teams_and_players([args['team_id']])
+        else:
+            written = self.updater.update_teams_and_players([], [args['team_id']])
+        if not written:
+            raise JobFailed(f"Team {args['team_id']} was not written")
+
+    def run_countries_and_leagues(self, args):
+        # The updater logs and swallows the error; the job still has to fail to be retried
+        if not self.updater.update_countries_and_leagues():
+            raise JobFailed("Countries and leagues were not written")
+
+    def run_clean_old_data(self, args):
+        if not self.updater.clean_old_data():
+            raise JobFailed("Old data was not cleaned")
+
+
+def plan_update_jobs(updater):
+    """
+    Returns the (kind, args, period) jobs of a daily update: one per missing fixture day or league
+    window, one per planned team or venue refresh, and the countries and cleanup jobs.
+    """
+    today = timezone.now().date()
+    yesterday = today - timezone.timedelta(days=1)
+    jobs = []
+    windows = updater.fixture_sync_windows(yesterday)
+    if windows and all(start == yesterday for start in windows.values()):
+        jobs.append(('fixtures_date', {'date': yesterday.isoformat(), 'league_ids': sorted(windows)}, ''))
+    else:
+        for league_id, start in windows.items():
+            jobs.append(('league_fixtures', {
+                'league_id': league_id, 'date_from': start.isoformat(), 'date_to': yesterday.isoformat(),
+            }, ''))
+
+    # Refreshes are planned with what the fixture jobs leave of the quota
+    plan = updater.plan_refreshes(pending_calls=len(jobs))
+    period = today.isoformat()
+    if plan['countries_and_leagues']:
+        jobs.append(('countries_and_leagues', {}, period))
+    jobs.extend(('team', {'team_id': team_id, 'players': True}, period) for team_id in plan['team'])
+    jobs.extend(('team', {'team_id': team_id, 'players': False}, period) for team_id in plan['venue'])
+    if updater.runs_global_tasks:
+        jobs.append(('clean_old_data', {}, period))
+    return jobs
@@ -0,0 +1,109 @@
+import codecs
+import json
+import re
+
+# A complete string, a structural character, or the opening quote of a string cut off by the chunk end
+_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]]|"')
+
+# API-Football writes the league id as the first member of each fixture's "league" object
+_LEAGUE_ID = re.compile(r'"league"\s*:\s*\{\s*"id"\s*:\s*(\d+)')
+
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_chunks(raw, chunk_size=CHUNK_SIZE):
+    # Splits a bytes payload that was read whole into chunks for the incremental parser
+    view = memoryview(raw)
+    for start in range(0, len(raw), chunk_size):
+        yield view[start:start + chunk_size].tobytes()
+
+
+def iter_array_items(chunks, key='response'):
+    """
+    Yields the raw JSON text of each element of the top-level array `key`.
+
+    `chunks` is an iterable of bytes (for example Response.iter_content()).
+    Only the text of the element being scanned is kept in memory, and
+    nothing is decoded into Python objects, so callers can discard elements
+    before paying for json.loads(). Elements must be objects, arrays or
+    strings, which is all API-Football returns.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buf = ''
+    depth = 0
+    item_start = None
+    last_key = None  # Most recent string at depth 1, i.e. the key of the value that follows
+    in_target = False
+    pos = 0  # Everything in buf before pos has been scanned
+
+    for chunk in chunks:
+        buf += decoder.decode(chunk)
+        for match in _TOKEN.finditer(buf, pos):
+            token = match.group()
+            if token == '"':
+                # Unterminated string: rescan it once the next chunk arrives
+                break
+            pos = match.end()
+            if token[0] == '"':
+                if depth == 1:
+                    last_key = token[1:-1]
+                elif in_target and depth == 2:
+                    yield token
+            elif token in '{[':
+                if in_target and depth == 2:
+                    item_start = match.start()
+                elif token == '[' and depth == 1 and last_key == key:
+                    in_target = True
+                depth += 1
+            else:
+                depth -= 1
+                if in_target:
+                    if depth == 2:
+                        yield buf[item_start:pos]
+                        item_start = None
+                    elif depth == 1:
+                        return
+
+        # Drop the text that has been fully scanned
+        keep = pos if item_start is None else min(pos, item_start)
+        if keep:
+            buf = buf[keep:]
+            pos -= keep
+            if item_start is not None:
+                item_start -= keep
+
+
+def iter_fixtures(chunks, league_ids=None, stats=None):
+    """
+    Yields fixture dicts from a fixtures response, skipping leagues not in `league_ids`.
+
+    Fixtures of other leagues are recognised from their raw text and never
+    decoded. If `stats` is a dict, 'parsed' and 'skipped' counts are added to it.
+    """
+    league_ids = {int(league_id) for league_id in league_ids} if league_ids is not None else None
+    for raw_item in iter_array_items(chunks):
+        if league_ids is not None:
+            match = _LEAGUE_ID.search(raw_item)
+            if match and int(match.group(1)) not in league_ids:
+                if stats is not None:
+                    stats['skipped'] = stats.get('skipped', 0) + 1
+                continue
+        fixture = json.loads(raw_item)
+        if league_ids is not None and fixture['league']['id'] not in league_ids:
+            # The id was not where the fast path expected it
+            if stats is not None:
+                stats['skipped'] = stats.get('skipped', 0) + 1
+            continue
+        if stats is not None:
+            stats['parsed'] = stats.get('parsed', 0) + 1
+        yield fixture
+
+
+def find_errors(raw):
+    # Returns the API-level "errors" member of a raw response, or None when it is empty.
+    # Error responses are small, so only those are fully decoded.
+    match = re.search(rb'"errors"\s*:\s*([\[{])\s*([\]}]?)', raw[:4096])
+    if match is None or match.group(2):
+        return None
+    errors = json.loads(raw).get('errors')
+    return errors or None
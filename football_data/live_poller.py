@@ -0,0 +1,215 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from .exceptions import FootballApiError, QuotaExceeded, UpstreamUnavailable
+from .models import Fixture
+
+logger = logging.getLogger(__name__)
+
+# Short statuses of fixtures that are being played
+LIVE_STATUSES = frozenset({'1H', 'HT', '2H', 'ET', 'BT', 'P', 'SUSP', 'INT', 'LIVE'})
+# Short statuses after which a fixture no longer changes
+FINAL_STATUSES = frozenset({'FT', 'AET', 'PEN', 'PST', 'CANC', 'ABD', 'AWD', 'WO'})
+
+# Columns rewritten when a polled fixture's status or goals changed. The source hash is cleared because
+# only part of the row is written, so the next full write of the fixture must not be skipped.
+LIVE_UPDATE_FIELDS = [
+    'status_short', 'status_long', 'status_elapsed', 'goals_home', 'goals_away',
+    'last_updated', 'last_seen', 'source_hash',
+]
+
+# How long after kick-off a match may still be running (extra time and stoppages included)
+MATCH_WINDOW = timedelta(hours=2, minutes=30)
+
+IDS_PER_REQUEST = 20
+
+
+class LivePoller:
+    """
+    Keeps scores of today's fixtures in the tracked leagues current while they are played.
+
+    Today's schedule is read once a day. While matches are in play, the live
+    feed of all tracked leagues is polled every `live_interval` seconds, or
+    less often if the remaining quota would not last until the last match
+    ends. Between matches the poller sleeps until the next kick-off, and when
+    nothing is scheduled it sleeps until the next day (waking at least every
+    `idle_interval` seconds). Only fixtures whose status or goals changed are
+    written. `quota_reserve` calls are always left for the daily updater.
+    """
+    def __init__(self, updater, live_interval=None, between_interval=None, idle_interval=None,
+                 quota_reserve=None, clock=None, sleep=None):
+        self.updater = updater
+        self.client = updater.client
+        self.live_interval = live_interval or getattr(settings, 'FOOTBALL_LIVE_POLL_INTERVAL', 60)
+        self.between_interval = between_interval or getattr(settings, 'FOOTBALL_LIVE_BETWEEN_INTERVAL', 300)
+        self.idle_interval = idle_interval or getattr(settings, 'FOOTBALL_LIVE_IDLE_INTERVAL', 3600)
+        self.quota_reserve = quota_reserve if quota_reserve is not None else getattr(settings, 'FOOTBALL_LIVE_QUOTA_RESERVE', 40)
+        self.clock = clock or (lambda: timezone.now())
+        self._stopped = threading.Event()
+        self.sleep = sleep or self._stopped.wait
+        self.schedule_day = None
+        self.kickoffs = {}  # fixture id -> kick-off of today's fixtures that are not final yet
+        self.live_ids = set()
+        self.stats = {'polls': 0, 'poll_seconds': 0.0, 'changed': 0, 'api_calls': 0}
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self, max_polls=None):
+        # Polls until stop() is called (or max_polls live polls were made); returns the stats
+        while not self._stopped.is_set():
+            if max_polls is not None and self.stats['polls'] >= max_polls:
+                break
+            try:
+                interval = self.step()
+            except (QuotaExceeded, UpstreamUnavailable) as e:
+                logger.warning(f"Live polling paused: {str(e)}")
+                interval = self.idle_interval
+            except (FootballApiError, DatabaseError) as e:
+                # A bad response or a locked database only costs this poll
+                logger.error(f"Live poll failed: {str(e)}")
+                interval = self.between_interval
+            self.sleep(interval)
+        return self.stats
+
+    def step(self):
+        # Does whatever is due now and returns the number of seconds to sleep
+        self.client.retry_budget.reset()
+        now = self.clock()
+        if self.schedule_day != now.date():
+            self.refresh_schedule(now.date())
+
+        if self.budget() <= 0:
+            logger.warning("Live polling quota used up; waiting for the next day")
+            return self.seconds_until_tomorrow(now)
+
+        if self.live_ids or self.in_match_window(now):
+            self.poll()
+            return self.live_poll_interval(self.clock())
+
+        upcoming = [kickoff for kickoff in self.kickoffs.values() if kickoff > now]
+        if upcoming:
+            # Between matches: wake up at the next kick-off
+            return max(min((min(upcoming) - now).total_seconds(), self.idle_interval), 1)
+        if self.kickoffs:
+            # Matches that should have started but are not live yet (e.g. delayed)
+            return self.between_interval
+        return self.seconds_until_tomorrow(now)
+
+    def budget(self):
+        # Calls the poller may still make today
+        return self.client.quota_remaining() - self.quota_reserve
+
+    def in_match_window(self, now):
+        return any(kickoff <= now < kickoff + MATCH_WINDOW for kickoff in self.kickoffs.values())
+
+    def live_poll_interval(self, now):
+        # The configured interval, stretched so the remaining budget lasts until the last match ends
+        last_end = max((kickoff + MATCH_WINDOW for kickoff in self.kickoffs.values()), default=now)
+        remaining = (last_end - now).total_seconds()
+        budget = self.budget()
+        if budget <= 0:
+            return self.seconds_until_tomorrow(now)
+        return max(self.live_interval, remaining / budget)
+
+    def seconds_until_tomorrow(self, now):
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=now.tzinfo)
+        return max(min((tomorrow - now).total_seconds(), self.idle_interval), 1)
+
+    def refresh_schedule(self, day):
+        # Reads today's fixtures of the tracked leagues, storing new ones and remembering kick-offs
+        calls = self.client.api_calls
+        fixtures = list(self.client.iter_fixtures(day.isoformat(), self.updater.fixture_leagues))
+        self.stats['api_calls'] += self.client.api_calls - calls
+        self.schedule_day = day
+        self.kickoffs = {}
+        self.live_ids = set()
+        for fixture in fixtures:
+            status = fixture['fixture']['status']['short']
+            if status not in FINAL_STATUSES:
+                self.kickoffs[fixture['fixture']['id']] = datetime.fromisoformat(fixture['fixture']['date'])
+            if status in LIVE_STATUSES:
+                self.live_ids.add(fixture['fixture']['id'])
+        changed = self.apply(fixtures)
+        logger.info(f"Live schedule for {day}: {len(self.kickoffs)} fixtures still to finish, {changed} stored or changed")
+
+    def poll(self):
+        # One poll of the live feed; fixtures that dropped out of it are checked for their final result
+        started = time.monotonic()
+        calls = self.client.api_calls
+        fixtures = list(self.client.iter_live_fixtures(self.updater.fixture_leagues))
+        live_ids = {fixture['fixture']['id'] for fixture in fixtures}
+
+        ended_ids = sorted(self.live_ids - live_ids)
+        for start in range(0, len(ended_ids), IDS_PER_REQUEST):
+            data = self.client.get_fixtures_by_ids(ended_ids[start:start + IDS_PER_REQUEST])
+            fixtures.extend(data['response'])
+
+        for fixture in fixtures:
+            if fixture['fixture']['status']['short'] in FINAL_STATUSES:
+                self.kickoffs.pop(fixture['fixture']['id'], None)
+                live_ids.discard(fixture['fixture']['id'])
+        self.live_ids = live_ids
+
+        changed = self.apply(fixtures)
+        elapsed = time.monotonic() - started
+        self.stats['polls'] += 1
+        self.stats['poll_seconds'] += elapsed
+        self.stats['changed'] += changed
+        self.stats['api_calls'] += self.client.api_calls - calls
+        logger.info(
+            f"Live poll: {len(live_ids)} in play, {len(ended_ids)} ended, {changed} changed in {elapsed:.2f}s. "
+            f"Quota remaining: {self.client.quota_remaining()} ({self.stats['api_calls']} used by the poller)"
+        )
+        return changed
+
+    def apply(self, fixtures):
+        # Writes fixtures that are new or whose status or goals changed; returns how many were written
+        if not fixtures:
+            return 0
+        fixtures = {fixture['fixture']['id']: fixture for fixture in fixtures}
+        current = {
+            pk: (status, goals_home, goals_away)
+            for pk, status, goals_home, goals_away in Fixture.objects.filter(pk__in=list(fixtures)).values_list(
+                'pk', 'status_short', 'goals_home', 'goals_away'
+            )
+        }
+        now = timezone.now()
+        changed = []
+        new = []
+        for fixture_id, fixture in fixtures.items():
+            status = fixture['fixture']['status']
+            goals = fixture['goals']
+            if fixture_id not in current:
+                new.append(fixture)
+            elif current[fixture_id] != (status['short'], goals['home'], goals['away']):
+                changed.append(Fixture(
+                    id=fixture_id,
+                    status_short=status['short'],
+                    status_long=status.get('long') or '',
+                    status_elapsed=status.get('elapsed'),
+                    goals_home=goals['home'],
+                    goals_away=goals['away'],
+                    last_updated=now,
+                    last_seen=now,
+                    source_hash=''
+                ))
+        if changed:
+            with transaction.atomic():
+                Fixture.objects.bulk_update(changed, LIVE_UPDATE_FIELDS)
+        created = 0
+        if new:
+            result = self.updater.write_fixture_batch(new)
+            created = result[0] if result else 0
+        return len(changed) + created
+
+    def summary(self):
+        polls = self.stats['polls']
+        return {
+            **self.stats,
+            'avg_poll_seconds': self.stats['poll_seconds'] / polls if polls else 0.0,
+        }
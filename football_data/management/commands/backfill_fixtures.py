@@ -0,0 +1,50 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from football_data.backfill import FixtureBackfill
+from football_data.exceptions import UpstreamUnavailable
+from football_data.updaters import DataUpdater
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Load the fixtures of a range of past dates; an interrupted backfill resumes where it stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', required=True, help='First date to load (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', required=True, help='Last date to load (YYYY-MM-DD)')
+        parser.add_argument('--league', dest='leagues', action='append', help='League id to load (repeatable, default: the tracked leagues)')
+        parser.add_argument('--concurrency', type=int, help='Maximum number of concurrent API requests')
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['date_from'])
+            end = date.fromisoformat(options['date_to'])
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {str(e)}")
+        if start > end:
+            raise CommandError("--from must not be after --to")
+
+        updater = DataUpdater(concurrency=options['concurrency'])
+        backfill = FixtureBackfill(updater, options['leagues'])
+
+        try:
+            stats = backfill.run(start, end)
+            remaining = len(backfill.pending_days(start, end))
+            self.stdout.write(self.style.SUCCESS(
+                f"Backfilled {stats['days_done']} dates: {stats['created']} fixtures created, "
+                f"{stats['updated']} updated, {stats['unchanged']} unchanged"
+            ))
+            if remaining:
+                self.stdout.write(self.style.WARNING(
+                    f"{remaining} dates still to load ({stats['days_skipped']} skipped for quota, "
+                    f"{stats['days_failed']} failed); run the same command again to resume"
+                ))
+        except UpstreamUnavailable as e:
+            self.stdout.write(self.style.ERROR(f"Football API unavailable, backfill stopped: {str(e)}"))
+            logger.error(f"Football API unavailable, backfill stopped: {str(e)}")
+        finally:
+            self.stdout.write(f"Total API calls made: {updater.api_calls}")
+            self.stdout.write(f"Daily quota remaining: {updater.client.quota_remaining()}")
+            updater.async_client.close()
+            logger.info("Backfill finished.")
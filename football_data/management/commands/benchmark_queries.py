@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from football_data.query_benchmark import AFTER, BEFORE, QueryBenchmark
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = "Compare the views' query plans and times before and after the view indexes on synthetic data"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--leagues', type=int, default=100, help='Leagues (one country each) to generate')
+        parser.add_argument('--teams-per-league', type=int, default=20, help='Teams per league')
+        parser.add_argument('--players-per-team', type=int, default=30, help='Players per team')
+        parser.add_argument('--weeks', type=int, default=104, help='Weeks of fixtures, one round a week')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs of each query; the median is reported')
+        parser.add_argument('--no-plans', action='store_true', help='Only print timings, not query plans')
+
+    def handle(self, *args, **options):
+        benchmark = QueryBenchmark(
+            leagues=options['leagues'], teams_per_league=options['teams_per_league'],
+            players_per_team=options['players_per_team'], weeks=options['weeks'], repeat=options['repeat'],
+        )
+        self.stdout.write("Generating data and measuring (this database is not touched)...")
+        results, rows = benchmark.run()
+        self.stdout.write(', '.join(f"{count} {name}" for name, count in rows.items()))
+        self.stdout.write(f"Before: {BEFORE[1]}, after: {AFTER[1]}\n")
+
+        for name, result in results.items():
+            before, after = result['before'], result['after']
+            speedup = before['ms'] / after['ms'] if after['ms'] else 0.0
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: {before['ms']:.2f}ms -> {after['ms']:.2f}ms ({speedup:.1f}x), {after['rows']} rows"
+            ))
+            if before['rows'] != after['rows']:
+                self.stdout.write(self.style.WARNING(f"  Row count changed: {before['rows']} before, {after['rows']} after"))
+            if not options['no_plans']:
+                for label, measurement in (('before', before), ('after', after)):
+                    self.stdout.write(f"  {label}:")
+                    for line in measurement['plan'].splitlines():
+                        self.stdout.write(f"    {line}")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from football_data.jobs import JobQueue, plan_update_jobs
+from football_data.updaters import DataUpdater
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = "Queue today's update as jobs for run_update_worker processes"
+
+    def handle(self, *args, **options):
+        updater = DataUpdater()
+        job_queue = JobQueue()
+        try:
+            jobs = plan_update_jobs(updater)
+            queued, duplicates = job_queue.enqueue(jobs)
+            requeued = job_queue.requeue_expired()
+            self.stdout.write(self.style.SUCCESS(
+                f"Queued {queued} jobs ({duplicates} already queued or done); {requeued} expired jobs delivered again"
+            ))
+            self.stdout.write(f"Daily quota remaining: {updater.client.quota_remaining()}")
+        finally:
+            job_queue.close()
+            updater.async_client.close()
+            logger.info("Enqueue finished.")
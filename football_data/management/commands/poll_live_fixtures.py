@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from football_data.live_poller import LivePoller
+from football_data.updaters import DataUpdater
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = "Keep today's scores current by polling in-play fixtures of the tracked leagues"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, help='Seconds between polls while matches are in play')
+        parser.add_argument('--quota-reserve', type=int, help='API calls to leave for the daily update')
+        parser.add_argument('--max-polls', type=int, help='Stop after this many live polls')
+
+    def handle(self, *args, **options):
+        updater = DataUpdater()
+        poller = LivePoller(updater, live_interval=options['interval'], quota_reserve=options['quota_reserve'])
+        self.stdout.write(self.style.SUCCESS("Polling live fixtures (Ctrl+C to stop)"))
+
+        try:
+            poller.run(max_polls=options['max_polls'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            poller.stop()
+            summary = poller.summary()
+            self.stdout.write(
+                f"Live polls: {summary['polls']} (average {summary['avg_poll_seconds']:.2f}s), "
+                f"fixtures changed: {summary['changed']}, API calls: {summary['api_calls']}"
+            )
+            self.stdout.write(f"Daily quota remaining: {updater.client.quota_remaining()}")
+            updater.async_client.close()
+            logger.info("Live polling finished.")
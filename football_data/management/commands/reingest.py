@@ -0,0 +1,50 @@
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from football_data.payload_archive import PayloadArchive
+from football_data.reingest import REINGEST_ORDER, Reingester, rows_per_second
+from football_data.updaters import DataUpdater
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Rebuild the tables from archived API responses without making API calls'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', dest='endpoints', action='append', choices=REINGEST_ORDER,
+                            help='Endpoint to replay (repeatable, default: all)')
+        parser.add_argument('--from', dest='date_from', help='First fetch date to replay (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Last fetch date to replay (YYYY-MM-DD)')
+        parser.add_argument('--archive-dir', help='Archive to read (default: FOOTBALL_API_ARCHIVE_DIR)')
+
+    def handle(self, *args, **options):
+        try:
+            date_from = date.fromisoformat(options['date_from']) if options['date_from'] else None
+            date_to = date.fromisoformat(options['date_to']) if options['date_to'] else None
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {str(e)}")
+        archive_dir = options['archive_dir'] or getattr(settings, 'FOOTBALL_API_ARCHIVE_DIR', None)
+        if not archive_dir:
+            raise CommandError("No archive directory: set FOOTBALL_API_ARCHIVE_DIR or pass --archive-dir")
+
+        updater = DataUpdater()
+        reingester = Reingester(updater, PayloadArchive(archive_dir))
+        calls = updater.api_calls
+        try:
+            stats = reingester.run(options['endpoints'], date_from, date_to)
+            for endpoint, endpoint_stats in stats.items():
+                self.stdout.write(
+                    f"{endpoint}: {endpoint_stats['rows']} rows from {endpoint_stats['responses']} responses in "
+                    f"{endpoint_stats['seconds']:.2f}s ({rows_per_second(endpoint_stats['rows'], endpoint_stats['seconds']):.0f} rows/s), "
+                    f"{endpoint_stats['failed_batches']} failed batches"
+                )
+            rows = sum(endpoint_stats['rows'] for endpoint_stats in stats.values())
+            seconds = sum(endpoint_stats['seconds'] for endpoint_stats in stats.values())
+            self.stdout.write(self.style.SUCCESS(
+                f"Reingested {rows} rows in {seconds:.2f}s ({rows_per_second(rows, seconds):.0f} rows/s)"
+            ))
+            self.stdout.write(f"API calls made: {updater.api_calls - calls}")
+        finally:
+            updater.async_client.close()
+            logger.info("Reingest finished.")
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from football_data.standin_api import StandinApiServer, SyntheticPayloads
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Run a local stand-in for the Football API serving recorded or synthetic payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+        parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+        parser.add_argument('--recordings', help='Directory of recorded responses to serve before synthetic ones')
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before answering each request')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Extra random latency of up to this many seconds')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with an error (0-1)')
+        parser.add_argument('--error-status', type=int, default=503, help='HTTP status used for injected errors')
+        parser.add_argument('--daily-limit', type=int, default=100, help='Quota reported in the rate limit headers')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic payloads and error injection')
+
+    def handle(self, *args, **options):
+        server = StandinApiServer(
+            (options['host'], options['port']),
+            payloads=SyntheticPayloads(seed=options['seed']),
+            recordings_dir=options['recordings'],
+            latency=options['latency'],
+            jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            error_status=options['error_status'],
+            daily_limit=options['daily_limit'],
+            seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Stand-in Football API listening on {server.base_url}"))
+        self.stdout.write(f"Point the updater at it with FOOTBALL_API_BASE_URL={server.base_url}")
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Served {server.requests_served} requests")
@@ -0,0 +1,55 @@
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from football_data.jobs import JobQueue, JobWorker
+from football_data.updaters import DataUpdater
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Run queued update jobs (see enqueue_update_jobs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, help='Maximum number of concurrent API requests')
+        parser.add_argument('--workers', type=int, help='Run this many worker processes and wait for them')
+        parser.add_argument('--max-jobs', type=int, help='Stop after this many jobs')
+        parser.add_argument('--idle-timeout', type=float, help='Stop after this many seconds without jobs')
+
+    def handle(self, *args, **options):
+        if options['workers']:
+            self.run_workers(options)
+            return
+
+        updater = DataUpdater(concurrency=options['concurrency'])
+        job_queue = JobQueue()
+        worker = JobWorker(updater, job_queue)
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker.name} waiting for jobs (Ctrl+C to stop)"))
+        try:
+            worker.run(max_jobs=options['max_jobs'], idle_timeout=options['idle_timeout'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stats = worker.stats
+            self.stdout.write(
+                f"Jobs done: {stats['done']}, failed: {stats['failed']}, retried: {stats['retried']}, "
+                f"duplicates skipped: {stats['duplicates']}, expired jobs requeued: {stats['requeued']}"
+            )
+            self.stdout.write(f"Total API calls made: {updater.api_calls}")
+            job_queue.close()
+            updater.async_client.close()
+            logger.info("Update worker finished.")
+
+    def run_workers(self, options):
+        # Starts worker processes sharing the queue, rate limit and quota ledger
+        command = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'run_update_worker']
+        for option in ('concurrency', 'max_jobs', 'idle_timeout'):
+            if options[option] is not None:
+                command += [f"--{option.replace('_', '-')}", str(options[option])]
+        processes = [subprocess.Popen(command) for _ in range(options['workers'])]
+        failed = sum(process.wait() != 0 for process in processes)
+        if failed:
+            self.stdout.write(self.style.ERROR(f"{failed} of {options['workers']} workers failed"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"All {options['workers']} workers finished"))
@@ -6,8 +6,8 @@ class Command(BaseCommand):
     help = 'Test API connection'
 
     def handle(self, *args, **kwargs):
-        # API endpoint for testing connection
-        url = "https://api-football-v1.p.rapidapi.com/v3/timezone"
+        # API endpoint for testing connection (the real API or a local stand-in)
+        url = f"{settings.FOOTBALL_API_BASE_URL.rstrip('/')}/timezone"
         
         # Headers required for API authentication
         headers = {
@@ -1,9 +1,11 @@
-from django.core.management.base import BaseCommand
+import json
+from django.core.management.base import BaseCommand, CommandError
 from football_data.api_client import FootballApiClient
+from football_data.models import TrackedLeague
+from football_data.simulation import WeekSimulator
 from django.utils import timezone
 import logging
-import time
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
@@ -12,20 +14,26 @@ class Command(BaseCommand):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.client = FootballApiClient()
+        self.client = None  # Created in handle(); a simulation does not use the real API
         self.start_time = datetime.now()
-        # Dictionary of top leagues and their associated team IDs
-        self.top_leagues = {
-            '39': ['33', '34', '40', '42', '46', '47', '48', '49', '50', '51'],  # Premier League
-            '140': ['529', '530', '531', '532', '533', '536', '537', '538', '540', '541'],  # La Liga
-            '78': ['157', '159', '161', '162', '163', '164', '165', '167', '168', '169'],  # Bundesliga
-            '135': ['489', '492', '494', '496', '497', '498', '499', '500', '502', '503'],  # Serie A
-            '61': ['77', '79', '80', '81', '82', '83', '84', '85', '91', '93']  # Ligue 1
-        }
+        self.top_leagues = {}  # Tracked league ids and their team ids, read from the registry in handle()
 
     def add_arguments(self, parser):
         # Add optional argument to simulate a specific day of the week
         parser.add_argument('--day', type=int, help='Day of the week to simulate (0-6, where 0 is Monday)')
+        # Offline simulation of the real update schedule in virtual time
+        parser.add_argument('--simulate', action='store_true',
+                            help='Run the real daily update for --days days against synthetic or recorded responses, '
+                                 'in virtual time, without API calls')
+        parser.add_argument('--days', type=int, default=7, help='Days to simulate (default: 7)')
+        parser.add_argument('--start', help='First simulated day (YYYY-MM-DD, default: today)')
+        parser.add_argument('--run-at', default='06:00', help='UTC time of day the simulated update runs (default: 06:00)')
+        parser.add_argument('--concurrency', type=int, help='Maximum number of concurrent API requests')
+        parser.add_argument('--latency', type=float, default=0.3, help='Simulated seconds per API request (default: 0.3)')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Extra random simulated latency of up to this many seconds')
+        parser.add_argument('--daily-limit', type=int, help='Daily quota to simulate (default: FOOTBALL_API_DAILY_LIMIT)')
+        parser.add_argument('--recordings', help='Directory of recorded responses to serve before synthetic ones')
+        parser.add_argument('--json', dest='json_path', help='Also write the simulated days to this JSON file')
 
     def log_progress(self, message):
         # Helper method to log progress with elapsed time
@@ -34,7 +42,13 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         # Main method to handle the command execution
+        if options['simulate']:
+            self.simulate(options)
+            return
+
+        self.client = FootballApiClient()
         simulated_day = options['day'] if options['day'] is not None else timezone.now().weekday()
+        self.top_leagues = TrackedLeague.registry()
         self.log_progress(f"Starting API test for new update strategy (Simulating day: {simulated_day})...")
 
         self.test_fixtures(simulated_day)  # Daily update
@@ -50,6 +64,56 @@ class Command(BaseCommand):
 
         self.log_progress(self.style.SUCCESS('API test completed successfully'))
         self.log_progress(f"Total API calls made: {self.client.api_calls}")
+        self.log_progress(f"Daily quota remaining: {self.client.quota_remaining()}")
+
+        timings = self.client.timing_summary()
+        self.log_progress(
+            f"Connections: {timings['new_connections']} new, {timings['reused_connections']} reused. "
+            f"Connect: {timings['connect']:.2f}s, TLS: {timings['tls']:.2f}s, first byte: {timings['first_byte']:.2f}s"
+        )
+        self.client.close()
+
+    def simulate(self, options):
+        # Runs the real update schedule offline and reports calls, rows and projected time per day
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else timezone.now().date()
+            run_at = datetime.strptime(options['run_at'], '%H:%M').time()
+        except ValueError as e:
+            raise CommandError(f"Invalid --start or --run-at: {str(e)}")
+        simulator = WeekSimulator(
+            start, days=options['days'], run_at=run_at, concurrency=options['concurrency'],
+            latency=options['latency'], jitter=options['jitter'], daily_limit=options['daily_limit'],
+            recordings_dir=options['recordings'],
+        )
+        self.log_progress(
+            f"Simulating {options['days']} days from {start} (update at {run_at:%H:%M} UTC, "
+            f"daily limit {simulator.daily_limit}, concurrency {simulator.concurrency})..."
+        )
+        days = simulator.run()
+
+        for result in days:
+            rows = result['rows']
+            self.log_progress(
+                f"{result['weekday'][:3]} {result['date']}: {result['api_calls']} API calls "
+                f"(quota left {result['quota_remaining']}), rows {rows['inserted']} inserted, "
+                f"{rows['updated']} updated, {rows['skipped']} skipped, cache hit rate {result['cache_hit_rate']:.0%}, "
+                f"projected {result['projected_seconds']:.0f}s"
+            )
+        calls = [result['api_calls'] for result in days]
+        self.log_progress(
+            f"Total API calls: {sum(calls)} (peak {max(calls, default=0)} per day of {simulator.daily_limit}); "
+            f"projected update time: {sum(result['projected_seconds'] for result in days):.0f}s"
+        )
+        exhausted = [result['date'] for result in days if result['quota_exhausted']]
+        if exhausted:
+            self.log_progress(self.style.WARNING(f"Daily quota used up on {', '.join(exhausted)}"))
+        else:
+            self.log_progress(self.style.SUCCESS('The schedule stays within the daily limit'))
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(days, f, indent=2)
+            self.log_progress(f"Simulated days written to {options['json_path']}")
 
     def test_countries_and_leagues(self):
         # Test API calls for countries and leagues (weekly update)
@@ -84,11 +148,10 @@ class Command(BaseCommand):
                     if not players_data['response']:
                         break
                     
-                    if self.client.api_calls >= 95:
+                    # The client's rate limiter spaces the requests; only the daily quota needs checking here
+                    if self.client.quota_remaining() <= 0:
                         self.log_progress(self.style.WARNING('Approaching API call limit. Stopping test.'))
                         return
-                    
-                    time.sleep(2)  # Add a 2-second delay between requests
 
     def test_fixtures(self, simulated_day):
         # Test API calls for fixtures (daily update)
@@ -118,8 +181,6 @@ class Command(BaseCommand):
                 self.log_progress(f"Retrieved team info (including venue) for team {team_id}")
                 self.log_progress(f"API calls: {self.client.api_calls}")
                 
-                if self.client.api_calls >= 95:
+                if self.client.quota_remaining() <= 0:
                     self.log_progress(self.style.WARNING('Approaching API call limit. Stopping test.'))
-                    return
-                
-                time.sleep(2)  # Add a 2-second delay between requests
\ No newline at end of file
+                    return
\ No newline at end of file
@@ -1,19 +1,48 @@
-from django.core.management.base import BaseCommand
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from football_data.updaters import DataUpdater
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def parse_shard(value):
+    # 'K/N' -> (K, N): this process updates the K-th of N shards of the tracked leagues
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise CommandError(f"Invalid shard {value!r}; expected K/N, e.g. 2/4")
+    if not 1 <= index <= count:
+        raise CommandError(f"Invalid shard {value!r}; K must be between 1 and N")
+    return index, count
+
+
 class Command(BaseCommand):
     help = 'Update football data from API'
 
+    def add_arguments(self, parser):
+        # Number of API requests allowed in flight at the same time
+        parser.add_argument('--concurrency', type=int, help='Maximum number of concurrent API requests')
+        # Tracked leagues are split across processes by a hash of their id
+        parser.add_argument('--shard', help='Update only shard K of N of the tracked leagues, e.g. 2/4')
+        parser.add_argument('--workers', type=int, help='Run this many worker processes, one shard each, and wait for them')
+
     def handle(self, *args, **options):
+        if options['workers']:
+            self.run_workers(options['workers'], options['concurrency'])
+            return
+
+        shard = parse_shard(options['shard']) if options['shard'] else None
+
         # Initialize the DataUpdater
-        updater = DataUpdater()
+        updater = DataUpdater(concurrency=options['concurrency'], shard=shard)
 
         try:
             # Log the start of the update process
-            logger.info("Starting football data update...")
+            scope = f" of shard {shard[0]}/{shard[1]}" if shard else ''
+            logger.info(f"Starting football data update{scope} ({len(updater.top_leagues)} leagues)...")
             
             # Call the method to update all data
             updater.update_all_data()
@@ -23,6 +52,7 @@ class Command(BaseCommand):
             
             # Print the total number of API calls made during the update
             self.stdout.write(f"Total API calls made: {updater.api_calls}")
+            self.stdout.write(f"Daily quota remaining: {updater.quota_remaining}")
         
         except Exception as e:
             # If an error occurs, print an error message to the console
@@ -33,4 +63,19 @@ class Command(BaseCommand):
         
         finally:
             # Log the end of the update process, regardless of success or failure
-            logger.info("Update process finished.")
\ No newline at end of file
+            logger.info("Update process finished.")
+
+    def run_workers(self, workers, concurrency):
+        # Starts one process per shard; they share the rate limit and quota through the quota ledger
+        command = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'update_football_data']
+        if concurrency:
+            command += ['--concurrency', str(concurrency)]
+        processes = [
+            subprocess.Popen(command + ['--shard', f"{index}/{workers}"])
+            for index in range(1, workers + 1)
+        ]
+        failed = [index for index, process in enumerate(processes, start=1) if process.wait() != 0]
+        if failed:
+            self.stdout.write(self.style.ERROR(f"Shards {', '.join(f'{index}/{workers}' for index in failed)} failed"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"All {workers} shards completed"))
\ No newline at end of file
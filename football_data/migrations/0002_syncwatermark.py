@@ -0,0 +1,31 @@
+# Generated by Django 5.0.8 on 2026-10-18 11:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('football_data', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(max_length=50)),
+                ('scope', models.CharField(blank=True, default='', max_length=50)),
+                ('synced_until', models.DateField(blank=True, null=True)),
+                ('last_synced', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['entity', 'scope'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='syncwatermark',
+            constraint=models.UniqueConstraint(fields=('entity', 'scope'), name='unique_sync_watermark'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.8 on 2026-10-18 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('football_data', '0002_syncwatermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncwatermark',
+            name='change_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='syncwatermark',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='syncwatermark',
+            name='refresh_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.8 on 2026-10-18 11:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('football_data', '0003_syncwatermark_change_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fixture',
+            name='last_seen',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='fixture',
+            name='source_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='last_seen',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='source_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='last_seen',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='source_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+    ]
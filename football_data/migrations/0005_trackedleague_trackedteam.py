@@ -0,0 +1,44 @@
+# Generated by Django 5.0.8 on 2026-10-18 11:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('football_data', '0004_source_hash_last_seen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackedLeague',
+            fields=[
+                ('league_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('active', models.BooleanField(default=True)),
+                ('sync_fixtures', models.BooleanField(default=True)),
+                ('refresh_teams', models.BooleanField(default=True)),
+                ('priority', models.FloatField(default=1.0)),
+            ],
+            options={
+                'ordering': ['league_id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrackedTeam',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('team_id', models.IntegerField()),
+                ('active', models.BooleanField(default=True)),
+                ('league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='teams', to='football_data.trackedleague')),
+            ],
+            options={
+                'ordering': ['league', 'team_id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='trackedteam',
+            constraint=models.UniqueConstraint(fields=('league', 'team_id'), name='unique_tracked_team'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# The leagues and teams the updater used to have hard-coded
+TRACKED_LEAGUES = {
+    39: ('Premier League', [33, 34, 40, 42, 46, 47, 48, 49, 50, 51]),
+    140: ('La Liga', [529, 530, 531, 532, 533, 536, 537, 538, 540, 541]),
+    78: ('Bundesliga', [157, 159, 161, 162, 163, 164, 165, 167, 168, 169]),
+    135: ('Serie A', [489, 492, 494, 496, 497, 498, 499, 500, 502, 503]),
+    61: ('Ligue 1', [77, 79, 80, 81, 82, 83, 84, 85, 91, 93]),
+}
+
+
+def seed_tracked_leagues(apps, schema_editor):
+    TrackedLeague = apps.get_model('football_data', 'TrackedLeague')
+    TrackedTeam = apps.get_model('football_data', 'TrackedTeam')
+    for league_id, (name, team_ids) in TRACKED_LEAGUES.items():
+        league, _ = TrackedLeague.objects.get_or_create(league_id=league_id, defaults={'name': name})
+        for team_id in team_ids:
+            TrackedTeam.objects.get_or_create(league=league, team_id=team_id)
+
+
+def remove_tracked_leagues(apps, schema_editor):
+    TrackedLeague = apps.get_model('football_data', 'TrackedLeague')
+    TrackedLeague.objects.filter(league_id__in=list(TRACKED_LEAGUES)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('football_data', '0005_trackedleague_trackedteam'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_tracked_leagues, remove_tracked_leagues),
+    ]
@@ -0,0 +1,79 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def fill_match_dates(apps, schema_editor):
+    # One UPDATE; TruncDate converts to the current time zone, as date__date lookups did
+    Fixture = apps.get_model('football_data', 'Fixture')
+    Fixture.objects.update(match_date=TruncDate('date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('football_data', '0007_updatejob'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='league',
+            options={'ordering': ['country_id', 'name']},
+        ),
+        migrations.AddField(
+            model_name='fixture',
+            name='match_date',
+            field=models.DateField(null=True),
+        ),
+        migrations.RunPython(fill_match_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='fixture',
+            name='match_date',
+            field=models.DateField(),
+        ),
+        # Single-column indexes made redundant by the composite indexes they prefix
+        migrations.AlterField(
+            model_name='fixture',
+            name='league',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='fixtures', to='football_data.league'),
+        ),
+        migrations.AlterField(
+            model_name='league',
+            name='country',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='football_data.country'),
+        ),
+        migrations.AlterField(
+            model_name='player',
+            name='team',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='players', to='football_data.team'),
+        ),
+        migrations.AlterField(
+            model_name='team',
+            name='country',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='football_data.country'),
+        ),
+        migrations.AddIndex(
+            model_name='fixture',
+            index=models.Index(fields=['match_date', '-date'], name='fixture_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fixture',
+            index=models.Index(fields=['league', 'match_date', '-date'], name='fixture_league_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='league',
+            index=models.Index(fields=['country', 'name'], name='league_country_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(fields=['lastname', 'firstname'], name='player_name_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(fields=['team', 'lastname', 'firstname'], name='player_team_name_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['country', 'name'], name='team_country_name_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_team_seasons(apps, schema_editor):
+    # Both teams of every stored fixture play in its season
+    Fixture = apps.get_model('football_data', 'Fixture')
+    TeamSeason = apps.get_model('football_data', 'TeamSeason')
+    memberships = set(Fixture.objects.values_list('season_id', 'team_home_id').distinct())
+    memberships |= set(Fixture.objects.values_list('season_id', 'team_away_id').distinct())
+    TeamSeason.objects.bulk_create(
+        (TeamSeason(season_id=season_id, team_id=team_id) for season_id, team_id in memberships),
+        batch_size=500, ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('football_data', '0008_fixture_match_date_view_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamSeason',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('season', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='team_seasons', to='football_data.season')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='league_seasons', to='football_data.team')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='teamseason',
+            constraint=models.UniqueConstraint(fields=('season', 'team'), name='unique_team_season'),
+        ),
+        migrations.RunPython(fill_team_seasons, migrations.RunPython.noop),
+    ]
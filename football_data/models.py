@@ -1,3 +1,5 @@
+import zlib
+from datetime import datetime
 from django.db import models
 from django.utils import timezone
 from django.core.exceptions import ValidationError
@@ -40,12 +42,18 @@ class League(models.Model):
     id = models.IntegerField(primary_key=True)
     name = models.CharField(max_length=100, db_index=True)
     type = models.CharField(max_length=50)
-    country = models.ForeignKey(Country, on_delete=models.CASCADE)
+    # Indexed through league_country_name_idx
+    country = models.ForeignKey(Country, on_delete=models.CASCADE, db_index=False)
     logo_url = models.URLField()
     last_updated = models.DateTimeField(default=timezone.now)
 
     class Meta:
-        ordering = ['country', 'name']
+        # The country's name is its key, so sorting by it needs no join
+        ordering = ['country_id', 'name']
+        indexes = [
+            # League lists and the league of a team's country, sorted as above
+            models.Index(fields=['country', 'name'], name='league_country_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.country.name})"
@@ -99,18 +107,36 @@ class Team(models.Model):
     id = models.IntegerField(primary_key=True)
     name = models.CharField(max_length=100, db_index=True)
     code = models.CharField(max_length=3, null=True, blank=True)
-    country = models.ForeignKey(Country, on_delete=models.CASCADE)
+    # Indexed through team_country_name_idx
+    country = models.ForeignKey(Country, on_delete=models.CASCADE, db_index=False)
     founded = models.IntegerField(null=True, blank=True)
     national = models.BooleanField(default=False)
     logo_url = models.URLField()
     last_updated = models.DateTimeField(default=timezone.now)
+    # Digest of the values last written from the API, and when the API last returned the team
+    source_hash = models.CharField(max_length=40, blank=True, default='')
+    last_seen = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Teams of a league (joined through its country), sorted by name
+            models.Index(fields=['country', 'name'], name='team_country_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def current_league(self):
+        # The league of the team's latest known season, a league before any cup of the same season.
+        # Prefetch TeamSeason.prefetch() when listing teams, or this runs queries per team.
+        memberships = list(self.league_seasons.all())
+        if not memberships:
+            return None
+        latest = max(membership.season.year for membership in memberships)
+        leagues = [membership.season.league for membership in memberships if membership.season.year == latest]
+        return min(leagues, key=lambda league: (league.type != 'League', league.name))
+
     @classmethod
     def truncate_old_data(cls):
         yesterday = timezone.now() - timezone.timedelta(days=1)
@@ -175,11 +201,19 @@ class Player(models.Model):
     weight = models.CharField(max_length=10, null=True, blank=True)
     injured = models.BooleanField(null=True, blank=True)
     photo_url = models.URLField(null=True, blank=True)
-    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='players')
+    # Indexed through player_team_name_order_idx
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='players', db_index=False)
     last_updated = models.DateTimeField(default=timezone.now)
+    source_hash = models.CharField(max_length=40, blank=True, default='')
+    last_seen = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['lastname', 'firstname']
+        indexes = [
+            # The player list and a team's players, both sorted by name
+            models.Index(fields=['lastname', 'firstname'], name='player_name_order_idx'),
+            models.Index(fields=['team', 'lastname', 'firstname'], name='player_team_name_order_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.team.name})"
@@ -208,12 +242,16 @@ class Fixture(models.Model):
     referee = models.CharField(max_length=100, null=True, blank=True)
     time_zone = models.CharField(max_length=50)
     date = models.DateTimeField(db_index=True)
+    # Day of `date` in the site's time zone (TIME_ZONE), stored so the fixtures of a day are found
+    # through an index instead of converting every row's `date`
+    match_date = models.DateField()
     timestamp = models.IntegerField()
     venue = models.ForeignKey(Venue, on_delete=models.SET_NULL, null=True, related_name='fixtures')
     status_long = models.CharField(max_length=50)
     status_short = models.CharField(max_length=2)
     status_elapsed = models.IntegerField(null=True, blank=True)
-    league = models.ForeignKey(League, on_delete=models.CASCADE, related_name='fixtures')
+    # Indexed through fixture_league_day_idx
+    league = models.ForeignKey(League, on_delete=models.CASCADE, related_name='fixtures', db_index=False)
     season = models.ForeignKey(Season, on_delete=models.CASCADE, related_name='fixtures')
     round = models.CharField(max_length=50)
     team_home = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='home_fixtures')
@@ -229,13 +267,36 @@ class Fixture(models.Model):
     score_penalty_home = models.IntegerField(null=True, blank=True)
     score_penalty_away = models.IntegerField(null=True, blank=True)
     last_updated = models.DateTimeField(default=timezone.now)
+    source_hash = models.CharField(max_length=40, blank=True, default='')
+    last_seen = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Fixtures of a day, optionally of one league, latest first
+            models.Index(fields=['match_date', '-date'], name='fixture_day_idx'),
+            models.Index(fields=['league', 'match_date', '-date'], name='fixture_league_day_idx'),
+        ]
 
     def __str__(self):
         return f"{self.team_home.name} vs {self.team_away.name} - {self.date}"
 
+    @staticmethod
+    def match_date_of(value):
+        # The match_date of a kick-off, given as a datetime or as the API's ISO 8601 string
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        return timezone.localtime(value).date()
+
+    def fill_derived_fields(self):
+        # Columns computed from the others; called by save() and by bulk_upsert(), which skips save()
+        if self.date is not None:
+            self.match_date = self.match_date_of(self.date)
+
+    def save(self, *args, **kwargs):
+        self.fill_derived_fields()
+        super().save(*args, **kwargs)
+
     def is_finished(self):
         return self.status_short in ['FT', 'AET', 'PEN']
 
@@ -243,4 +304,209 @@ class Fixture(models.Model):
         if self.home_score is not None and self.home_score < 0:
             raise ValidationError('Home score cannot be negative.')
         if self.away_score is not None and self.away_score < 0:
-            raise ValidationError('Away score cannot be negative.')
\ No newline at end of file
+            raise ValidationError('Away score cannot be negative.')
+##--------------------------------------------------------------------------##
+##--------------------------------TeamSeason---------------------------------##
+"""
+    Records that a team plays in a league's season.
+
+    Filled from fixtures (both teams of a fixture play in its season) and
+    from league team lists, so a team's league is looked up instead of
+    guessed from its country. A team can be in several leagues in one
+    season, e.g. a league and a cup.
+"""
+class TeamSeason(models.Model):
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='league_seasons')
+    season = models.ForeignKey(Season, on_delete=models.CASCADE, related_name='team_seasons', db_index=False)
+
+    class Meta:
+        constraints = [
+            # Also the index of a season's teams
+            models.UniqueConstraint(fields=['season', 'team'], name='unique_team_season'),
+        ]
+
+    def __str__(self):
+        return f"{self.team_id} in season {self.season_id}"
+
+    @classmethod
+    def prefetch(cls):
+        # Prefetch of teams' memberships with their seasons and leagues, for Team.current_league()
+        return models.Prefetch('league_seasons', queryset=cls.objects.select_related('season__league'))
+
+    @classmethod
+    def current_team_ids(cls, league_id):
+        # Ids of the teams in the league's latest season with known members, as a subquery
+        latest = Season.objects.filter(
+            league_id=league_id, team_seasons__isnull=False
+        ).order_by('-year').values('pk')[:1]
+        return cls.objects.filter(season=models.Subquery(latest)).values('team_id')
+##--------------------------------------------------------------------------##
+##-------------------------------SyncWatermark-------------------------------##
+"""
+    Records how far the updater has synced an entity for a given scope.
+
+    `entity` names what is synced (e.g. 'fixtures', 'team') and `scope`
+    narrows it down (e.g. a league or team id). `synced_until` is the last
+    day whose data is complete, for entities synced by date, and
+    `last_synced` is when the scope was last refreshed. The updater uses
+    them to request only what is missing. `content_hash` and the refresh
+    and change counts tell the refresh scheduler how often a scope's data
+    actually changes.
+"""
+class SyncWatermark(models.Model):
+    entity = models.CharField(max_length=50)
+    scope = models.CharField(max_length=50, blank=True, default='')
+    synced_until = models.DateField(null=True, blank=True)
+    last_synced = models.DateTimeField(default=timezone.now)
+    content_hash = models.CharField(max_length=40, blank=True, default='')
+    refresh_count = models.IntegerField(default=0)
+    change_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['entity', 'scope'], name='unique_sync_watermark'),
+        ]
+        ordering = ['entity', 'scope']
+
+    def __str__(self):
+        return f"{self.entity}:{self.scope} ({self.synced_until or self.last_synced})"
+
+    @classmethod
+    def for_entity(cls, entity):
+        # Returns {scope: SyncWatermark} for every scope of an entity
+        return {mark.scope: mark for mark in cls.objects.filter(entity=entity)}
+
+    @classmethod
+    def advance(cls, entity, scopes, synced_until=None):
+        # Marks the scopes as synced now (and, for date-based entities, complete through synced_until)
+        now = timezone.now()
+        cls.objects.bulk_create(
+            [cls(entity=entity, scope=str(scope), synced_until=synced_until, last_synced=now) for scope in scopes],
+            update_conflicts=True,
+            unique_fields=['entity', 'scope'],
+            update_fields=['synced_until', 'last_synced'],
+        )
+
+    @classmethod
+    def record_refresh(cls, entity, hashes):
+        # Marks the scopes in {scope: content hash} as refreshed now, counting a change
+        # for each scope whose content differs from its previous refresh
+        existing = cls.objects.filter(entity=entity, scope__in=[str(scope) for scope in hashes])
+        existing = {mark.scope: mark for mark in existing}
+        now = timezone.now()
+        new_marks = []
+        for scope, content_hash in hashes.items():
+            mark = existing.get(str(scope))
+            if mark is None:
+                new_marks.append(cls(entity=entity, scope=str(scope), last_synced=now, content_hash=content_hash))
+                continue
+            mark.refresh_count += 1
+            if mark.content_hash and mark.content_hash != content_hash:
+                mark.change_count += 1
+            mark.content_hash = content_hash
+            mark.last_synced = now
+        cls.objects.bulk_update(
+            list(existing.values()), ['last_synced', 'content_hash', 'refresh_count', 'change_count']
+        )
+        cls.objects.bulk_create(new_marks)
+##--------------------------------------------------------------------------##
+##-------------------------------TrackedLeague-------------------------------##
+"""
+    A league the updater keeps in sync, with its update policy.
+
+    `sync_fixtures` enables the daily fixture sync and live polling of the
+    league, `refresh_teams` the refreshes of its teams, players and venues,
+    and `priority` weighs those refreshes against other leagues' when the
+    quota does not cover everything. Leagues are split across updater
+    processes by a stable hash of their id (see `shard_of`).
+"""
+class TrackedLeague(models.Model):
+    league_id = models.IntegerField(primary_key=True)
+    name = models.CharField(max_length=100)
+    active = models.BooleanField(default=True)
+    sync_fixtures = models.BooleanField(default=True)
+    refresh_teams = models.BooleanField(default=True)
+    priority = models.FloatField(default=1.0)
+
+    class Meta:
+        ordering = ['league_id']
+
+    def __str__(self):
+        return f"{self.name} ({self.league_id})"
+
+    @staticmethod
+    def shard_of(league_id, shard_count):
+        # 1-based shard of a league; crc32 rather than hash() so every process agrees
+        return zlib.crc32(str(league_id).encode()) % shard_count + 1
+
+    @classmethod
+    def active_leagues(cls, shard=None):
+        # Returns the active leagues, with their active teams prefetched, of shard (index, count) or of all shards
+        leagues = cls.objects.filter(active=True).prefetch_related(
+            models.Prefetch('teams', queryset=TrackedTeam.objects.filter(active=True))
+        )
+        if shard is None:
+            return list(leagues)
+        index, count = shard
+        return [league for league in leagues if cls.shard_of(league.league_id, count) == index]
+
+    @classmethod
+    def registry(cls, shard=None):
+        # Returns {league id: [team ids]} of the active leagues and teams, as strings like API parameters
+        return {
+            str(league.league_id): [str(team.team_id) for team in league.teams.all()]
+            for league in cls.active_leagues(shard)
+        }
+##--------------------------------------------------------------------------##
+##--------------------------------TrackedTeam--------------------------------##
+"""
+    A team of a tracked league whose team info, players and venue are refreshed.
+"""
+class TrackedTeam(models.Model):
+    league = models.ForeignKey(TrackedLeague, on_delete=models.CASCADE, related_name='teams')
+    team_id = models.IntegerField()
+    active = models.BooleanField(default=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['league', 'team_id'], name='unique_tracked_team'),
+        ]
+        ordering = ['league', 'team_id']
+
+    def __str__(self):
+        return f"{self.team_id} in {self.league_id}"
+##--------------------------------------------------------------------------##
+##---------------------------------UpdateJob---------------------------------##
+"""
+    A queued update job (e.g. refresh a team, sync a day's fixtures).
+
+    `key` identifies the work, so the same job is only queued and run once;
+    the queue message only carries the key. A worker claims a job by
+    moving it from queued to running, which makes duplicate deliveries
+    harmless. `lease_until` is when the job must have made progress: a
+    job still queued or running after it is delivered again, so work of
+    a worker that died mid-job is picked up by another.
+"""
+class UpdateJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    key = models.CharField(max_length=200, unique=True)
+    kind = models.CharField(max_length=50)
+    args = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True, default='')
+    lease_until = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    enqueued_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['enqueued_at']
+
+    def __str__(self):
+        return f"{self.key} ({self.status})"
\ No newline at end of file
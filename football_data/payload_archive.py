@@ -0,0 +1,110 @@
+import gzip
+import heapq
+import json
+import logging
+import os
+import threading
+import zlib
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from .api_cache import canonical_params
+
+logger = logging.getLogger(__name__)
+
+
+class PayloadArchive:
+    """
+    Append-only archive of raw API responses as gzip-compressed NDJSON.
+
+    Responses go to `<directory>/<endpoint>/<YYYY-MM-DD>/<segment>.ndjson.gz`,
+    partitioned by endpoint and the UTC date they were fetched. Each line is
+    `{"endpoint", "params", "fetched_at", "body"}` with the body embedded as
+    received. Every process writes its own segments, starting a new one after
+    `segment_bytes` of uncompressed data, and flushes after each response, so
+    a crash loses at most the response being written. Readers skip a
+    truncated tail.
+    """
+    def __init__(self, directory, segment_bytes=None):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes or 64 * 1024 * 1024
+        self._lock = threading.Lock()
+        self._segments = {}  # (endpoint, day) -> [gzip file, uncompressed bytes written]
+        self._sequence = 0
+
+    def append(self, endpoint, params, raw, fetched_at=None):
+        endpoint = endpoint.strip('/')
+        fetched_at = fetched_at or datetime.now(dt_timezone.utc)
+        if b'\n' in raw:
+            # Keep one response per line
+            raw = json.dumps(json.loads(raw), separators=(',', ':')).encode()
+        header = json.dumps({
+            'endpoint': endpoint,
+            'params': dict(canonical_params(params)),
+            'fetched_at': fetched_at.isoformat(),
+        }, separators=(',', ':')).encode()
+        line = header[:-1] + b',"body":' + raw + b'}\n'
+
+        with self._lock:
+            segment = self._segment_for(endpoint, fetched_at.date().isoformat())
+            segment[0].write(line)
+            segment[0].flush()
+            segment[1] += len(line)
+            if segment[1] >= self.segment_bytes:
+                self._close_segment((endpoint, fetched_at.date().isoformat()))
+
+    def _segment_for(self, endpoint, day):
+        key = (endpoint, day)
+        segment = self._segments.get(key)
+        if segment is None:
+            # Segments of earlier days of this endpoint will not be written to again
+            for other in [other for other in self._segments if other[0] == endpoint]:
+                self._close_segment(other)
+            directory = self.directory / endpoint / day
+            directory.mkdir(parents=True, exist_ok=True)
+            self._sequence += 1
+            name = f"{datetime.now(dt_timezone.utc):%H%M%S}-{os.getpid()}-{self._sequence}.ndjson.gz"
+            segment = self._segments[key] = [gzip.open(directory / name, 'ab'), 0]
+        return segment
+
+    def _close_segment(self, key):
+        segment = self._segments.pop(key, None)
+        if segment is not None:
+            segment[0].close()
+
+    def close(self):
+        with self._lock:
+            for key in list(self._segments):
+                self._close_segment(key)
+
+    def endpoints(self):
+        return sorted(path.name for path in self.directory.iterdir() if path.is_dir()) if self.directory.exists() else []
+
+    def days(self, endpoint, date_from=None, date_to=None):
+        directory = self.directory / endpoint.strip('/')
+        if not directory.exists():
+            return []
+        days = sorted(path.name for path in directory.iterdir() if path.is_dir())
+        return [
+            day for day in days
+            if (date_from is None or day >= date_from.isoformat()) and (date_to is None or day <= date_to.isoformat())
+        ]
+
+    def iter_records(self, endpoint, date_from=None, date_to=None):
+        """
+        Yields the archived responses of an endpoint in the order they were fetched.
+
+        Segments of the same day (e.g. from several processes) are merged by fetch time.
+        """
+        for day in self.days(endpoint, date_from, date_to):
+            paths = sorted((self.directory / endpoint.strip('/') / day).glob('*.ndjson.gz'))
+            yield from heapq.merge(*(self._read_segment(path) for path in paths), key=lambda record: record['fetched_at'])
+
+    def _read_segment(self, path):
+        try:
+            with gzip.open(path, 'rb') as f:
+                for line in f:
+                    if line.endswith(b'\n'):
+                        yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile, zlib.error):
+            # The process writing this segment stopped mid-response; everything before it was read
+            logger.warning(f"Archive segment {path} is truncated; reading stopped at the damaged part")
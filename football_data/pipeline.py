@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class WritePipeline:
+    """
+    Overlaps fetching with database writes.
+
+    A producer runs in a background thread and hands fetched items over a
+    bounded queue; the thread that calls run() is the only one writing to
+    the database, in batches of up to `batch_size` items. When the writer
+    falls behind, the queue fills up and producers wait (a backpressure
+    event) instead of piling responses up in memory.
+    """
+    def __init__(self, write_batch, queue_size=None, batch_size=None):
+        self.write_batch = write_batch
+        self.queue = queue.Queue(maxsize=queue_size or getattr(settings, 'FOOTBALL_PIPELINE_QUEUE_SIZE', 8))
+        self.batch_size = batch_size or getattr(settings, 'FOOTBALL_PIPELINE_BATCH_SIZE', 5)
+        self._cancelled = threading.Event()
+        self._on_cancel = []  # Called when the pipeline is cancelled, e.g. to cancel pending fetches
+        self._producer_error = None
+        self._lock = threading.Lock()
+        self.stats = {
+            'items': 0,
+            'batches': 0,
+            'written': 0,
+            'backpressure_events': 0,
+            'max_queue_depth': 0,
+            'queue_depth_total': 0,
+            'fetch_seconds': [],
+            'queue_wait_seconds': [],
+            'write_seconds': [],
+            'writer_idle_seconds': 0.0,
+        }
+
+    @property
+    def cancelled(self):
+        # True once a writer failure stopped the pipeline; producers should not fetch any more
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        # Drops items put from now on and cancels the producer coroutines started by gather()
+        with self._lock:
+            self._cancelled.set()
+            for callback in self._on_cancel:
+                callback()
+
+    async def gather(self, *coroutines):
+        """
+        asyncio.gather() for producer coroutines that stops them when the pipeline is cancelled.
+
+        Coroutines still waiting to fetch (e.g. for the client's concurrency
+        limit) are cancelled, so a writer failure spends no more quota.
+        """
+        loop = asyncio.get_running_loop()
+        tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+
+        def cancel_tasks():
+            for task in tasks:
+                task.cancel()
+
+        def on_cancel():
+            loop.call_soon_threadsafe(cancel_tasks)
+
+        with self._lock:
+            self._on_cancel.append(on_cancel)
+            if self._cancelled.is_set():
+                cancel_tasks()
+        try:
+            return await asyncio.gather(*tasks)
+        finally:
+            with self._lock:
+                self._on_cancel.remove(on_cancel)
+
+    def put(self, item, fetch_seconds=None):
+        # Called by producers in any thread; blocks while the queue is full
+        if self._cancelled.is_set():
+            return
+        entry = (item, time.monotonic())
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self.stats['backpressure_events'] += 1
+            self.queue.put(entry)
+        if fetch_seconds is not None:
+            with self._lock:
+                self.stats['fetch_seconds'].append(fetch_seconds)
+
+    async def aput(self, item, fetch_seconds=None):
+        # put() for producers running in an event loop; waiting for space does not block the loop
+        await asyncio.get_running_loop().run_in_executor(None, self.put, item, fetch_seconds)
+
+    def run(self, produce):
+        """
+        Runs `produce(pipeline)` in a background thread and writes what it puts until it returns.
+
+        `write_batch(items)` is called with lists of items and may return the
+        number of rows it wrote. An exception from the writer cancels the
+        pipeline (producers started with gather() stop, items still being
+        fetched are dropped) and is re-raised; one from the producer is
+        re-raised after the queue has been drained.
+        """
+        producer = threading.Thread(target=self._produce, args=(produce,), name='pipeline-producer', daemon=True)
+        producer.start()
+        try:
+            self._drain()
+        except BaseException:
+            self.cancel()
+            self._discard_until_done()
+            raise
+        finally:
+            producer.join()
+        if self._producer_error is not None:
+            raise self._producer_error
+        return self.stats
+
+    def _produce(self, produce):
+        try:
+            produce(self)
+        except BaseException as e:
+            self._producer_error = e
+        finally:
+            self.queue.put((_DONE, None))
+
+    def _drain(self):
+        batch = []
+        while True:
+            waiting_since = time.monotonic()
+            item, queued_at = self.queue.get()
+            now = time.monotonic()
+            self.stats['writer_idle_seconds'] += now - waiting_since
+            if item is _DONE:
+                break
+            depth = self.queue.qsize() + 1
+            self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], depth)
+            self.stats['queue_depth_total'] += depth
+            self.stats['queue_wait_seconds'].append(now - queued_at)
+            self.stats['items'] += 1
+            batch.append(item)
+            # Write as soon as a batch is full or nothing else is waiting
+            if len(batch) >= self.batch_size or self.queue.empty():
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch):
+        started = time.monotonic()
+        written = self.write_batch(batch)
+        self.stats['write_seconds'].append(time.monotonic() - started)
+        self.stats['batches'] += 1
+        self.stats['written'] += written if written is not None else len(batch)
+
+    def _discard_until_done(self):
+        while True:
+            item, _ = self.queue.get()
+            if item is _DONE:
+                return
+
+    def summary(self):
+        # Aggregated statistics suitable for logging
+        stats = self.stats
+        items = stats['items']
+
+        def spread(values):
+            if not values:
+                return 0.0, 0.0
+            ordered = sorted(values)
+            return ordered[len(ordered) // 2], ordered[-1]
+
+        fetch_p50, fetch_max = spread(stats['fetch_seconds'])
+        wait_p50, wait_max = spread(stats['queue_wait_seconds'])
+        write_p50, write_max = spread(stats['write_seconds'])
+        return {
+            'items': items,
+            'batches': stats['batches'],
+            'written': stats['written'],
+            'backpressure_events': stats['backpressure_events'],
+            'max_queue_depth': stats['max_queue_depth'],
+            'avg_queue_depth': stats['queue_depth_total'] / items if items else 0.0,
+            'fetch_p50': fetch_p50,
+            'fetch_max': fetch_max,
+            'queue_wait_p50': wait_p50,
+            'queue_wait_max': wait_max,
+            'write_p50': write_p50,
+            'write_max': write_max,
+            'writer_idle': stats['writer_idle_seconds'],
+        }
@@ -0,0 +1,184 @@
+import logging
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.apps import apps as current_apps
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+logger = logging.getLogger(__name__)
+
+# Schema without the indexes designed for the views, and the current one, with them and with
+# the league memberships (TeamSeason) the views look a league's teams up in. AFTER is the latest
+# migration: the queries after are run on the app's own models, as the views run them.
+BEFORE = ('football_data', '0007_updatejob')
+AFTER = ('football_data', '0009_teamseason')
+
+
+def day_filter(probe, after):
+    # The fixtures of a day: date__date before, the indexed match_date after
+    return {'match_date' if after else 'date__date': probe['day']}
+
+
+def league_team_ids(m, probe, after):
+    # A league's teams: those of its country before, its latest season's members after
+    if after:
+        return m['TeamSeason'].current_team_ids(probe['league'])
+    return m['Team'].objects.filter(country__league__id=probe['league']).values('id')
+
+
+def teams_leagues(m, probe, after):
+    # The leagues shown for a page of teams: one lookup by country per team before, one
+    # prefetch of the page's memberships after (see TeamSeason.prefetch)
+    if after:
+        return m['TeamSeason'].objects.filter(team_id__in=probe['teams']).select_related('season__league')
+    return m['League'].objects.filter(country=probe['country'])[:1]
+
+
+# The queries the views run: name -> factory(models, probe, after) returning the queryset
+VIEW_QUERIES = {
+    'fixtures of a day': lambda m, probe, after: m['Fixture'].objects.filter(
+        **day_filter(probe, after)
+    ).select_related('league', 'team_home', 'team_away', 'season'),
+    'fixtures of a day and league': lambda m, probe, after: m['Fixture'].objects.filter(
+        **day_filter(probe, after), league__id=probe['league']
+    ).select_related('league', 'team_home', 'team_away', 'season'),
+    'players page': lambda m, probe, after: m['Player'].objects.all()[:20],
+    'players of a team': lambda m, probe, after: m['Player'].objects.filter(team__id=probe['team'])[:20],
+    'players of a league': lambda m, probe, after: m['Player'].objects.filter(
+        team__in=league_team_ids(m, probe, after)
+    )[:20],
+    'teams page': lambda m, probe, after: m['Team'].objects.select_related('country')[:12],
+    'teams of a league': lambda m, probe, after: m['Team'].objects.select_related('country').filter(
+        id__in=league_team_ids(m, probe, after)
+    )[:12],
+    'leagues': lambda m, probe, after: m['League'].objects.all(),
+    "leagues of a page of teams": teams_leagues,
+}
+
+
+class QueryBenchmark:
+    """
+    Measures the views' queries on a large synthetic dataset, before and after the view indexes.
+
+    A throwaway test database is migrated to BEFORE and filled with
+    `leagues` leagues (one country each) of `teams_per_league` teams with
+    `players_per_team` players, playing a round a week for `weeks` weeks.
+    Each query is explained and timed (median of `repeat` runs), then the
+    database is migrated to AFTER, which fills match_date, adds the indexes
+    and records the teams of every fixture as members of its season, and
+    everything is measured again.
+    """
+    def __init__(self, leagues=100, teams_per_league=20, players_per_team=30, weeks=104, repeat=20, seed=0):
+        self.leagues = leagues
+        self.teams_per_league = teams_per_league
+        self.players_per_team = players_per_team
+        self.weeks = weeks
+        self.repeat = repeat
+        self.rng = random.Random(seed)
+
+    def run(self):
+        # Returns {query name: {'before': measurement, 'after': measurement}}, plus the row counts
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            call_command('migrate', *BEFORE, verbosity=0)
+            before_apps = MigrationExecutor(connection).loader.project_state(BEFORE).apps
+            models = self._models(before_apps)
+            started = time.perf_counter()
+            rows, probe = self.generate(models)
+            logger.info(f"Generated {sum(rows.values())} rows in {time.perf_counter() - started:.1f}s")
+            results = {name: {'before': self.measure(factory, models, probe, False)}
+                       for name, factory in VIEW_QUERIES.items()}
+
+            started = time.perf_counter()
+            call_command('migrate', *AFTER, verbosity=0)
+            logger.info(f"Migrated to {AFTER[1]} in {time.perf_counter() - started:.1f}s")
+            models = self._models(current_apps, 'TeamSeason')
+            for name, factory in VIEW_QUERIES.items():
+                results[name]['after'] = self.measure(factory, models, probe, True)
+            return results, rows
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _models(self, apps, *extra):
+        return {
+            name: apps.get_model('football_data', name)
+            for name in ('Country', 'League', 'Season', 'Team', 'Player', 'Fixture', *extra)
+        }
+
+    def generate(self, m):
+        # Fills the database; returns the row counts and the ids the queries look up
+        now = datetime.now(dt_timezone.utc)
+        first_day = (now - timedelta(weeks=self.weeks)).date()
+        countries, leagues, seasons, teams, players, fixtures = [], [], [], [], [], []
+        league_teams = {}
+        for league_index in range(1, self.leagues + 1):
+            country = m['Country'](name=f"Country {league_index:04d}", code=f"{league_index % 1000:03d}", last_updated=now)
+            countries.append(country)
+            leagues.append(m['League'](id=league_index, name=f"League {league_index}", type='League',
+                                       country_id=country.name, logo_url='https://example.com/l.png', last_updated=now))
+            seasons.append(m['Season'](id=league_index, year=first_day.year, start_date=first_day,
+                                       end_date=now.date(), current=True, league_id=league_index, last_updated=now))
+            league_teams[league_index] = []
+            for team_index in range(self.teams_per_league):
+                team_id = league_index * 1000 + team_index
+                league_teams[league_index].append(team_id)
+                teams.append(m['Team'](id=team_id, name=f"Team {self.rng.randrange(10 ** 6):06d}", country_id=country.name,
+                                       logo_url='https://example.com/t.png', last_updated=now, last_seen=now))
+                for player_index in range(self.players_per_team):
+                    players.append(m['Player'](
+                        id=team_id * 100 + player_index, name=f"Player {team_id}-{player_index}",
+                        firstname=f"First{self.rng.randrange(500)}", lastname=f"Last{self.rng.randrange(5000):04d}",
+                        team_id=team_id, last_updated=now, last_seen=now,
+                    ))
+
+        fixture_id = 0
+        for league_index, team_ids in league_teams.items():
+            for week in range(self.weeks):
+                # Each league plays on its own weekday, kick-offs spread over the day
+                day = first_day + timedelta(weeks=week, days=league_index % 7)
+                order = team_ids[:]
+                self.rng.shuffle(order)
+                for match in range(len(order) // 2):
+                    fixture_id += 1
+                    kickoff = datetime(day.year, day.month, day.day, tzinfo=dt_timezone.utc) + timedelta(
+                        hours=self.rng.randrange(11, 24), minutes=self.rng.choice([0, 15, 30, 45])
+                    )
+                    fixtures.append(m['Fixture'](
+                        id=fixture_id, time_zone='UTC', date=kickoff, timestamp=int(kickoff.timestamp()),
+                        status_long='Match Finished', status_short='FT', status_elapsed=90,
+                        league_id=league_index, season_id=league_index, round=f"Regular Season - {week + 1}",
+                        team_home_id=order[2 * match], team_away_id=order[2 * match + 1],
+                        goals_home=self.rng.randrange(5), goals_away=self.rng.randrange(4),
+                        last_updated=now, last_seen=now,
+                    ))
+
+        for name, objs in (('Country', countries), ('League', leagues), ('Season', seasons),
+                           ('Team', teams), ('Player', players), ('Fixture', fixtures)):
+            m[name].objects.bulk_create(objs, batch_size=1000)
+        rows = {'countries': len(countries), 'leagues': len(leagues), 'teams': len(teams),
+                'players': len(players), 'fixtures': len(fixtures)}
+
+        # Look-ups of a league in the middle of the range and of a day it played on
+        league = self.leagues // 2 or 1
+        probe = {
+            'league': league,
+            'team': league_teams[league][0],
+            'teams': league_teams[league][:12],
+            'country': leagues[league - 1].country_id,
+            'day': (first_day + timedelta(weeks=self.weeks // 2, days=league % 7)),
+        }
+        return rows, probe
+
+    def measure(self, factory, models, probe, after):
+        # Returns the query's plan, row count and median time in milliseconds
+        plan = factory(models, probe, after).explain()
+        timings = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            found = len(list(factory(models, probe, after)))
+            timings.append((time.perf_counter() - started) * 1000)
+        return {'plan': plan, 'rows': found, 'ms': statistics.median(timings)}
@@ -0,0 +1,121 @@
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from .exceptions import QuotaExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Token bucket for requests per minute plus a daily quota ledger.
+
+    State lives in a small SQLite file, so every process pointing at the same
+    file shares one bucket and one ledger. Each acquire() runs inside an
+    IMMEDIATE transaction, which serializes the read-modify-write across
+    processes; threads of one process are serialized by a lock.
+
+    The quota day follows the API's reset at 00:00 UTC.
+    """
+    def __init__(self, path=None, requests_per_minute=None, burst=None, daily_limit=None, reserve=None,
+                 clock=time.time, sleep=time.sleep):
+        self.path = str(path or getattr(settings, 'FOOTBALL_API_RATE_LIMIT_PATH', settings.BASE_DIR / 'api_quota.sqlite3'))
+        self.requests_per_minute = requests_per_minute or getattr(settings, 'FOOTBALL_API_REQUESTS_PER_MINUTE', 30)
+        self.burst = burst or getattr(settings, 'FOOTBALL_API_BURST', 5)
+        self.daily_limit = daily_limit or getattr(settings, 'FOOTBALL_API_DAILY_LIMIT', 100)
+        self.reserve = reserve if reserve is not None else getattr(settings, 'FOOTBALL_API_QUOTA_RESERVE', 5)
+        self.clock = clock
+        self.sleep = sleep
+        self.waited = 0.0  # Total seconds this limiter has slept
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS bucket (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS quota (day TEXT PRIMARY KEY, used INTEGER NOT NULL, daily_limit INTEGER)'
+        )
+
+    def _day(self, now):
+        return datetime.fromtimestamp(now, dt_timezone.utc).date().isoformat()
+
+    def acquire(self):
+        # Blocks until a request may be sent and charges it to today's quota
+        while True:
+            wait_time = self._try_acquire()
+            if wait_time <= 0:
+                return
+            self.waited += wait_time
+            self.sleep(wait_time)
+
+    def _try_acquire(self):
+        # Takes a token if one is available; otherwise returns the seconds until the next one
+        rate = self.requests_per_minute / 60.0
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = self.clock()
+                day = self._day(now)
+                used, daily_limit, reported_limit = self._quota_row(day)
+                if used >= daily_limit - self.reserve:
+                    raise QuotaExceeded(f"Daily API quota used up: {used} of {daily_limit} requests (reserve {self.reserve})")
+
+                row = self._conn.execute('SELECT tokens, updated_at FROM bucket WHERE name = ?', ('default',)).fetchone()
+                tokens, updated_at = row if row else (self.burst, now)
+                tokens = min(self.burst, tokens + max(now - updated_at, 0) * rate)
+
+                wait_time = 0.0
+                if tokens >= 1:
+                    tokens -= 1
+                    self._conn.execute('REPLACE INTO quota (day, used, daily_limit) VALUES (?, ?, ?)',
+                                       (day, used + 1, reported_limit))
+                else:
+                    wait_time = (1 - tokens) / rate
+                self._conn.execute('REPLACE INTO bucket (name, tokens, updated_at) VALUES (?, ?, ?)',
+                                   ('default', tokens, now))
+                self._conn.execute('COMMIT')
+                return wait_time
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def _quota_row(self, day):
+        # Returns (used, effective limit, limit reported by the API or None)
+        row = self._conn.execute('SELECT used, daily_limit FROM quota WHERE day = ?', (day,)).fetchone()
+        used, reported_limit = row if row else (0, None)
+        return used, reported_limit or self.daily_limit, reported_limit
+
+    def sync(self, remaining, daily_limit=None):
+        # Aligns the ledger with the quota reported by the API (x-ratelimit-requests-* headers)
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                day = self._day(self.clock())
+                used, effective_limit, reported_limit = self._quota_row(day)
+                daily_limit = daily_limit or reported_limit
+                # Other processes may have requests in flight the API has not counted yet
+                used = max(used, (daily_limit or effective_limit) - remaining)
+                self._conn.execute('REPLACE INTO quota (day, used, daily_limit) VALUES (?, ?, ?)',
+                                   (day, used, daily_limit))
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def used_today(self):
+        with self._lock:
+            return self._quota_row(self._day(self.clock()))[0]
+
+    def remaining(self):
+        # Requests still available today, after the reserve
+        with self._lock:
+            used, daily_limit, _ = self._quota_row(self._day(self.clock()))
+        return max(daily_limit - self.reserve - used, 0)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
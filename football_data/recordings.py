@@ -0,0 +1,56 @@
+import json
+import logging
+import os
+from pathlib import Path
+from django.utils import timezone
+from .api_cache import canonical_params, make_cache_key
+
+logger = logging.getLogger(__name__)
+
+
+class RecordingStore:
+    """
+    Saves API responses to disk and serves them back.
+
+    Each response is one JSON file, `<directory>/<endpoint>/<digest>.json`,
+    where the digest is taken from the request's canonical cache key, so
+    parameter order and int/str values do not matter.
+    """
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def path_for(self, endpoint, params=None):
+        endpoint = endpoint.strip('/')
+        digest = make_cache_key(endpoint, params).rsplit(':', 1)[-1]
+        return self.directory / endpoint / f"{digest}.json"
+
+    def save(self, endpoint, params, body, status=200):
+        path = self.path_for(endpoint, params)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        recording = {
+            'endpoint': endpoint.strip('/'),
+            'params': dict(canonical_params(params)),
+            'status': status,
+            'recorded_at': timezone.now().isoformat(),
+            'body': body,
+        }
+        # Write to a temporary file first so a crash never leaves a truncated recording
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(recording, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        return path
+
+    def load(self, endpoint, params=None):
+        # Returns the recording dict or None if this request was never recorded
+        path = self.path_for(endpoint, params)
+        if not path.exists():
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def iter_recordings(self, endpoint=None):
+        pattern = f"{endpoint.strip('/')}/*.json" if endpoint else '*/*.json'
+        for path in sorted(self.directory.glob(pattern)):
+            with open(path, encoding='utf-8') as f:
+                yield json.load(f)
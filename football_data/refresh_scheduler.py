@@ -0,0 +1,169 @@
+import hashlib
+import json
+import logging
+import math
+from dataclasses import dataclass
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import Fixture, Player, SyncWatermark, Team
+
+logger = logging.getLogger(__name__)
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# How long (seconds) refreshed data is considered fresh, per refreshable entity
+DEFAULT_REFRESH_TTLS = {
+    'countries_and_leagues': 7 * DAY,
+    'team': 7 * DAY,  # Team info and its players
+    'venue': 7 * DAY,
+}
+
+# Estimated API calls per refresh: a team costs its info plus up to 4 pages of players
+PLAYERS_PER_PAGE = 20
+MAX_PLAYER_PAGES = 4
+ENTITY_COSTS = {'countries_and_leagues': 2, 'venue': 1}
+
+# Expected share of refreshes that bring new data, before any refresh has been observed.
+# Squads change far more often than venues or the list of leagues.
+PRIOR_CHANGE_RATES = {'countries_and_leagues': 0.2, 'team': 0.5, 'venue': 0.05}
+
+# Priority multiplier for teams that play within FIXTURE_WINDOW of now (squads and injuries change around matches)
+FIXTURE_BOOST = 1.5
+FIXTURE_WINDOW = 3 * DAY
+
+# Staleness of data never refreshed; caps how much an old refresh can outweigh everything else
+MAX_STALENESS = 3.0
+
+
+def content_hash(data):
+    # Digest of an API payload, used to tell whether a refresh brought new data
+    return hashlib.sha1(json.dumps(data, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+@dataclass
+class RefreshTask:
+    entity: str
+    scope: str
+    cost: int
+    priority: float
+
+
+class RefreshScheduler:
+    """
+    Chooses which entities to refresh in a run so that the remaining quota buys the most freshness.
+
+    Each candidate's priority is its staleness (age over TTL, capped at
+    MAX_STALENESS) times how often its data changed when it was refreshed
+    before, boosted for teams with a fixture close to now and weighted by
+    their league's priority. Data is a candidate once it is `min_staleness`
+    of its TTL old. The chosen set
+    maximises total priority within the budget (a 0/1 knapsack over the
+    estimated API calls of each refresh).
+    """
+    def __init__(self, top_leagues, ttls=None, min_staleness=None, clock=None,
+                 league_priorities=None, global_tasks=True):
+        self.top_leagues = top_leagues
+        self.league_priorities = league_priorities or {}
+        # Whether refreshes that are not per league (countries and leagues) are planned here
+        self.global_tasks = global_tasks
+        self.ttls = {**DEFAULT_REFRESH_TTLS, **(ttls or getattr(settings, 'FOOTBALL_REFRESH_TTLS', {}))}
+        self.min_staleness = min_staleness if min_staleness is not None else getattr(settings, 'FOOTBALL_REFRESH_MIN_STALENESS', 0.5)
+        # Looked up on each call, so a patched timezone.now (e.g. the simulator's virtual time) is used
+        self.clock = clock or (lambda: timezone.now())
+
+    def candidates(self):
+        now = self.clock()
+        team_ids = [team_id for team_ids in self.top_leagues.values() for team_id in team_ids]
+        watermarks = {
+            (mark.entity, mark.scope): mark
+            for mark in SyncWatermark.objects.filter(entity__in=list(self.ttls))
+        }
+        existing_teams = set(str(pk) for pk in Team.objects.filter(pk__in=team_ids).values_list('pk', flat=True))
+        player_counts = {
+            str(row['team']): row['count']
+            for row in Player.objects.filter(team__in=team_ids).values('team').annotate(count=Count('id'))
+        }
+        playing = Fixture.objects.filter(
+            date__gte=now - timezone.timedelta(seconds=FIXTURE_WINDOW),
+            date__lte=now + timezone.timedelta(seconds=FIXTURE_WINDOW),
+        ).filter(Q(team_home__in=team_ids) | Q(team_away__in=team_ids))
+        playing = {str(pk) for pair in playing.values_list('team_home', 'team_away') for pk in pair}
+
+        tasks = []
+        if self.global_tasks:
+            tasks.append(self._task('countries_and_leagues', '', ENTITY_COSTS['countries_and_leagues'], watermarks, now))
+        for league_id, league_team_ids in self.top_leagues.items():
+            weight = self.league_priorities.get(league_id, 1.0)
+            for team_id in league_team_ids:
+                boost = (FIXTURE_BOOST if team_id in playing else 1.0) * weight
+                pages = math.ceil(player_counts[team_id] / PLAYERS_PER_PAGE) if team_id in player_counts else MAX_PLAYER_PAGES
+                cost = 1 + min(max(pages, 1), MAX_PLAYER_PAGES)
+                team_task = self._task('team', team_id, cost, watermarks, now, boost)
+                venue_task = None
+                if team_id in existing_teams:
+                    # A venue refresh on its own needs the team to be in the database already
+                    venue_task = self._task('venue', team_id, ENTITY_COSTS['venue'], watermarks, now, boost)
+                if team_task is not None and venue_task is not None:
+                    # A team refresh stores the venue from the same response, so it is worth both
+                    team_task.priority += venue_task.priority
+                tasks.extend([team_task, venue_task])
+        return [task for task in tasks if task is not None]
+
+    def _task(self, entity, scope, cost, watermarks, now, boost=1.0):
+        mark = watermarks.get((entity, scope))
+        prior = PRIOR_CHANGE_RATES.get(entity, 0.5)
+        if mark is None:
+            staleness = MAX_STALENESS
+            change_rate = prior
+        else:
+            staleness = min((now - mark.last_synced).total_seconds() / self.ttls[entity], MAX_STALENESS)
+            # Observed rate, smoothed towards the prior while there are few refreshes to go by
+            change_rate = (mark.change_count + 2 * prior) / (mark.refresh_count + 2)
+        if staleness < self.min_staleness:
+            return None
+        return RefreshTask(entity, scope, cost, staleness * boost * change_rate)
+
+    def plan(self, budget):
+        """
+        Returns {entity: [scopes]} of the refreshes to run with at most `budget` API calls.
+        """
+        tasks = self.candidates()
+        chosen = choose_tasks(tasks, budget)
+        plan = {entity: [] for entity in self.ttls}
+        for task in chosen:
+            plan[task.entity].append(task.scope)
+        # Venues of refreshed teams come with the team info; their own calls are left for another round
+        plan['venue'] = [scope for scope in plan['venue'] if scope not in plan['team']]
+        logger.info(
+            f"Refresh plan: {len(chosen)} of {len(tasks)} stale candidates within a budget of {budget} calls "
+            f"(estimated cost {sum(task.cost for task in chosen)}, "
+            f"priority {sum(task.priority for task in chosen):.1f} of {sum(task.priority for task in tasks):.1f})"
+        )
+        return plan
+
+
+def choose_tasks(tasks, budget):
+    # 0/1 knapsack: the tasks with the highest total priority whose costs fit the budget
+    budget = max(int(budget), 0)
+    best = [0.0] * (budget + 1)
+    taken = []
+    for task in tasks:
+        row = [False] * (budget + 1)
+        for spent in range(budget, task.cost - 1, -1):
+            value = best[spent - task.cost] + task.priority
+            if value > best[spent]:
+                best[spent] = value
+                row[spent] = True
+        taken.append(row)
+
+    chosen = []
+    spent = budget
+    for task, row in zip(reversed(tasks), reversed(taken)):
+        if row[spent]:
+            chosen.append(task)
+            spent -= task.cost
+    chosen.reverse()
+    return chosen
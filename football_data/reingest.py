@@ -0,0 +1,141 @@
+import logging
+import time
+from datetime import datetime
+from django.db import transaction
+from django.utils import timezone
+from .bulk_writes import batch_size, bulk_upsert
+from .models import League, Team, Player
+from .updaters import PLAYER_UPDATE_FIELDS, player_from_info, season_for, team_from_info
+
+logger = logging.getLogger(__name__)
+
+# Endpoints in the order they are replayed, so rows other rows refer to are written first
+REINGEST_ORDER = ('countries', 'leagues', 'teams', 'players', 'fixtures')
+
+
+class Reingester:
+    """
+    Replays archived API responses through the updater's mapping and persistence code.
+
+    Used after the mapping changed (e.g. a new column is filled) to rebuild the
+    tables from the payload archive without any API call. Responses are
+    replayed in the order they were fetched, so the latest payload of a row
+    wins, and rows are written in batches of FOOTBALL_DB_BATCH_SIZE, one
+    transaction per batch. Refresh watermarks are not touched: replayed data
+    is no fresher than it was.
+    """
+    def __init__(self, updater, archive):
+        self.updater = updater
+        self.archive = archive
+        self.stats = {}  # endpoint -> responses, rows, failed batches and seconds
+
+    def run(self, endpoints=None, date_from=None, date_to=None):
+        for endpoint in endpoints or REINGEST_ORDER:
+            if endpoint not in REINGEST_ORDER:
+                logger.warning(f"Responses of endpoint {endpoint} cannot be reingested")
+                continue
+            stats = self.stats[endpoint] = {'responses': 0, 'rows': 0, 'failed_batches': 0, 'seconds': 0.0}
+            started = time.monotonic()
+            records = self._count(self.archive.iter_records(endpoint, date_from, date_to), stats)
+            getattr(self, f"_reingest_{endpoint}")(records, stats)
+            stats['seconds'] = time.monotonic() - started
+            logger.info(
+                f"Reingested {endpoint}: {stats['rows']} rows from {stats['responses']} responses "
+                f"in {stats['seconds']:.2f}s ({rows_per_second(stats['rows'], stats['seconds']):.0f} rows/s)"
+            )
+        return self.stats
+
+    def _count(self, records, stats):
+        for record in records:
+            stats['responses'] += 1
+            yield record
+
+    def _write(self, write, items, stats):
+        # Writes one batch in its own transaction; a failing batch is logged and skipped.
+        # `write` returns the number of rows it wrote.
+        try:
+            with transaction.atomic():
+                stats['rows'] += write(items)
+        except Exception as e:
+            self.updater.identity_map.clear()
+            stats['failed_batches'] += 1
+            logger.error(f"Error reingesting a batch: {str(e)}")
+
+    def _batches(self, items):
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size():
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _reingest_countries(self, records, stats):
+        for record in records:
+            self._write(self.updater.write_countries, record['body'], stats)
+
+    def _reingest_leagues(self, records, stats):
+        for record in records:
+            self._write(self.updater.write_leagues, record['body'], stats)
+
+    def _reingest_teams(self, records, stats):
+        # Team info and team lists both carry a team and its venue per item; a list of a
+        # league's teams in a season also tells which teams play in it
+        now = timezone.now()
+        items = (
+            (record['params'], record['fetched_at'], item) for record in records for item in record['body']['response']
+        )
+        for batch in self._batches(items):
+            self._write(lambda batch: self._write_teams(batch, now), batch, stats)
+
+    def _write_teams(self, items, now):
+        teams = {item['team']['id']: team_from_info(item['team'], now) for _, _, item in items}
+        self.updater.write_teams(list(teams.values()))
+        memberships = {}
+        refreshed = {}  # Season when fetched -> ids of teams whose info was fetched
+        for params, fetched_at, item in items:
+            venue_info = item.get('venue') or {}
+            if venue_info.get('id') is not None:
+                self.updater.write_venue(venue_info, teams[item['team']['id']])
+            if 'league' in params and 'season' in params:
+                memberships.setdefault((int(params['league']), int(params['season'])), []).append(item['team']['id'])
+            elif 'id' in params:
+                season = season_for(datetime.fromisoformat(fetched_at).date())
+                refreshed.setdefault(season, []).append(item['team']['id'])
+        for (league_id, year), team_ids in memberships.items():
+            self.updater.write_team_seasons(league_id, year, team_ids)
+        # A refresh of a tracked team also recorded it in its tracked leagues' season
+        for season, team_ids in refreshed.items():
+            self.updater.write_tracked_memberships(team_ids, season)
+        return len(teams)
+
+    def _reingest_players(self, records, stats):
+        # The team of a players response is the one it was requested for
+        now = timezone.now()
+        players = (
+            player_from_info(player['player'], Team(id=int(record['params']['team'])), now)
+            for record in records if 'team' in record['params']
+            for player in record['body']['response']
+        )
+        for batch in self._batches(players):
+            self._write(self._write_players, batch, stats)
+
+    def _write_players(self, players):
+        # Players of teams that are not stored cannot be kept
+        players = [player for player in players if self.updater.identity_map.get(Team, player.team_id) is not None]
+        self.updater.record_writes(Player, bulk_upsert(Player, players, PLAYER_UPDATE_FIELDS))
+        return len(players)
+
+    def _reingest_fixtures(self, records, stats):
+        # Date responses hold every league's fixtures; only those of leagues that are stored were kept when fetched
+        fixtures = (
+            fixture for record in records for fixture in record['body']['response']
+            if self.updater.identity_map.get(League, fixture['league']['id']) is not None
+        )
+        for batch in self._batches(fixtures):
+            self._write(lambda batch: sum(self.updater.write_fixtures(batch)), batch, stats)
+
+
+def rows_per_second(rows, seconds):
+    return rows / seconds if seconds else 0.0
@@ -0,0 +1,141 @@
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from django.conf import settings
+from django.utils import timezone
+from .exceptions import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying: timeouts, rate limiting and server-side failures
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value):
+    # Retry-After is either a number of seconds or an HTTP date
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - timezone.now()).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Decides whether a failed request is retried and how long to wait first.
+
+    The server's Retry-After header wins over the exponential backoff. A wait
+    longer than `max_delay` is not worth stalling the run for, so callers
+    give up instead.
+    """
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=None, retryable_statuses=RETRYABLE_STATUSES):
+        self.max_attempts = max_attempts or getattr(settings, 'FOOTBALL_API_MAX_ATTEMPTS', 4)
+        self.base_delay = base_delay if base_delay is not None else getattr(settings, 'FOOTBALL_API_RETRY_BASE_DELAY', 1.0)
+        self.max_delay = max_delay if max_delay is not None else getattr(settings, 'FOOTBALL_API_RETRY_MAX_DELAY', 30.0)
+        self.retryable_statuses = retryable_statuses
+
+    def is_retryable(self, status_code):
+        # Connection errors and timeouts (no status) are always retryable
+        return status_code is None or status_code in self.retryable_statuses
+
+    def delay(self, attempt, response=None):
+        # Seconds to wait before the next attempt (attempt starts at 1)
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return retry_after
+            if response.headers.get('X-RateLimit-Remaining') == '0':
+                # Per-minute limit hit without a Retry-After: wait for the window to roll over
+                return 60.0
+        # Exponential backoff with full jitter
+        return random.uniform(0, self.base_delay * 2 ** (attempt - 1))
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated upstream failures.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    requests raise CircuitOpenError without touching the network. Once
+    `reset_timeout` seconds have passed, a single probe request is let
+    through: success closes the circuit, failure opens it again.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=None, reset_timeout=None, clock=time.monotonic):
+        self.failure_threshold = failure_threshold or getattr(settings, 'FOOTBALL_API_CIRCUIT_FAILURES', 5)
+        self.reset_timeout = reset_timeout if reset_timeout is not None else getattr(settings, 'FOOTBALL_API_CIRCUIT_RESET', 120)
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            raise CircuitOpenError(f"Football API circuit is {self.state} after {self.failures} consecutive failures")
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Football API circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.error(f"Football API circuit opened after {self.failures} consecutive failures")
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+                self._probe_in_flight = False
+
+
+class RetryBudget:
+    """
+    Caps the number of retries for a whole run, so a bad API day costs seconds rather than minutes.
+
+    A client lives as long as its process, so whoever starts a run (an update,
+    a job, a live poll) calls reset(); otherwise long-lived workers would use
+    the budget up once and then fail every transient error.
+    """
+    def __init__(self, max_retries=None):
+        self.max_retries = max_retries if max_retries is not None else getattr(settings, 'FOOTBALL_API_RETRY_BUDGET', 10)
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    def try_spend(self):
+        with self._lock:
+            if self.spent >= self.max_retries:
+                return False
+            self.spent += 1
+            return True
+
+    def reset(self):
+        with self._lock:
+            self.spent = 0
+
+    @property
+    def remaining(self):
+        return max(self.max_retries - self.spent, 0)
@@ -0,0 +1,273 @@
+import json
+import logging
+import random
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from urllib.parse import parse_qsl, urlparse
+from django.conf import settings
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from .api_cache import ttl_for
+from .api_client import FootballApiClient
+from .models import TrackedLeague, TrackedTeam
+from .rate_limiter import RateLimiter
+from .recordings import RecordingStore
+from .standin_api import SyntheticPayloads
+from .updaters import DataUpdater
+
+logger = logging.getLogger(__name__)
+
+# Host the simulated client sends its requests to; they never leave the process
+SIMULATED_BASE_URL = 'http://football-api.simulated/v3'
+
+
+class VirtualClock:
+    """
+    Clock that only moves when told to, shared by every thread of a simulation.
+
+    `sleep()` returns at once and moves the clock to when the sleeper would
+    have woken up: the time it last read plus the delay. Threads waiting
+    for the same moment therefore wait in parallel, as they would for real.
+    """
+    def __init__(self, start):
+        self._now = start.timestamp()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def time(self):
+        with self._lock:
+            self._local.read = self._now
+            return self._now
+
+    def now(self):
+        return datetime.fromtimestamp(self.time(), dt_timezone.utc)
+
+    def set(self, moment):
+        with self._lock:
+            self._now = max(self._now, moment.timestamp())
+
+    def advance(self, seconds):
+        with self._lock:
+            self._now += seconds
+
+    def sleep(self, seconds):
+        with self._lock:
+            self._now = max(self._now, getattr(self._local, 'read', self._now) + seconds)
+
+
+@contextmanager
+def virtual_time(clock):
+    # Makes django.utils.timezone.now() (and so the updater, scheduler and models) read the clock
+    real_now = timezone.now
+    timezone.now = clock.now
+    try:
+        yield clock
+    finally:
+        timezone.now = real_now
+
+
+class VirtualTimeCache:
+    """
+    Response cache of the simulated client: the tiered cache's TTLs, expiring in virtual time.
+    """
+    def __init__(self, clock, ttls=None, stale_ttl=None):
+        self.clock = clock
+        self.ttls = ttls or getattr(settings, 'FOOTBALL_API_CACHE_TTLS', {})
+        self.stale_ttl = stale_ttl if stale_ttl is not None else getattr(settings, 'FOOTBALL_API_CACHE_STALE_TTL', 24 * 60 * 60)
+        self._entries = {}  # key -> (raw, expires_at, stale_until)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None, False
+        raw, expires_at, stale_until = entry
+        now = self.clock.time()
+        if stale_until <= now:
+            return None, False
+        return raw, now < expires_at
+
+    def set(self, key, endpoint, params, raw):
+        ttl = ttl_for(endpoint, params, self.ttls)
+        if ttl <= 0:
+            return
+        now = self.clock.time()
+        with self._lock:
+            self._entries[key] = (raw, now + ttl, now + ttl + self.stale_ttl)
+
+    def close(self):
+        # Kept for the next simulated day, as the disk tier would be
+        pass
+
+
+class SimulatedApiAdapter(BaseAdapter):
+    """
+    requests transport answering from recordings, then synthetic payloads, in virtual time.
+
+    Each request moves the clock by `latency` (plus up to `jitter`) seconds
+    instead of waiting. Requests sent by the async client's worker threads
+    are taken to overlap up to `concurrency`, so they move it by a share.
+    """
+    def __init__(self, clock, payloads, recordings_dir=None, latency=0.0, jitter=0.0, concurrency=1, seed=0):
+        super().__init__()
+        self.clock = clock
+        self.payloads = payloads
+        self.recordings = RecordingStore(recordings_dir) if recordings_dir else None
+        self.latency = latency
+        self.jitter = jitter
+        self.concurrency = max(concurrency, 1)
+        self.requests_served = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def body_for(self, endpoint, params):
+        if self.recordings:
+            recording = self.recordings.load(endpoint, params)
+            if recording is not None:
+                return recording['body']
+        return self.payloads.respond(endpoint, params)
+
+    def send(self, request, **kwargs):
+        url = urlparse(request.url)
+        endpoint = url.path.strip('/')
+        if endpoint.startswith('v3/'):
+            endpoint = endpoint[len('v3/'):]
+        params = dict(parse_qsl(url.query))
+
+        with self._lock:
+            self.requests_served += 1
+            latency = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if threading.current_thread() is not threading.main_thread():
+            latency /= self.concurrency
+        self.clock.advance(latency)
+
+        body = self.body_for(endpoint, params)
+        response = Response()
+        response.status_code = 200 if body is not None else 404
+        response.reason = 'OK' if body is not None else 'Not Found'
+        response._content = json.dumps(body if body is not None else {'message': f"Endpoint '{endpoint}' does not exist"}).encode()
+        response.headers = CaseInsensitiveDict({'Content-Type': 'application/json'})
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=latency)
+        return response
+
+    def close(self):
+        pass
+
+
+class WeekSimulator:
+    """
+    Runs the real daily update for a number of days in virtual time, offline.
+
+    Every simulated day a fresh DataUpdater runs at `run_at` (UTC) against
+    recorded or synthetic responses, with its own quota ledger and a response
+    cache that lives through the simulation, so refresh scheduling, caching
+    and quota use play out as they would over those days. Nothing sleeps:
+    rate limit waits and request latency move a virtual clock. The updater
+    writes to a throwaway test database seeded with the tracked leagues and
+    teams of the real one; nothing real is touched.
+
+    A day's projected wall time is the virtual time it took (latency and
+    rate limit waits) plus the real time spent parsing and writing.
+    """
+    def __init__(self, start, days=7, run_at=None, concurrency=None, latency=0.3, jitter=0.0,
+                 daily_limit=None, recordings_dir=None, seed=0):
+        self.start = start
+        self.days = days
+        self.run_at = run_at or datetime.strptime('06:00', '%H:%M').time()
+        self.concurrency = concurrency or getattr(settings, 'FOOTBALL_API_MAX_CONCURRENCY', 4)
+        self.daily_limit = daily_limit or getattr(settings, 'FOOTBALL_API_DAILY_LIMIT', 100)
+        self.clock = VirtualClock(self._run_time(start))
+        self.cache = VirtualTimeCache(self.clock)
+        self.latency = latency
+        self.jitter = jitter
+        self.recordings_dir = recordings_dir
+        self.seed = seed
+
+    def _run_time(self, day):
+        return datetime.combine(day, self.run_at, tzinfo=dt_timezone.utc)
+
+    def run(self):
+        # Returns one result dict per simulated day
+        registry = self._tracked_registry()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self._seed_registry(registry)
+            with tempfile.TemporaryDirectory(prefix='football-simulation-') as directory, \
+                    override_settings(FOOTBALL_API_ARCHIVE_DIR=None, FOOTBALL_TELEMETRY_DIR=None,
+                                      FOOTBALL_API_MODE=FootballApiClient.LIVE,
+                                      FOOTBALL_API_KEY=settings.FOOTBALL_API_KEY or 'simulated'), \
+                    virtual_time(self.clock):
+                ledger_path = Path(directory) / 'quota.sqlite3'
+                payloads = SyntheticPayloads(
+                    seed=self.seed, league_teams=TrackedLeague.registry(), today=lambda: self.clock.now().date()
+                )
+                adapter = SimulatedApiAdapter(
+                    self.clock, payloads, self.recordings_dir, self.latency, self.jitter, self.concurrency, self.seed
+                )
+                return [
+                    self.run_day(self.start + timedelta(days=offset), adapter, ledger_path)
+                    for offset in range(self.days)
+                ]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _tracked_registry(self):
+        # The tracked leagues and teams of the real database, copied into the simulation's
+        leagues = list(TrackedLeague.objects.values())
+        teams = list(TrackedTeam.objects.values('league_id', 'team_id', 'active'))
+        return leagues, teams
+
+    def _seed_registry(self, registry):
+        leagues, teams = registry
+        TrackedLeague.objects.all().delete()
+        TrackedLeague.objects.bulk_create(TrackedLeague(**league) for league in leagues)
+        TrackedTeam.objects.bulk_create(TrackedTeam(**team) for team in teams)
+
+    def run_day(self, day, adapter, ledger_path):
+        self.clock.set(self._run_time(day))
+        started = self.clock.time()
+        rate_limiter = RateLimiter(
+            path=ledger_path, daily_limit=self.daily_limit, clock=self.clock.time, sleep=self.clock.sleep
+        )
+        client = FootballApiClient(
+            base_url=SIMULATED_BASE_URL, cache=self.cache, rate_limiter=rate_limiter, sleep=self.clock.sleep
+        )
+        client.session.mount(SIMULATED_BASE_URL, adapter)
+        served = adapter.requests_served
+
+        logger.info(f"Simulating the update of {day} ({day:%A})")
+        updater = DataUpdater(concurrency=self.concurrency, client=client)
+        updater.update_all_data()
+        report = updater.last_report
+
+        rows = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        for counts in report['rows'].values():
+            for outcome in rows:
+                rows[outcome] += counts[outcome]
+        return {
+            'date': day.isoformat(),
+            'weekday': f"{day:%A}",
+            'api_calls': report['api']['calls'],
+            'requests': adapter.requests_served - served,
+            'quota_remaining': report['api']['quota_remaining'],
+            'quota_exhausted': report['api']['quota_remaining'] <= 0,
+            'rows': rows,
+            'rows_by_model': report['rows'],
+            'cache_hit_rate': report['cache']['hit_rate'],
+            'phases': report['phases'],
+            'virtual_seconds': self.clock.time() - started,
+            'compute_seconds': report['seconds'],
+            'projected_seconds': self.clock.time() - started + report['seconds'],
+        }
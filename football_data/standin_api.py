@@ -0,0 +1,351 @@
+import json
+import logging
+import random
+import threading
+import time
+import zlib
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+from .recordings import RecordingStore
+
+logger = logging.getLogger(__name__)
+
+# Leagues served by the synthetic payloads: id -> (name, country, country code)
+SYNTHETIC_LEAGUES = {
+    39: ('Premier League', 'England', 'GB'),
+    140: ('La Liga', 'Spain', 'ES'),
+    78: ('Bundesliga', 'Germany', 'DE'),
+    135: ('Serie A', 'Italy', 'IT'),
+    61: ('Ligue 1', 'France', 'FR'),
+    # Untracked leagues, so fixture responses carry data the updater has to skip
+    71: ('Serie A', 'Brazil', 'BR'),
+    128: ('Liga Profesional Argentina', 'Argentina', 'AR'),
+    253: ('Major League Soccer', 'USA', 'US'),
+    262: ('Liga MX', 'Mexico', 'MX'),
+    88: ('Eredivisie', 'Netherlands', 'NL'),
+}
+
+POSITIONS = ['Goalkeeper', 'Defender', 'Midfielder', 'Attacker']
+PLAYERS_PER_PAGE = 20
+
+
+def _envelope(endpoint, params, response, paging=None):
+    # Wraps a response list the way API-Football does
+    return {
+        'get': endpoint,
+        'parameters': params,
+        'errors': [],
+        'results': len(response),
+        'paging': paging or {'current': 1, 'total': 1},
+        'response': response,
+    }
+
+
+class SyntheticPayloads:
+    """
+    Deterministic, API-Football shaped payloads for the endpoints the updater uses.
+
+    The same seed always produces the same countries, leagues, teams, players
+    and fixtures. `league_teams` maps a league id to the team ids it should
+    contain (for example the updater's tracked teams); other leagues get
+    generated ids. `today` returns the current date, which decides what is
+    played, in play or scheduled (the simulator passes a virtual one).
+    """
+    ENDPOINTS = ('timezone', 'countries', 'leagues', 'teams', 'players', 'fixtures')
+
+    def __init__(self, seed=0, league_teams=None, teams_per_league=20, players_per_team=30, fixtures_per_day=4,
+                 today=date.today):
+        self.seed = seed
+        self.today = today
+        self.teams_per_league = teams_per_league
+        self.players_per_team = players_per_team
+        self.fixtures_per_day = fixtures_per_day
+        self.league_teams = {}
+        for league_id in SYNTHETIC_LEAGUES:
+            self.league_teams[league_id] = [league_id * 1000 + i for i in range(1, teams_per_league + 1)]
+        for league_id, team_ids in (league_teams or {}).items():
+            self.league_teams[int(league_id)] = [int(team_id) for team_id in team_ids]
+        self.team_league = {
+            team_id: league_id for league_id, team_ids in self.league_teams.items() for team_id in team_ids
+        }
+
+    def _rng(self, *key):
+        # Independent, reproducible random stream for each entity
+        return random.Random(zlib.crc32(repr((self.seed, *key)).encode()))
+
+    def respond(self, endpoint, params):
+        # Returns the response body for an endpoint, or None if it is not supported
+        endpoint = endpoint.strip('/')
+        if endpoint not in self.ENDPOINTS:
+            return None
+        return getattr(self, endpoint)(params)
+
+    def timezone(self, params):
+        return _envelope('timezone', params, ['UTC', 'Europe/London', 'Europe/Madrid', 'America/Guatemala'])
+
+    def countries(self, params):
+        seen = {}
+        for name, country, code in SYNTHETIC_LEAGUES.values():
+            seen[country] = {'name': country, 'code': code, 'flag': f"https://media.example.com/flags/{code.lower()}.svg"}
+        return _envelope('countries', params, list(seen.values()))
+
+    def _league(self, league_id):
+        name, country, code = SYNTHETIC_LEAGUES.get(league_id, (f"League {league_id}", 'World', None))
+        return name, country, code
+
+    def leagues(self, params):
+        season = int(params.get('season', self.today().year))
+        response = []
+        for league_id in SYNTHETIC_LEAGUES:
+            name, country, code = self._league(league_id)
+            response.append({
+                'league': {'id': league_id, 'name': name, 'type': 'League',
+                           'logo': f"https://media.example.com/leagues/{league_id}.png"},
+                'country': {'name': country, 'code': code,
+                            'flag': f"https://media.example.com/flags/{(code or 'xx').lower()}.svg"},
+                'seasons': [{'year': season, 'start': f"{season}-08-01", 'end': f"{season + 1}-05-31", 'current': True}],
+            })
+        return _envelope('leagues', params, response)
+
+    def _team(self, team_id):
+        rng = self._rng('team', team_id)
+        league_id = self.team_league.get(team_id)
+        country = self._league(league_id)[1] if league_id else 'World'
+        return {
+            'team': {
+                'id': team_id,
+                'name': f"Team {team_id}",
+                'code': f"T{team_id % 100:02d}",
+                'country': country,
+                'founded': rng.randint(1870, 1990),
+                'national': False,
+                'logo': f"https://media.example.com/teams/{team_id}.png",
+            },
+            'venue': {
+                'id': team_id * 10 + 1,
+                'name': f"Stadium {team_id}",
+                'address': f"{rng.randint(1, 200)} Main Street",
+                'city': f"City {team_id}",
+                'capacity': rng.randint(8000, 80000),
+                'surface': rng.choice(['grass', 'artificial turf']),
+                'image': f"https://media.example.com/venues/{team_id * 10 + 1}.png",
+            },
+        }
+
+    def teams(self, params):
+        if 'id' in params:
+            return _envelope('teams', params, [self._team(int(params['id']))])
+        team_ids = self.league_teams.get(int(params.get('league', 0)), [])
+        return _envelope('teams', params, [self._team(team_id) for team_id in team_ids])
+
+    def players(self, params):
+        team_id = int(params['team'])
+        page = int(params.get('page', 1))
+        total_pages = max((self.players_per_team + PLAYERS_PER_PAGE - 1) // PLAYERS_PER_PAGE, 1)
+        first = (page - 1) * PLAYERS_PER_PAGE
+        response = []
+        for index in range(first, min(first + PLAYERS_PER_PAGE, self.players_per_team)):
+            player_id = team_id * 100 + index + 1
+            rng = self._rng('player', player_id)
+            birth = date(rng.randint(1988, 2006), rng.randint(1, 12), rng.randint(1, 28))
+            response.append({
+                'player': {
+                    'id': player_id,
+                    'name': f"P. Player{player_id}",
+                    'firstname': 'Player',
+                    'lastname': f"Player{player_id}",
+                    'age': self.today().year - birth.year,
+                    'birth': {'date': birth.isoformat(), 'place': f"City {team_id}", 'country': 'World'},
+                    'nationality': 'World',
+                    'height': f"{rng.randint(165, 200)} cm",
+                    'weight': f"{rng.randint(60, 95)} kg",
+                    'injured': rng.random() < 0.05,
+                    'photo': f"https://media.example.com/players/{player_id}.png",
+                },
+                'statistics': [{'team': {'id': team_id}, 'games': {'position': rng.choice(POSITIONS)}}],
+            })
+        return _envelope('players', params, response, {'current': page, 'total': total_pages})
+
+    def _fixture_by_id(self, fixture_id):
+        # Fixture ids encode their day, league and position (see _fixtures_on)
+        leagues = list(self.league_teams)
+        league_index = fixture_id % 1000 // 20
+        if league_index >= len(leagues):
+            return []
+        day = date.fromordinal(fixture_id // 1000)
+        season = day.year if day.month >= 7 else day.year - 1
+        return [
+            fixture for fixture in self._fixtures_on(day, leagues[league_index], season)
+            if fixture['fixture']['id'] == fixture_id
+        ]
+
+    def _fixtures_on(self, day, league_id, season, live_only=False):
+        # Fixtures of one league on one day; weekends are busier
+        rng = self._rng('fixtures', day.isoformat(), league_id)
+        team_ids = list(self.league_teams.get(league_id, []))
+        count = self.fixtures_per_day * (2 if day.weekday() >= 5 else 1)
+        rng.shuffle(team_ids)
+        name, country, code = self._league(league_id)
+        today = self.today()
+        fixtures = []
+        for index in range(min(count, len(team_ids) // 2)):
+            home_id, away_id = team_ids[2 * index], team_ids[2 * index + 1]
+            kickoff = datetime(day.year, day.month, day.day, 12 + 2 * (index % 4), 0, tzinfo=dt_timezone.utc)
+            fixture_id = day.toordinal() * 1000 + list(self.league_teams).index(league_id) * 20 + index
+            if day < today:
+                status = {'long': 'Match Finished', 'short': 'FT', 'elapsed': 90}
+            elif day == today and index % 2 == 0:
+                status = {'long': 'Second Half', 'short': '2H', 'elapsed': 60 + rng.randint(0, 30)}
+            else:
+                status = {'long': 'Not Started', 'short': 'NS', 'elapsed': None}
+            if live_only and status['short'] not in ('1H', 'HT', '2H', 'ET', 'P'):
+                continue
+            started = status['short'] != 'NS'
+            goals = {'home': rng.randint(0, 4), 'away': rng.randint(0, 3)} if started else {'home': None, 'away': None}
+            halftime = {'home': min(goals['home'], rng.randint(0, 2)), 'away': min(goals['away'], rng.randint(0, 2))} if started else {'home': None, 'away': None}
+            fulltime = goals if status['short'] == 'FT' else {'home': None, 'away': None}
+            fixtures.append({
+                'fixture': {
+                    'id': fixture_id,
+                    'referee': f"Referee {rng.randint(1, 40)}",
+                    'timezone': 'UTC',
+                    'date': kickoff.isoformat(),
+                    'timestamp': int(kickoff.timestamp()),
+                    'venue': {'id': home_id * 10 + 1, 'name': f"Stadium {home_id}", 'city': f"City {home_id}"},
+                    'status': status,
+                },
+                'league': {
+                    'id': league_id, 'name': name, 'country': country,
+                    'logo': f"https://media.example.com/leagues/{league_id}.png",
+                    'flag': None, 'season': season,
+                    'round': f"Regular Season - {(day.toordinal() // 7) % 38 + 1}",
+                },
+                'teams': {
+                    'home': {'id': home_id, 'name': f"Team {home_id}", 'logo': f"https://media.example.com/teams/{home_id}.png", 'winner': None},
+                    'away': {'id': away_id, 'name': f"Team {away_id}", 'logo': f"https://media.example.com/teams/{away_id}.png", 'winner': None},
+                },
+                'goals': goals,
+                'score': {
+                    'halftime': halftime,
+                    'fulltime': fulltime,
+                    'extratime': {'home': None, 'away': None},
+                    'penalty': {'home': None, 'away': None},
+                },
+            })
+        return fixtures
+
+    def fixtures(self, params):
+        if 'id' in params or 'ids' in params:
+            fixture_ids = [int(value) for value in str(params.get('ids', params.get('id'))).split('-')]
+            return _envelope('fixtures', params, [
+                fixture for fixture_id in fixture_ids for fixture in self._fixture_by_id(fixture_id)
+            ])
+        league_ids = [int(params['league'])] if 'league' in params else list(self.league_teams)
+        if 'live' in params:
+            live = params['live']
+            if live != 'all':
+                league_ids = [int(league_id) for league_id in live.split('-')]
+            days = [self.today()]
+        elif 'date' in params:
+            days = [date.fromisoformat(params['date'])]
+        elif 'from' in params and 'to' in params:
+            first, last = date.fromisoformat(params['from']), date.fromisoformat(params['to'])
+            days = [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+        else:
+            days = []
+
+        response = []
+        for day in days:
+            season = int(params.get('season', day.year if day.month >= 7 else day.year - 1))
+            for league_id in league_ids:
+                response.extend(self._fixtures_on(day, league_id, season, live_only='live' in params))
+        return _envelope('fixtures', params, response)
+
+
+class StandinApiServer(ThreadingHTTPServer):
+    """
+    Local HTTP stand-in for the Football API.
+
+    Serves recorded responses when a recordings directory is given and
+    falls back to synthetic payloads. Every request waits `latency` seconds
+    (plus up to `jitter`), and a fraction `error_rate` of requests fails with
+    `error_status`. Quota headers are reported as RapidAPI does.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, payloads=None, recordings_dir=None, latency=0.0, jitter=0.0,
+                 error_rate=0.0, error_status=503, daily_limit=100, seed=0):
+        super().__init__(address, StandinRequestHandler)
+        self.payloads = payloads or SyntheticPayloads(seed=seed)
+        self.recordings = RecordingStore(recordings_dir) if recordings_dir else None
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.daily_limit = daily_limit
+        self.requests_served = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v3"
+
+    def start_in_thread(self):
+        thread = threading.Thread(target=self.serve_forever, name='standin-api', daemon=True)
+        thread.start()
+        return thread
+
+    def next_request(self):
+        # Returns (request number, delay, whether to inject an error)
+        with self._lock:
+            self.requests_served += 1
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self._rng.random() < self.error_rate
+            return self.requests_served, delay, fail
+
+    def body_for(self, endpoint, params):
+        if self.recordings:
+            recording = self.recordings.load(endpoint, params)
+            if recording is not None:
+                return recording['body']
+        return self.payloads.respond(endpoint, params)
+
+
+class StandinRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        endpoint = url.path.strip('/')
+        if endpoint.startswith('v3/'):
+            endpoint = endpoint[len('v3/'):]
+        params = dict(parse_qsl(url.query))
+
+        served, delay, fail = self.server.next_request()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            self._send(self.server.error_status, {'message': 'Injected error'}, served)
+            return
+
+        body = self.server.body_for(endpoint, params)
+        if body is None:
+            self._send(404, {'message': f"Endpoint '{endpoint}' does not exist"}, served)
+            return
+        self._send(200, body, served)
+
+    def _send(self, status, body, served):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('x-ratelimit-requests-limit', str(self.server.daily_limit))
+        self.send_header('x-ratelimit-requests-remaining', str(max(self.server.daily_limit - served, 0)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Stand-in API: {format % args}")
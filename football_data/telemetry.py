@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the API latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class QueryTimer:
+    """
+    Database execute wrapper adding up the queries run and the time spent in them.
+
+    It is installed on every database connection, including those of the
+    pipeline's writer thread; readers take the difference of two snapshots.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.queries += 1
+                self.seconds += elapsed
+
+    def snapshot(self):
+        with self._lock:
+            return self.queries, self.seconds
+
+    def install(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+query_timer = QueryTimer()
+connection_created.connect(query_timer.install, dispatch_uid='football_data.telemetry.query_timer')
+
+
+class Histogram:
+    """
+    Cumulative histogram in the Prometheus sense: bucket i counts observations <= buckets[i].
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def as_dict(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets['+Inf'] = self.count
+        return {'count': self.count, 'sum': round(self.sum, 6), 'buckets': buckets}
+
+
+class RunTelemetry:
+    """
+    Collects the numbers of one update run and writes them as a JSON run report.
+
+    Phase wall times are measured with `phase()`; API latencies, cache
+    lookups, rows written and the quota left are read from the updater when
+    the run finishes, as the difference with what they were at `start()`, so
+    an updater running several times reports each run on its own. Reports go
+    to FOOTBALL_TELEMETRY_DIR/<date>/, and the latest one of each instance (all
+    leagues, or one shard) is also kept as latest-<instance>.json for the
+    metrics view.
+    """
+    def __init__(self, updater, directory=None):
+        self.updater = updater
+        directory = directory if directory is not None else getattr(settings, 'FOOTBALL_TELEMETRY_DIR', None)
+        self.directory = Path(directory) if directory else None
+        shard = updater.shard
+        self.instance = f"shard-{shard[0]}-of-{shard[1]}" if shard else 'all'
+        self.phases = {}
+        self.started_at = None
+
+    def start(self):
+        # The connection of this thread may predate the connection_created hook
+        query_timer.install(connection)
+        self.phases = {}
+        self.started_at = timezone.now()
+        self._started = time.monotonic()
+        self._timings_start = len(self.updater.client.timings)
+        self._cache_start = self.updater.client.cache_stats
+        self._calls_start = self.updater.api_calls
+        self._queries_start = query_timer.snapshot()
+
+    @contextmanager
+    def phase(self, name):
+        # Adds the wall time of the block to phase `name`; a phase entered twice adds up
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.monotonic() - started
+
+    def report(self, quota_remaining):
+        # The run report as a dict of plain values
+        seconds = time.monotonic() - self._started
+        latency = {}
+        for timing in self.updater.client.timings[self._timings_start:]:
+            latency.setdefault(timing.endpoint, Histogram()).observe(timing.total)
+
+        cache = self.updater.client.cache_stats
+        lookups = {
+            counter: cache[counter] - self._cache_start[counter]
+            for counter in ('hits', 'stale_hits', 'misses', 'coalesced')
+        }
+        total_lookups = sum(lookups.values())
+        lookups['hit_rate'] = (lookups['hits'] + lookups['stale_hits']) / total_lookups if total_lookups else 0.0
+
+        queries, db_seconds = query_timer.snapshot()
+        rows = {
+            model_name: {'inserted': counts['created'], 'updated': counts['updated'], 'skipped': counts['unchanged']}
+            for model_name, counts in self.updater.write_counts.items()
+        }
+        rows_written = sum(counts['inserted'] + counts['updated'] for counts in rows.values())
+        return {
+            'instance': self.instance,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': timezone.now().isoformat(),
+            'seconds': round(seconds, 6),
+            'phases': {name: round(value, 6) for name, value in self.phases.items()},
+            'api': {
+                'calls': self.updater.api_calls - self._calls_start,
+                'quota_remaining': quota_remaining,
+                'latency': {endpoint: histogram.as_dict() for endpoint, histogram in sorted(latency.items())},
+            },
+            'cache': lookups,
+            'rows': rows,
+            'rows_per_second': rows_written / seconds if seconds else 0.0,
+            'db': {
+                'queries': queries - self._queries_start[0],
+                'seconds': round(db_seconds - self._queries_start[1], 6),
+            },
+        }
+
+    def write(self, report):
+        # Writes the report under its date and as the instance's latest; returns its path or None
+        if self.directory is None:
+            return None
+        now = timezone.now()
+        day_dir = self.directory / now.strftime('%Y-%m-%d')
+        day_dir.mkdir(parents=True, exist_ok=True)
+        # Microseconds, so runs finishing within the same second do not overwrite each other's report
+        path = day_dir / f"{now.strftime('%H%M%S%f')}-{self.instance}-{os.getpid()}.json"
+        body = json.dumps(report, indent=2)
+        path.write_text(body)
+        # Replaced atomically so the metrics view never reads half a report
+        latest = self.directory / f"latest-{self.instance}.json"
+        partial = latest.with_suffix(f".{os.getpid()}.tmp")
+        partial.write_text(body)
+        os.replace(partial, latest)
+        return path
+
+
+def latest_reports(directory=None):
+    # The latest run report of every instance, oldest first; unreadable reports are skipped
+    directory = directory if directory is not None else getattr(settings, 'FOOTBALL_TELEMETRY_DIR', None)
+    if not directory or not Path(directory).is_dir():
+        return []
+    reports = []
+    for path in sorted(Path(directory).glob('latest-*.json')):
+        try:
+            reports.append(json.loads(path.read_text()))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping unreadable run report {path}: {str(e)}")
+    return sorted(reports, key=lambda report: report['finished_at'])
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+
+def prometheus_text(reports):
+    """
+    Renders run reports in the Prometheus text exposition format, one series per instance.
+    """
+    metrics = {}  # name -> (type, help, [(labels, value)])
+
+    def add(name, kind, help_text, value, **labels):
+        metrics.setdefault(name, (kind, help_text, []))[2].append((_labels(**labels), value))
+
+    for report in reports:
+        instance = report['instance']
+        finished = timezone.datetime.fromisoformat(report['finished_at'])
+        add('football_update_last_run_timestamp_seconds', 'gauge', 'When the last update run finished.',
+            finished.timestamp(), instance=instance)
+        add('football_update_duration_seconds', 'gauge', 'Wall time of the last update run.',
+            report['seconds'], instance=instance)
+        for phase, seconds in report['phases'].items():
+            add('football_update_phase_seconds', 'gauge', 'Wall time of each phase of the last update run.',
+                seconds, instance=instance, phase=phase)
+        add('football_update_api_calls', 'gauge', 'API calls made by the last update run.',
+            report['api']['calls'], instance=instance)
+        if report['api']['quota_remaining'] is not None:
+            add('football_api_quota_remaining', 'gauge', 'Daily API quota left when the last update run finished.',
+                report['api']['quota_remaining'], instance=instance)
+        for endpoint, histogram in report['api']['latency'].items():
+            for bound, count in histogram['buckets'].items():
+                add('football_api_request_duration_seconds_bucket', 'histogram', None,
+                    count, instance=instance, endpoint=endpoint, le=bound)
+            add('football_api_request_duration_seconds_sum', 'histogram', None,
+                histogram['sum'], instance=instance, endpoint=endpoint)
+            add('football_api_request_duration_seconds_count', 'histogram', None,
+                histogram['count'], instance=instance, endpoint=endpoint)
+        for result in ('hits', 'stale_hits', 'misses', 'coalesced'):
+            add('football_api_cache_lookups', 'gauge', 'API cache lookups of the last update run by result.',
+                report['cache'][result], instance=instance, result=result)
+        add('football_api_cache_hit_ratio', 'gauge', 'Share of API cache lookups of the last update run answered from the cache.',
+            report['cache']['hit_rate'], instance=instance)
+        for model_name, counts in report['rows'].items():
+            for outcome, count in counts.items():
+                add('football_update_rows', 'gauge', 'Rows written by the last update run by model and outcome.',
+                    count, instance=instance, model=model_name, outcome=outcome)
+        add('football_update_rows_per_second', 'gauge', 'Rows inserted or updated per second by the last update run.',
+            report['rows_per_second'], instance=instance)
+        add('football_update_db_queries', 'gauge', 'Database queries run by the last update run.',
+            report['db']['queries'], instance=instance)
+        add('football_update_db_seconds', 'gauge', 'Time the last update run spent in database queries.',
+            report['db']['seconds'], instance=instance)
+
+    lines = []
+    declared = set()
+    for name, (kind, help_text, samples) in metrics.items():
+        # The series of a histogram share one declaration under its base name
+        family = name.rsplit('_', 1)[0] if kind == 'histogram' else name
+        if family not in declared:
+            declared.add(family)
+            if kind == 'histogram':
+                lines.append(f"# HELP {family} Latency of API requests sent by the last update run.")
+            else:
+                lines.append(f"# HELP {family} {help_text}")
+            lines.append(f"# TYPE {family} {kind}")
+        lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+    return '\n'.join(lines) + '\n'
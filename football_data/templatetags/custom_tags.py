@@ -1,5 +1,4 @@
 from django import template
-from football_data.models import League
 from django.templatetags.static import static
 
 register = template.Library()
@@ -18,13 +17,13 @@ def default_static(value, default_path):
     return static(default_path)
 
 @register.simple_tag
-def get_league_name(country):
+def get_league_name(team):
     """
-    Custom template tag to get the name of a league for a given country.
+    Custom template tag to get the name of a team's league.
 
-    This tag queries the League model to find a league associated with
-    the provided country. If found, it returns the league's name.
-    If not found, it returns 'N/A'.
+    The league is the one of the team's latest season (see
+    Team.current_league); list the teams with TeamSeason.prefetch() so
+    this runs no query. If the team has no known league, it returns 'N/A'.
     """
-    league = League.objects.filter(country=country).first()
+    league = team.current_league()
     return league.name if league else 'N/A'
\ No newline at end of file
@@ -1,3 +1,1204 @@
-from django.test import TestCase
+import asyncio
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+import zlib
+from unittest import mock
+from kombu import Connection
+from django.core.cache import cache
+from django.core.management import CommandError
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
+from .api_cache import DAY, TieredResponseCache, make_cache_key, ttl_for
+from .api_client import FootballApiClient
+from .backfill import JOURNAL_ENTITY, FixtureBackfill, journal_scope
+from .bulk_writes import bulk_upsert
+from .exceptions import ApiRequestError, CircuitOpenError, FootballApiError, QuotaExceeded, RetryBudgetExhausted
+from .identity_map import IdentityMap
+from .jobs import JobQueue, JobWorker, job_key, plan_update_jobs
+from .live_poller import LivePoller
+from .management.commands.update_football_data import parse_shard
+from .json_stream import find_errors, iter_array_items, iter_chunks, iter_fixtures
+from .models import (
+    Country, Fixture, League, Player, Season, SyncWatermark, Team, TeamSeason, TrackedLeague, TrackedTeam, UpdateJob,
+    Venue,
+)
+from .payload_archive import PayloadArchive
+from .pipeline import WritePipeline
+from .rate_limiter import RateLimiter
+from .reingest import Reingester
+from .refresh_scheduler import RefreshScheduler, RefreshTask, choose_tasks
+from .retry_policy import CircuitBreaker, RetryBudget, RetryPolicy
+from .standin_api import StandinApiServer, SyntheticPayloads
+from .telemetry import prometheus_text
+from .updaters import TEAM_UPDATE_FIELDS, DataUpdater, season_for
 
-# Create your tests here.
+
+def make_team(team_id, name):
+    return Team(id=team_id, name=name, country_id='England', founded=1900, logo_url='https://example.com/t.png')
+
+
+class FakeClock:
+    # time() for the limiters and breakers; sleep() moves it instead of waiting
+    def __init__(self, start=datetime(2026, 10, 18, 12, tzinfo=dt_timezone.utc).timestamp()):
+        self.now = start
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class RecordingPayloads(SyntheticPayloads):
+    # Synthetic payloads that remember every request the stand-in server answered with them
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requests = []
+
+    def respond(self, endpoint, params):
+        self.requests.append((endpoint.strip('/'), params))
+        return super().respond(endpoint, params)
+
+
+class TempDirMixin:
+    def make_temp_dir(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return Path(directory.name)
+
+
+class StandinApiMixin(TempDirMixin):
+    # A stand-in API server on a free port, and clients that talk to it (or to nothing, without a server)
+    # without waiting or touching real files
+    def start_standin(self, **kwargs):
+        server = StandinApiServer(('127.0.0.1', 0), **kwargs)
+        server.start_in_thread()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def standin_client(self, server=None, **kwargs):
+        # The memory tier of the response cache is Django's cache, shared by every test
+        cache.clear()
+        self.addCleanup(cache.clear)
+        directory = self.make_temp_dir()
+        clock = FakeClock()
+        options = {
+            'base_url': server.base_url if server else 'http://127.0.0.1:9/v3',
+            'cache': TieredResponseCache(path=directory / 'cache.sqlite3'),
+            'rate_limiter': RateLimiter(path=directory / 'quota.sqlite3', requests_per_minute=6000, burst=100,
+                                        daily_limit=1000, reserve=0, clock=clock.time, sleep=clock.sleep),
+            'sleep': clock.sleep,
+        }
+        options.update(kwargs)
+        with self.settings(FOOTBALL_API_KEY='test', FOOTBALL_API_ARCHIVE_DIR=None, FOOTBALL_API_MODE=FootballApiClient.LIVE):
+            client = FootballApiClient(**options)
+        self.addCleanup(client.close)
+        return client
+
+##--------------------------------------------------------------------------##
+##--------------------------------Bulk writes--------------------------------##
+class BulkUpsertTests(TestCase):
+    def setUp(self):
+        Country.objects.create(name='England')
+
+    def test_counts_created_updated_and_unchanged_rows(self):
+        created, updated, unchanged = bulk_upsert(Team, [make_team(1, 'A'), make_team(2, 'B')], TEAM_UPDATE_FIELDS)
+        self.assertEqual((sorted(created), updated, unchanged), ([1, 2], [], []))
+
+        created, updated, unchanged = bulk_upsert(
+            Team, [make_team(1, 'A'), make_team(2, 'B renamed'), make_team(3, 'C')], TEAM_UPDATE_FIELDS
+        )
+        self.assertEqual((created, updated, unchanged), ([3], [2], [1]))
+        self.assertEqual(Team.objects.get(id=2).name, 'B renamed')
+        self.assertEqual(Team.objects.count(), 3)
+
+    def test_unchanged_rows_are_not_rewritten_but_marked_seen(self):
+        bulk_upsert(Team, [make_team(1, 'A')], TEAM_UPDATE_FIELDS)
+        long_ago = timezone.now() - timedelta(days=30)
+        # Edited behind the upsert's back: the stored hash still matches the payload
+        Team.objects.filter(id=1).update(name='Edited', last_seen=long_ago)
+
+        created, updated, unchanged = bulk_upsert(Team, [make_team(1, 'A')], TEAM_UPDATE_FIELDS)
+        self.assertEqual((created, updated, unchanged), ([], [], [1]))
+        team = Team.objects.get(id=1)
+        self.assertEqual(team.name, 'Edited')
+        self.assertGreater(team.last_seen, long_ago)
+
+    def test_cleared_source_hash_forces_a_rewrite(self):
+        # The live poller clears the hash of rows it partly rewrote
+        bulk_upsert(Team, [make_team(1, 'A')], TEAM_UPDATE_FIELDS)
+        Team.objects.filter(id=1).update(name='Edited', source_hash='')
+
+        created, updated, unchanged = bulk_upsert(Team, [make_team(1, 'A')], TEAM_UPDATE_FIELDS)
+        self.assertEqual((created, updated, unchanged), ([], [1], []))
+        self.assertEqual(Team.objects.get(id=1).name, 'A')
+
+    def test_last_duplicate_wins(self):
+        created, _, _ = bulk_upsert(Team, [make_team(1, 'First'), make_team(1, 'Second')], TEAM_UPDATE_FIELDS, size=1)
+        self.assertEqual(created, [1])
+        self.assertEqual(Team.objects.get(id=1).name, 'Second')
+
+
+@override_settings(TIME_ZONE='America/Guatemala')
+class FixtureMatchDateTests(TestCase):
+    # 02:30 UTC on the 18th is the evening of the 17th in the site's time zone
+    kickoff = datetime(2026, 10, 18, 2, 30, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        Country.objects.create(name='England')
+        League.objects.create(id=39, name='Premier League', country_id='England', type='League', logo_url='https://example.com/l.png')
+        self.season = Season.objects.create(league_id=39, year=2026, start_date=date(2026, 8, 1), end_date=date(2027, 5, 31))
+        Team.objects.bulk_create([make_team(33, 'A'), make_team(34, 'B')])
+
+    def make_fixture(self, fixture_id, kickoff):
+        return Fixture(id=fixture_id, date=kickoff, timestamp=0, status_short='NS', league_id=39, season=self.season,
+                       round='Regular Season - 9', team_home_id=33, team_away_id=34)
+
+    def test_filled_by_save(self):
+        fixture = self.make_fixture(1, self.kickoff)
+        fixture.save()
+        self.assertEqual(Fixture.objects.get(id=1).match_date, date(2026, 10, 17))
+
+        fixture.date = self.kickoff + timedelta(days=2)
+        fixture.save()
+        self.assertEqual(Fixture.objects.get(id=1).match_date, date(2026, 10, 19))
+
+    def test_filled_by_bulk_upsert(self):
+        # bulk_upsert() skips save(); the API's ISO string works as well as a datetime
+        fields = ['date', 'match_date', 'status_short']
+        bulk_upsert(Fixture, [self.make_fixture(1, self.kickoff), self.make_fixture(2, '2026-10-18T14:00:00+00:00')], fields)
+        self.assertEqual(dict(Fixture.objects.values_list('id', 'match_date')), {1: date(2026, 10, 17), 2: date(2026, 10, 18)})
+
+        bulk_upsert(Fixture, [self.make_fixture(1, self.kickoff + timedelta(days=2))], fields)
+        self.assertEqual(Fixture.objects.get(id=1).match_date, date(2026, 10, 19))
+
+
+class IdentityMapTests(TestCase):
+    def setUp(self):
+        Country.objects.create(name='England')
+        League.objects.create(id=39, name='Premier League', country_id='England', type='League', logo_url='https://example.com/l.png')
+        Team.objects.bulk_create([make_team(1, 'A')])
+        self.identity_map = IdentityMap()
+
+    def test_known_rows_cost_no_queries(self):
+        # One query loads the keys, one inserts the team that is not stored yet
+        with self.assertNumQueries(2):
+            self.assertEqual(self.identity_map.ensure(Team, [make_team(1, 'A'), make_team(2, 'B')]), 1)
+        self.assertEqual((self.identity_map.hits, self.identity_map.misses), (1, 1))
+        self.assertEqual(Team.objects.count(), 2)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.identity_map.ensure(Team, [make_team(1, 'A'), make_team(2, 'B')]), 0)
+            self.assertEqual(self.identity_map.get(Team, 2), 2)
+            self.assertIsNone(self.identity_map.get(Team, 3))
+        self.assertEqual(self.identity_map.stats, {'hits': 4, 'misses': 2, 'preload_queries': 1})
+
+    def test_seasons_are_found_by_league_and_year(self):
+        defaults = {'start_date': date(2026, 8, 1), 'end_date': date(2027, 5, 31)}
+        season_id = self.identity_map.season_id(39, 2026, defaults)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.identity_map.season_id(39, 2026, defaults), season_id)
+        self.assertEqual(Season.objects.get(league_id=39, year=2026).id, season_id)
+        self.assertEqual((self.identity_map.hits, self.identity_map.misses), (1, 1))
+
+    def test_forget_reloads_the_keys(self):
+        self.identity_map.get(Team, 1)
+        Team.objects.all().delete()
+        self.identity_map.forget(Team)
+        self.assertIsNone(self.identity_map.get(Team, 1))
+        self.assertEqual(self.identity_map.preload_queries, 2)
+
+##--------------------------------------------------------------------------##
+##--------------------------------JSON stream--------------------------------##
+# Strings with escaped quotes and backslashes, brackets inside strings and multi-byte characters,
+# so every chunk size splits some token in an awkward place
+STREAM_PAYLOAD = {
+    'get': 'fixtures',
+    'parameters': {'response': ['not', 'this', 'one']},
+    'errors': [],
+    'response': [
+        {'name': 'He said "{[hi]}"', 'path': 'C:\\dir\\', 'quote': '"', 'nested': {'list': [1, [2, {'x': '}'}]]}},
+        'a plain string',
+        ['Müller', 'Ødegaard', '\u00e9\n\t'],
+        {'empty': {}, 'also_empty': [], 'emoji': '⚽'},
+    ],
+    'paging': {'current': 1, 'total': 1},
+}
+
+
+class IterArrayItemsTests(SimpleTestCase):
+    def test_items_survive_every_chunk_boundary(self):
+        raw = json.dumps(STREAM_PAYLOAD, ensure_ascii=False).encode()
+        expected = STREAM_PAYLOAD['response']
+        for chunk_size in range(1, len(raw) + 1):
+            items = [json.loads(item) for item in iter_array_items(iter_chunks(raw, chunk_size))]
+            self.assertEqual(items, expected, f"chunk size {chunk_size}")
+
+    def test_only_the_top_level_array_is_read(self):
+        # The nested 'response' key under 'parameters' comes first and must be ignored
+        raw = json.dumps(STREAM_PAYLOAD).encode()
+        self.assertEqual(len(list(iter_array_items(iter_chunks(raw, 7)))), 4)
+
+    def test_missing_array_yields_nothing(self):
+        self.assertEqual(list(iter_array_items([b'{"errors": {"token": "bad"}}'])), [])
+
+
+class IterFixturesTests(SimpleTestCase):
+    def fixture(self, fixture_id, league_id):
+        return {'fixture': {'id': fixture_id}, 'league': {'id': league_id, 'name': 'L'}}
+
+    def test_other_leagues_are_skipped_and_counted(self):
+        raw = json.dumps({'response': [self.fixture(1, 39), self.fixture(2, 140), self.fixture(3, 39)]}).encode()
+        stats = {}
+        fixtures = list(iter_fixtures(iter_chunks(raw, 16), league_ids=['39'], stats=stats))
+        self.assertEqual([fixture['fixture']['id'] for fixture in fixtures], [1, 3])
+        self.assertEqual(stats, {'parsed': 2, 'skipped': 1})
+
+    def test_league_id_not_first_falls_back_to_decoding(self):
+        item = {'league': {'name': 'L', 'id': 140}, 'fixture': {'id': 1}}
+        raw = json.dumps({'response': [item]}).encode()
+        self.assertEqual(list(iter_fixtures([raw], league_ids=[39])), [])
+
+
+class FindErrorsTests(SimpleTestCase):
+    def test_empty_errors_are_none(self):
+        self.assertIsNone(find_errors(b'{"errors": [], "response": []}'))
+        self.assertIsNone(find_errors(b'{"errors": {}, "response": []}'))
+
+    def test_errors_are_decoded(self):
+        self.assertEqual(find_errors(b'{"errors": {"requests": "limit reached"}}'), {'requests': 'limit reached'})
+
+##--------------------------------------------------------------------------##
+##-------------------------------Rate limiter--------------------------------##
+class RateLimiterTests(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.path = self.make_temp_dir() / 'quota.sqlite3'
+
+    def limiter(self, **kwargs):
+        options = {'requests_per_minute': 60, 'burst': 3, 'daily_limit': 100, 'reserve': 0}
+        options.update(kwargs)
+        limiter = RateLimiter(path=self.path, clock=self.clock.time, sleep=self.clock.sleep, **options)
+        self.addCleanup(limiter.close)
+        return limiter
+
+    def test_burst_then_one_request_per_interval(self):
+        limiter = self.limiter()
+        for _ in range(3):
+            limiter.acquire()
+        self.assertEqual(self.clock.slept, [])
+
+        limiter.acquire()
+        self.assertEqual(self.clock.slept, [1.0])
+        self.assertEqual(limiter.waited, 1.0)
+        self.assertEqual(limiter.used_today(), 4)
+
+    def test_quota_stops_at_the_reserve(self):
+        limiter = self.limiter(burst=10, daily_limit=5, reserve=2)
+        for _ in range(3):
+            limiter.acquire()
+        self.assertEqual(limiter.remaining(), 0)
+        with self.assertRaises(QuotaExceeded):
+            limiter.acquire()
+        self.assertEqual(limiter.used_today(), 3)
+
+    def test_quota_resets_at_utc_midnight(self):
+        limiter = self.limiter(daily_limit=2)
+        limiter.acquire()
+        limiter.acquire()
+        with self.assertRaises(QuotaExceeded):
+            limiter.acquire()
+        self.clock.now = datetime(2026, 10, 19, 0, 0, 1, tzinfo=dt_timezone.utc).timestamp()
+        limiter.acquire()
+        self.assertEqual(limiter.used_today(), 1)
+
+    def test_sync_takes_the_reported_quota(self):
+        limiter = self.limiter()
+        limiter.acquire()
+        limiter.sync(remaining=40, daily_limit=50)
+        self.assertEqual(limiter.used_today(), 10)
+        self.assertEqual(limiter.remaining(), 40)
+        # Requests already charged locally are never given back
+        limiter.sync(remaining=45)
+        self.assertEqual(limiter.used_today(), 10)
+
+    def test_limiters_sharing_a_file_share_bucket_and_ledger(self):
+        first, second = self.limiter(), self.limiter()
+        first.acquire()
+        first.acquire()
+        second.acquire()
+        self.assertEqual(self.clock.slept, [])
+        second.acquire()
+        self.assertEqual(self.clock.slept, [1.0])
+        self.assertEqual(first.used_today(), 4)
+
+##--------------------------------------------------------------------------##
+##-------------------------------HTTP session--------------------------------##
+class ConnectionTimingTests(StandinApiMixin, SimpleTestCase):
+    def test_requests_reuse_one_kept_alive_connection(self):
+        server = self.start_standin(latency=0.05)
+        client = self.standin_client(server)
+        client.get_countries()
+        client.get_leagues()
+        client.make_request('timezone')
+
+        self.assertEqual([timing.endpoint for timing in client.timings], ['countries', 'leagues', 'timezone'])
+        first, *others = client.timings
+        self.assertGreater(first.connect, 0)
+        self.assertTrue(all(timing.reused for timing in others))
+        # Plain HTTP: no handshake, and the server's latency shows up before the first byte
+        self.assertTrue(all(timing.tls == 0 for timing in client.timings))
+        self.assertTrue(all(0.05 <= timing.first_byte <= timing.total for timing in client.timings))
+        summary = client.timing_summary()
+        self.assertEqual((summary['requests'], summary['new_connections'], summary['reused_connections']), (3, 1, 2))
+        self.assertEqual(summary['connect'], first.connect)
+
+##--------------------------------------------------------------------------##
+##----------------------------Retries and breaker----------------------------##
+class RetryPolicyTests(SimpleTestCase):
+    def response(self, **headers):
+        return mock.Mock(headers=headers)
+
+    def test_retryable_statuses(self):
+        policy = RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=30.0)
+        self.assertTrue(policy.is_retryable(None))
+        self.assertTrue(policy.is_retryable(503))
+        self.assertTrue(policy.is_retryable(429))
+        self.assertFalse(policy.is_retryable(404))
+        self.assertFalse(policy.is_retryable(401))
+
+    def test_retry_after_wins_over_backoff(self):
+        policy = RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=30.0)
+        self.assertEqual(policy.delay(1, self.response(**{'Retry-After': '12'})), 12.0)
+        later = http_date((timezone.now() + timedelta(seconds=90)).timestamp())
+        self.assertAlmostEqual(policy.delay(1, self.response(**{'Retry-After': later})), 90.0, delta=2.0)
+        self.assertEqual(policy.delay(1, self.response(**{'X-RateLimit-Remaining': '0'})), 60.0)
+
+    def test_backoff_is_jittered_below_the_exponential_cap(self):
+        policy = RetryPolicy(max_attempts=5, base_delay=1.0, max_delay=30.0)
+        for attempt in range(1, 5):
+            for _ in range(20):
+                self.assertLessEqual(policy.delay(attempt, self.response()), 2 ** (attempt - 1))
+
+
+class RetryBudgetTests(SimpleTestCase):
+    def test_spends_until_exhausted_and_resets(self):
+        budget = RetryBudget(max_retries=2)
+        self.assertEqual([budget.try_spend() for _ in range(3)], [True, True, False])
+        self.assertEqual(budget.remaining, 0)
+        budget.reset()
+        self.assertEqual(budget.remaining, 2)
+        self.assertTrue(budget.try_spend())
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60, clock=self.clock.time)
+
+    def open_circuit(self):
+        for _ in range(3):
+            self.breaker.before_request()
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures_and_fails_fast(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+        self.open_circuit()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request()
+
+    def test_half_open_lets_one_probe_through(self):
+        self.open_circuit()
+        self.clock.now += 60
+        self.breaker.before_request()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request()
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.before_request()
+
+    def test_failed_probe_opens_again(self):
+        self.open_circuit()
+        self.clock.now += 60
+        self.breaker.before_request()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.clock.now += 59
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request()
+
+
+class ClientRetryTests(StandinApiMixin, SimpleTestCase):
+    def test_gives_up_after_max_attempts(self):
+        server = self.start_standin(error_rate=1.0)
+        client = self.standin_client(server, retry_policy=RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=30.0))
+        with self.assertRaises(FootballApiError):
+            client.get_countries()
+        self.assertEqual(server.requests_served, 3)
+        self.assertEqual(client.retry_budget.spent, 2)
+        self.assertEqual(client.api_calls, 0)
+
+    def test_retry_budget_stops_retrying(self):
+        server = self.start_standin(error_rate=1.0)
+        client = self.standin_client(server, retry_policy=RetryPolicy(max_attempts=5, base_delay=0.5, max_delay=30.0))
+        client.retry_budget = RetryBudget(max_retries=1)
+        with self.assertRaises(RetryBudgetExhausted):
+            client.get_countries()
+        self.assertEqual(server.requests_served, 2)
+
+    def test_client_errors_are_not_retried(self):
+        server = self.start_standin()
+        client = self.standin_client(server)
+        with self.assertRaises(FootballApiError):
+            client.make_request('no-such-endpoint')
+        self.assertEqual(server.requests_served, 1)
+        self.assertEqual(client.circuit_breaker.state, CircuitBreaker.CLOSED)
+
+    def test_success_is_counted_and_cached(self):
+        server = self.start_standin()
+        client = self.standin_client(server)
+        first = client.get_countries()
+        self.assertEqual(client.get_countries(), first)
+        self.assertEqual(server.requests_served, 1)
+        self.assertEqual(client.api_calls, 1)
+        self.assertEqual(client.quota_remaining(), 99)
+
+##--------------------------------------------------------------------------##
+##-------------------------------Response cache------------------------------##
+class TtlTests(SimpleTestCase):
+    def test_fixture_ttls_follow_the_requested_date(self):
+        today = timezone.now().date()
+        ttls = {'fixtures': 100, 'fixtures:match_day': 10, 'fixtures:past': 1000, 'fixtures:live': 0}
+        self.assertEqual(ttl_for('fixtures', {'date': today.isoformat()}, ttls), 10)
+        self.assertEqual(ttl_for('fixtures', {'date': (today - timedelta(days=1)).isoformat()}, ttls), 1000)
+        self.assertEqual(ttl_for('fixtures', {'date': (today + timedelta(days=1)).isoformat()}, ttls), 100)
+        self.assertEqual(ttl_for('fixtures', {'live': '39'}, ttls), 0)
+        self.assertEqual(ttl_for('fixtures', {'ids': '1-2'}, ttls), 0)
+
+    def test_cache_keys_ignore_parameter_order_and_types(self):
+        self.assertEqual(make_cache_key('players', {'team': 33, 'season': 2024}),
+                         make_cache_key('/players/', {'season': '2024', 'team': ' 33'}))
+
+
+class TieredResponseCacheTests(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.cache = TieredResponseCache(path=self.make_temp_dir() / 'cache.sqlite3', ttls={'teams': 60}, stale_ttl=DAY)
+        self.addCleanup(self.cache.close)
+
+    def test_fresh_then_stale_then_gone(self):
+        key = make_cache_key('teams', {'id': 33})
+        self.cache.set(key, 'teams', {'id': 33}, b'{"response": []}')
+        self.assertEqual(self.cache.get(key), (b'{"response": []}', True))
+
+        cache.clear()
+        with mock.patch('football_data.api_cache.time.time', return_value=time.time() + 120):
+            self.assertEqual(self.cache.get(key), (b'{"response": []}', False))
+        with mock.patch('football_data.api_cache.time.time', return_value=time.time() + 60 + DAY + 1):
+            self.assertEqual(self.cache.get(key), (None, False))
+
+    def test_disk_tier_survives_a_new_process(self):
+        # A new process starts with an empty memory tier
+        key = make_cache_key('teams', {'id': 33})
+        self.cache.set(key, 'teams', {'id': 33}, b'{}')
+        cache.clear()
+        self.assertEqual(self.cache.get(key), (b'{}', True))
+
+    def test_zero_ttl_responses_are_not_stored(self):
+        key = make_cache_key('fixtures', {'live': '39'})
+        self.cache.set(key, 'fixtures', {'live': '39'}, b'{}')
+        self.assertEqual(self.cache.get(key), (None, False))
+
+
+class StaleWhileRevalidateTests(StandinApiMixin, SimpleTestCase):
+    def store_expired(self, client, endpoint, params, raw):
+        # An entry whose TTL ran out a minute ago, still inside its stale window
+        client.cache.disk.set(make_cache_key(endpoint, params), endpoint, zlib.compress(raw), -60, DAY)
+
+    def test_expired_entries_are_refetched_by_default(self):
+        # e.g. yesterday's match-day snapshot of fixtures must not be written over final scores
+        server = self.start_standin()
+        client = self.standin_client(server)
+        self.store_expired(client, 'countries', None, b'{"response": ["stale"]}')
+        self.assertNotEqual(client.get_countries()['response'], ['stale'])
+        self.assertEqual(server.requests_served, 1)
+        self.assertEqual(client.cache_stats['stale_hits'], 0)
+
+    def test_read_only_callers_get_the_stale_entry_and_a_background_refresh(self):
+        server = self.start_standin()
+        client = self.standin_client(server)
+        self.store_expired(client, 'countries', None, b'{"response": ["stale"]}')
+        self.assertEqual(client.make_request('countries', allow_stale=True)['response'], ['stale'])
+        client._refresh_executor.shutdown(wait=True)
+        self.assertEqual(server.requests_served, 1)
+        self.assertEqual(client.cache_stats['stale_hits'], 1)
+        self.assertNotEqual(client.make_request('countries', allow_stale=True)['response'], ['stale'])
+
+
+class CoalescingTests(StandinApiMixin, SimpleTestCase):
+    def test_concurrent_misses_share_one_upstream_call(self):
+        # The stand-in answers slowly enough for every thread to arrive while the first call is in flight
+        server = self.start_standin(latency=0.5)
+        client = self.standin_client(server)
+        barrier = threading.Barrier(5)
+
+        def fetch():
+            barrier.wait()
+            return client.get_countries()
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            results = list(executor.map(lambda _: fetch(), range(5)))
+        self.assertEqual(server.requests_served, 1)
+        self.assertEqual(client.api_calls, 1)
+        self.assertTrue(all(result == results[0] for result in results))
+        self.assertEqual((client.cache_stats['misses'], client.cache_stats['coalesced']), (1, 4))
+
+##--------------------------------------------------------------------------##
+##--------------------------------Watermarks---------------------------------##
+class SyncWatermarkTests(TestCase):
+    def test_advance_inserts_then_moves_the_watermark(self):
+        SyncWatermark.advance('fixtures', ['39', '140'], synced_until=date(2026, 10, 16))
+        SyncWatermark.advance('fixtures', ['39'], synced_until=date(2026, 10, 17))
+        marks = SyncWatermark.for_entity('fixtures')
+        self.assertEqual(marks['39'].synced_until, date(2026, 10, 17))
+        self.assertEqual(marks['140'].synced_until, date(2026, 10, 16))
+        self.assertEqual(SyncWatermark.objects.count(), 2)
+
+    def test_record_refresh_counts_changes(self):
+        SyncWatermark.record_refresh('team', {33: 'a'})
+        SyncWatermark.record_refresh('team', {33: 'a'})
+        SyncWatermark.record_refresh('team', {33: 'b'})
+        mark = SyncWatermark.objects.get(entity='team', scope='33')
+        self.assertEqual((mark.refresh_count, mark.change_count, mark.content_hash), (2, 1, 'b'))
+
+
+@override_settings(FOOTBALL_SYNC_MAX_GAP_DAYS=7, FOOTBALL_TELEMETRY_DIR=None)
+class FixtureSyncWindowTests(StandinApiMixin, TestCase):
+    def setUp(self):
+        TrackedLeague.objects.all().delete()
+        for league_id, name in ((39, 'Premier League'), (140, 'La Liga'), (135, 'Serie A')):
+            TrackedLeague.objects.create(league_id=league_id, name=name)
+
+    def test_windows_start_after_each_watermark(self):
+        updater = DataUpdater(client=self.standin_client())
+        until = date(2026, 10, 17)
+        SyncWatermark.advance('fixtures', ['39'], synced_until=until)
+        SyncWatermark.advance('fixtures', ['140'], synced_until=until - timedelta(days=3))
+        # Never synced: only the last day is fetched
+        self.assertEqual(updater.fixture_sync_windows(until), {'140': until - timedelta(days=2), '135': until})
+
+    def test_long_gaps_are_truncated(self):
+        updater = DataUpdater(client=self.standin_client())
+        until = date(2026, 10, 17)
+        SyncWatermark.advance('fixtures', ['39', '140', '135'], synced_until=until - timedelta(days=30))
+        self.assertEqual(set(updater.fixture_sync_windows(until).values()), {until - timedelta(days=6)})
+
+    def test_synced_days_are_not_fetched_again(self):
+        server = self.start_standin(payloads=SyntheticPayloads(league_teams=TrackedLeague.registry()))
+        updater = DataUpdater(client=self.standin_client(server))
+        yesterday = (timezone.now() - timedelta(days=1)).date()
+        SyncWatermark.advance('fixtures', ['39'], synced_until=yesterday - timedelta(days=3))
+
+        updater.update_fixtures()
+        marks = SyncWatermark.for_entity('fixtures')
+        self.assertEqual({marks[league_id].synced_until for league_id in ('39', '140', '135')}, {yesterday})
+        served = server.requests_served
+        self.assertGreater(served, 0)
+
+        updater.update_fixtures()
+        self.assertEqual(server.requests_served, served)
+
+
+@override_settings(FOOTBALL_TELEMETRY_DIR=None)
+class FixtureWriteTests(StandinApiMixin, TestCase):
+    def setUp(self):
+        self.updater = DataUpdater(client=self.standin_client())
+        self.fixtures = SyntheticPayloads().fixtures({'date': '2026-10-17', 'league': '39'})['response']
+
+    def test_malformed_fixture_only_loses_itself(self):
+        broken = self.fixtures[3]
+        del broken['goals']
+        with self.assertLogs('football_data.updaters', 'ERROR') as logs:
+            result = self.updater.write_fixture_batch(self.fixtures)
+        self.assertEqual(result, (len(self.fixtures) - 1, 0, 0))
+        stored = set(Fixture.objects.values_list('id', flat=True))
+        self.assertEqual(stored, {fixture['fixture']['id'] for fixture in self.fixtures} - {broken['fixture']['id']})
+        self.assertIn("Error updating fixture: 'goals'", logs.output[0])
+
+    @override_settings(FOOTBALL_DB_BATCH_SIZE=2)
+    def test_failing_batch_keeps_the_batches_before_it(self):
+        write_fixtures = self.updater.write_fixtures
+        calls = []
+
+        def fail_third_batch(fixtures):
+            # Writes the batch, then fails the third one after its rows reached the database
+            calls.append(fixtures)
+            result = write_fixtures(fixtures)
+            if len(calls) == 3:
+                raise OperationalError('database is locked')
+            return result
+
+        counts = [0, 0, 0]
+        with mock.patch.object(self.updater, 'write_fixtures', side_effect=fail_third_batch), \
+                self.assertLogs('football_data.updaters', 'ERROR') as logs:
+            failed = self.updater.write_fixture_stream(iter(self.fixtures), counts)
+        self.assertEqual((len(calls), failed), ((len(self.fixtures) + 1) // 2, 1))
+        self.assertIn("Error writing 2 fixtures: database is locked", logs.output[0])
+        lost = {fixture['fixture']['id'] for fixture in calls[2]}
+        stored = set(Fixture.objects.values_list('id', flat=True))
+        self.assertEqual(stored, {fixture['fixture']['id'] for fixture in self.fixtures} - lost)
+        self.assertEqual(counts, [len(self.fixtures) - 2, 0, 0])
+
+##--------------------------------------------------------------------------##
+##---------------------------------Backfill----------------------------------##
+@override_settings(FOOTBALL_TELEMETRY_DIR=None)
+class FixtureBackfillTests(StandinApiMixin, TestCase):
+    start, end = date(2026, 10, 1), date(2026, 10, 7)
+
+    def setUp(self):
+        TrackedLeague.objects.all().delete()
+        for league_id, name in ((39, 'Premier League'), (140, 'La Liga')):
+            TrackedLeague.objects.create(league_id=league_id, name=name)
+
+    def backfill(self, daily_limit):
+        # A backfill fetching one date at a time from a fresh stand-in server with this daily quota
+        payloads = RecordingPayloads()
+        server = self.start_standin(payloads=payloads, daily_limit=daily_limit)
+        updater = DataUpdater(concurrency=1, client=self.standin_client(server))
+        self.addCleanup(updater.async_client.close)
+        return FixtureBackfill(updater), payloads
+
+    def fetched_dates(self, payloads):
+        return sorted(date.fromisoformat(params['date']) for endpoint, params in payloads.requests if endpoint == 'fixtures')
+
+    def days(self, first, last):
+        return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+    def test_interrupted_backfill_resumes_from_its_journal(self):
+        # The quota runs out after three dates
+        backfill, payloads = self.backfill(daily_limit=3)
+        stats = backfill.run(self.start, self.end)
+        self.assertEqual((stats['days_done'], stats['days_skipped']), (3, 4))
+        self.assertEqual(self.fetched_dates(payloads), self.days(self.start, date(2026, 10, 3)))
+        pending = backfill.pending_days(self.start, self.end)
+        self.assertEqual(pending, {day: ['39', '140'] for day in self.days(date(2026, 10, 4), self.end)})
+
+        # Only the dates that were not committed are fetched again
+        backfill, payloads = self.backfill(daily_limit=100)
+        stats = backfill.run(self.start, self.end)
+        self.assertEqual((stats['days_done'], stats['days_skipped'], stats['days_failed']), (4, 0, 0))
+        self.assertEqual(self.fetched_dates(payloads), list(pending))
+
+        self.assertEqual(backfill.pending_days(self.start, self.end), {})
+        self.assertEqual(
+            set(SyncWatermark.objects.filter(entity=JOURNAL_ENTITY).values_list('scope', flat=True)),
+            {journal_scope(league_id, day) for league_id in ('39', '140') for day in self.days(self.start, self.end)},
+        )
+        # Four fixtures per league on weekdays, eight on the weekend; untracked leagues are skipped
+        self.assertEqual(Fixture.objects.count(), 2 * (5 * 4 + 2 * 8))
+        self.assertEqual(set(Fixture.objects.values_list('league_id', flat=True)), {39, 140})
+
+        backfill, payloads = self.backfill(daily_limit=100)
+        self.assertEqual(backfill.run(self.start, self.end)['days_done'], 0)
+        self.assertEqual(payloads.requests, [])
+
+##--------------------------------------------------------------------------##
+##---------------------------Archive and reingest----------------------------##
+@override_settings(FOOTBALL_TELEMETRY_DIR=None)
+class ReingestTests(StandinApiMixin, TestCase):
+    # Columns compared after a round trip; bookkeeping (last_updated, last_seen) is left out
+    COMPARED = (
+        (Country, ('name', 'code', 'flag_url')),
+        (League, ('id', 'name', 'type', 'country_id', 'logo_url')),
+        (Season, ('league_id', 'year')),
+        (Team, ('id', 'name', 'code', 'country_id', 'founded', 'logo_url')),
+        (TeamSeason, ('season__league_id', 'season__year', 'team_id')),
+        (Venue, ('id', 'name', 'city', 'capacity', 'team_id')),
+        (Player, ('id', 'name', 'birth_date', 'height', 'team_id')),
+        (Fixture, ('id', 'match_date', 'status_short', 'goals_home', 'goals_away', 'league_id', 'season__year',
+                   'team_home_id', 'team_away_id', 'venue_id')),
+    )
+
+    def setUp(self):
+        TrackedLeague.objects.all().delete()
+        league = TrackedLeague.objects.create(league_id=39, name='Premier League')
+        # 39900 is not in the synthetic league, so only its refresh records its membership
+        for team_id in (39001, 39002, 39900):
+            TrackedTeam.objects.create(league=league, team_id=team_id)
+
+    def snapshot(self):
+        return {model.__name__: sorted(model.objects.values_list(*fields)) for model, fields in self.COMPARED}
+
+    def test_round_trip_rebuilds_the_tables_without_api_calls(self):
+        archive_dir = self.make_temp_dir()
+        server = self.start_standin()
+        updater = DataUpdater(client=self.standin_client(server, archive_dir=archive_dir))
+        updater.update_countries_and_leagues()
+        updater.update_teams_and_players(['39001', '39002', '39900'])
+        updater.update_fixtures()
+        updater.async_client.close()
+        before = self.snapshot()
+        self.assertTrue(all(before.values()))
+        self.assertIn((39, season_for(timezone.now().date()), 39900), before['TeamSeason'])
+        segments = list(archive_dir.glob('*/*/*.ndjson.gz'))
+        self.assertEqual({path.parts[-3] for path in segments}, {'countries', 'leagues', 'teams', 'players', 'fixtures'})
+
+        for model, _ in reversed(self.COMPARED):
+            model.objects.all().delete()
+        served = server.requests_served
+        updater = DataUpdater(client=self.standin_client())
+        self.addCleanup(updater.async_client.close)
+        stats = Reingester(updater, PayloadArchive(archive_dir)).run()
+
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual((updater.api_calls, server.requests_served), (0, served))
+        self.assertEqual(sum(endpoint['failed_batches'] for endpoint in stats.values()), 0)
+        self.assertEqual(stats['players']['rows'], Player.objects.count())
+
+##--------------------------------------------------------------------------##
+##------------------------------Refresh planning-----------------------------##
+class ChooseTasksTests(SimpleTestCase):
+    def test_best_total_priority_within_budget(self):
+        tasks = [RefreshTask('team', '1', 5, 6.0), RefreshTask('team', '2', 3, 4.0), RefreshTask('team', '3', 3, 4.0)]
+        self.assertEqual([task.scope for task in choose_tasks(tasks, 6)], ['2', '3'])
+        self.assertEqual([task.scope for task in choose_tasks(tasks, 5)], ['1'])
+        self.assertEqual(choose_tasks(tasks, 2), [])
+        self.assertEqual(choose_tasks(tasks, -3), [])
+
+
+class RefreshSchedulerTests(TestCase):
+    def setUp(self):
+        self.now = datetime(2026, 10, 18, 12, tzinfo=dt_timezone.utc)
+        self.scheduler = RefreshScheduler({'39': ['33', '34']}, ttls={'team': 7 * 86400}, min_staleness=0.5,
+                                          clock=lambda: self.now)
+        # Team 33 was refreshed yesterday, team 34 never; the league list is 10 days old
+        SyncWatermark.objects.create(entity='team', scope='33', last_synced=self.now - timedelta(days=1))
+        SyncWatermark.objects.create(entity='countries_and_leagues', scope='', last_synced=self.now - timedelta(days=10))
+
+    def test_only_stale_data_is_a_candidate(self):
+        tasks = {(task.entity, task.scope): task for task in self.scheduler.candidates()}
+        self.assertEqual(set(tasks), {('countries_and_leagues', ''), ('team', '34')})
+        # Never refreshed: maximum staleness; no players stored yet: info plus 4 pages
+        self.assertEqual(tasks[('team', '34')].cost, 5)
+        self.assertAlmostEqual(tasks[('team', '34')].priority, 3.0 * 0.5)
+        self.assertAlmostEqual(tasks[('countries_and_leagues', '')].priority, 10 / 7 * 0.2)
+
+    def test_candidates_follow_the_clock(self):
+        self.now += timedelta(days=3)
+        scopes = {(task.entity, task.scope) for task in self.scheduler.candidates()}
+        self.assertIn(('team', '33'), scopes)
+
+    def test_default_clock_reads_patched_timezone_now(self):
+        # The simulator's virtual time patches timezone.now after the scheduler module was imported
+        scheduler = RefreshScheduler({'39': ['33']}, ttls={'team': 7 * 86400}, min_staleness=0.5)
+        with mock.patch('django.utils.timezone.now', return_value=self.now + timedelta(days=3)):
+            scopes = {(task.entity, task.scope) for task in scheduler.candidates()}
+        self.assertIn(('team', '33'), scopes)
+
+    def test_plan_fits_the_budget(self):
+        self.assertEqual(self.scheduler.plan(5)['team'], ['34'])
+        self.assertEqual(self.scheduler.plan(5)['countries_and_leagues'], [])
+        plan = self.scheduler.plan(7)
+        self.assertEqual((plan['team'], plan['countries_and_leagues']), (['34'], ['']))
+        self.assertFalse(any(self.scheduler.plan(1).values()))
+
+    def test_venues_of_refreshed_teams_are_not_planned_twice(self):
+        Country.objects.create(name='England')
+        Team.objects.bulk_create([make_team(33, 'A'), make_team(34, 'B')])
+        plan = self.scheduler.plan(20)
+        self.assertEqual(plan['team'], ['34'])
+        # Team 33's venue is due on its own; team 34's comes with its team info
+        self.assertEqual(plan['venue'], ['33'])
+
+    def test_fixture_soon_boosts_a_team(self):
+        Country.objects.create(name='England')
+        Team.objects.bulk_create([make_team(33, 'A'), make_team(34, 'B')])
+        before = {task.scope: task.priority for task in self.scheduler.candidates() if task.entity == 'venue'}
+        League.objects.create(id=39, name='Premier League', country_id='England', type='League', logo_url='https://example.com/l.png')
+        season = Season.objects.create(league_id=39, year=2026, start_date=date(2026, 8, 1), end_date=date(2027, 5, 31))
+        Fixture.objects.create(id=1, date=self.now + timedelta(days=1), timestamp=0, status_short='NS', league_id=39,
+                               season=season, round='1', team_home_id=33, team_away_id=34)
+        after = {task.scope: task.priority for task in self.scheduler.candidates() if task.entity == 'venue'}
+        self.assertAlmostEqual(after['33'], before['33'] * 1.5)
+
+##--------------------------------------------------------------------------##
+##-----------------------------------Jobs------------------------------------##
+class JobQueueTests(TestCase):
+    def setUp(self):
+        # An in-memory broker; only job keys travel through it
+        self.job_queue = JobQueue(connection=Connection('memory://'), name=self.id(), lease_seconds=60,
+                                  max_attempts=2, retry_delay=30)
+        self.addCleanup(self.job_queue.close)
+        self.updater = mock.Mock()
+        self.worker = JobWorker(self.updater, self.job_queue, name='test-worker')
+
+    def delivered(self):
+        # Keys waiting on the broker
+        keys = []
+        while True:
+            try:
+                message = self.job_queue.queue.get(block=False)
+            except self.job_queue.queue.Empty:
+                return keys
+            message.ack()
+            keys.append(message.payload['key'])
+
+    def expire(self, key):
+        UpdateJob.objects.filter(key=key).update(lease_until=timezone.now() - timedelta(seconds=1))
+
+    def test_enqueue_is_idempotent(self):
+        jobs = [('team', {'team_id': '33', 'players': True}, '2026-10-18')] * 2
+        self.assertEqual(self.job_queue.enqueue(jobs), (1, 1))
+        self.assertEqual(self.job_queue.enqueue(jobs[:1]), (0, 1))
+        self.assertEqual(self.delivered(), [job_key(*jobs[0])])
+
+    def test_a_job_delivered_twice_runs_once(self):
+        self.job_queue.enqueue([('clean_old_data', {}, '2026-10-18')])
+        key, = self.delivered()
+        self.worker.process(key)
+        self.worker.process(key)
+        self.assertEqual(self.updater.clean_old_data.call_count, 1)
+        self.assertEqual((self.worker.stats['done'], self.worker.stats['duplicates']), (1, 1))
+        self.assertEqual(UpdateJob.objects.get(key=key).status, UpdateJob.DONE)
+
+    def test_expired_lease_is_delivered_again(self):
+        # A worker claimed the job and died
+        self.job_queue.enqueue([('clean_old_data', {}, '2026-10-18')])
+        key, = self.delivered()
+        self.worker.claim(key)
+        self.assertEqual(self.job_queue.requeue_expired(), 0)
+
+        self.expire(key)
+        self.assertEqual(self.job_queue.requeue_expired(), 1)
+        job = UpdateJob.objects.get(key=key)
+        self.assertEqual((job.status, job.worker), (UpdateJob.QUEUED, ''))
+        self.assertGreater(job.lease_until, timezone.now())
+        self.assertEqual(self.delivered(), [key])
+
+    def test_expired_lease_after_max_attempts_fails(self):
+        self.job_queue.enqueue([('clean_old_data', {}, '2026-10-18')])
+        key, = self.delivered()
+        for _ in range(2):
+            self.worker.claim(key)
+            self.expire(key)
+            self.job_queue.requeue_expired()
+        self.assertEqual(UpdateJob.objects.get(key=key).status, UpdateJob.FAILED)
+        self.assertEqual(self.delivered(), [key])
+
+    def test_failed_job_is_retried_after_a_delay(self):
+        self.updater.clean_old_data.side_effect = RuntimeError('database is locked')
+        self.job_queue.enqueue([('clean_old_data', {}, '2026-10-18')])
+        key, = self.delivered()
+
+        self.worker.process(key)
+        job = UpdateJob.objects.get(key=key)
+        self.assertEqual((job.status, job.attempts, job.error), (UpdateJob.QUEUED, 1, 'database is locked'))
+        # Not delivered until its retry delay passed
+        self.assertGreater(job.lease_until, timezone.now() + timedelta(seconds=14))
+        self.assertEqual(self.job_queue.requeue_expired(), 0)
+        self.assertEqual(self.delivered(), [])
+
+        self.expire(key)
+        self.assertEqual(self.job_queue.requeue_expired(), 1)
+        self.worker.process(*self.delivered())
+        job = UpdateJob.objects.get(key=key)
+        self.assertEqual((job.status, job.attempts), (UpdateJob.FAILED, 2))
+        self.assertEqual((self.worker.stats['retried'], self.worker.stats['failed']), (1, 1))
+
+    def test_steps_that_swallow_errors_still_fail_the_job(self):
+        self.updater.update_countries_and_leagues.return_value = False
+        self.updater.clean_old_data.return_value = False
+        self.job_queue.enqueue([('countries_and_leagues', {}, '2026-10-18'), ('clean_old_data', {}, '2026-10-18')])
+        for key in self.delivered():
+            self.worker.process(key)
+        self.assertEqual(set(UpdateJob.objects.values_list('status', flat=True)), {UpdateJob.QUEUED})
+        self.assertEqual(self.worker.stats['retried'], 2)
+
+
+class WritePipelineTests(SimpleTestCase):
+    def run_pipeline(self, write_batch, count):
+        fetched = []
+
+        async def produce(pipeline):
+            limit = asyncio.Semaphore(2)
+
+            async def fetch(n):
+                async with limit:
+                    await asyncio.sleep(0.01)
+                    fetched.append(n)
+                await pipeline.aput(n)
+
+            await pipeline.gather(*(fetch(n) for n in range(count)))
+
+        pipeline = WritePipeline(write_batch, batch_size=1)
+        return pipeline, fetched, lambda: pipeline.run(lambda p: asyncio.run(produce(p)))
+
+    def test_writes_everything_produced(self):
+        written = []
+        pipeline, fetched, run = self.run_pipeline(written.extend, 10)
+        stats = run()
+        self.assertEqual(sorted(written), list(range(10)))
+        self.assertEqual((stats['items'], stats['written']), (10, 10))
+        self.assertFalse(pipeline.cancelled)
+
+    def test_writer_failure_stops_pending_fetches(self):
+        def write_batch(items):
+            raise RuntimeError('database is locked')
+
+        pipeline, fetched, run = self.run_pipeline(write_batch, 50)
+        with self.assertRaisesMessage(RuntimeError, 'database is locked'):
+            run()
+        self.assertTrue(pipeline.cancelled)
+        self.assertLess(len(fetched), 10)
+
+
+class LivePollerTests(SimpleTestCase):
+    def test_failed_polls_back_off_instead_of_stopping(self):
+        sleeps = []
+        poller = LivePoller(mock.Mock(), live_interval=60, between_interval=300, idle_interval=3600,
+                            quota_reserve=0, sleep=sleeps.append)
+        steps = [ApiRequestError('HTTP 500', status_code=500), OperationalError('database is locked'),
+                 QuotaExceeded('Daily limit reached'), 60]
+
+        def step():
+            result = steps.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            poller.stop()
+            return result
+
+        with mock.patch.object(poller, 'step', side_effect=step):
+            poller.run()
+        self.assertEqual(sleeps, [300, 300, 3600, 60])
+
+
+##--------------------------------------------------------------------------##
+##------------------------------Team refreshes-------------------------------##
+@override_settings(FOOTBALL_TELEMETRY_DIR=None)
+class TeamRefreshTests(StandinApiMixin, TestCase):
+    def setUp(self):
+        TrackedLeague.objects.all().delete()
+        league = TrackedLeague.objects.create(league_id=39, name='Premier League')
+        for team_id in (33, 34, 35):
+            TrackedTeam.objects.create(league=league, team_id=team_id)
+        self.payloads = RecordingPayloads(league_teams=TrackedLeague.registry())
+        self.server = self.start_standin(payloads=self.payloads)
+        self.updater = DataUpdater(client=self.standin_client(self.server))
+        Country.objects.create(name='England')
+        League.objects.create(id=39, name='Premier League', country_id='England', type='League', logo_url='https://example.com/l.png')
+
+    def test_refreshed_teams_join_their_tracked_league(self):
+        # No fixture is stored, so the memberships can only come from the refresh itself
+        self.updater.update_teams_and_players(['33', '34'], ['35'])
+        season = Season.objects.get(league_id=39, year=season_for(timezone.now().date()))
+        self.assertEqual(set(season.team_seasons.values_list('team_id', flat=True)), {33, 34, 35})
+        self.assertEqual(Team.objects.get(id=35).current_league().id, 39)
+        self.assertFalse(Fixture.objects.exists())
+
+    def test_team_info_is_fetched_once_per_team(self):
+        # The team row and the venue writer share one fetch, whether or not players are refreshed too
+        self.updater.update_teams_and_players(['33', '34'], ['35'])
+        info_requests = [params['id'] for endpoint, params in self.payloads.requests if endpoint == 'teams' and 'id' in params]
+        self.assertEqual(sorted(info_requests), ['33', '34', '35'])
+        self.assertEqual(set(Venue.objects.values_list('id', flat=True)), {331, 341, 351})
+        self.assertEqual(Venue.objects.get(id=351).team_id, 35)
+
+    def test_in_flight_fetches_never_exceed_the_concurrency(self):
+        self.server.latency = 0.05
+        updater = DataUpdater(concurrency=2, client=self.standin_client(self.server))
+        make_request = updater.client.make_request
+        lock = threading.Lock()
+        in_flight = [0]
+        peaks = []
+
+        def counting_request(*args, **kwargs):
+            with lock:
+                in_flight[0] += 1
+                peaks.append(in_flight[0])
+            try:
+                return make_request(*args, **kwargs)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        with mock.patch.object(updater.client, 'make_request', side_effect=counting_request):
+            self.assertEqual(updater.update_teams_and_players(['33', '34', '35']), 3)
+        self.assertGreater(len(peaks), 3)
+        self.assertEqual(max(peaks), 2)
+
+
+##--------------------------------------------------------------------------##
+##-----------------------------------Views-----------------------------------##
+class TeamPageQueryTests(TestCase):
+    # Every page of teams costs the same queries however many teams and leagues it shows
+    @classmethod
+    def setUpTestData(cls):
+        Country.objects.create(name='England')
+        kickoff = datetime(2026, 10, 17, 15, tzinfo=dt_timezone.utc)
+        # Three competitions of one country, so a team's country does not tell its league
+        for league_id, name, kind, first_team in ((39, 'Premier League', 'League', 1), (40, 'Championship', 'League', 21),
+                                                  (45, 'FA Cup', 'Cup', 1)):
+            League.objects.create(id=league_id, name=name, country_id='England', type=kind, logo_url='https://example.com/l.png')
+            season = Season.objects.create(league_id=league_id, year=2026, start_date=date(2026, 8, 1), end_date=date(2027, 5, 31))
+            for team_id in range(first_team, first_team + 20):
+                Team.objects.get_or_create(id=team_id, defaults={
+                    'name': f"Team {team_id:02d}", 'country_id': 'England', 'logo_url': 'https://example.com/t.png',
+                })
+                TeamSeason.objects.create(season=season, team_id=team_id)
+            for index in range(10):
+                home_id = first_team + 2 * index
+                Fixture.objects.create(id=league_id * 100 + index, date=kickoff, timestamp=int(kickoff.timestamp()),
+                                       status_short='FT', league_id=league_id, season=season, round='Regular Season - 9',
+                                       team_home_id=home_id, team_away_id=home_id + 1)
+
+    def test_teams_list(self):
+        for query in ('', '?page=2', '?league=40', '?league=45&page=2', '?search=Team 2'):
+            with self.subTest(query=query), self.assertNumQueries(4):
+                response = self.client.get(f"/teams/{query}")
+            self.assertEqual(response.status_code, 200)
+
+    def test_teams_list_ajax(self):
+        for query in ('?page=1', '?page=3', '?league=40&page=2'):
+            with self.subTest(query=query), self.assertNumQueries(3):
+                response = self.client.get(f"/teams/{query}", headers={'x-requested-with': 'XMLHttpRequest'})
+            self.assertEqual(response.status_code, 200)
+        leagues = {team['id']: team['league'] for team in response.json()['teams']}
+        # A league before a cup of the same season; Championship teams are not in the Premier League
+        self.assertEqual(leagues[33], 'Championship')
+        response = self.client.get('/teams/?page=1', headers={'x-requested-with': 'XMLHttpRequest'})
+        self.assertEqual({team['league'] for team in response.json()['teams']}, {'Premier League'})
+
+    def test_team_detail(self):
+        for team_id, league in ((5, 'Premier League'), (33, 'Championship')):
+            with self.subTest(team_id=team_id), self.assertNumQueries(3):
+                response = self.client.get(f"/teams/{team_id}/")
+            self.assertEqual(response.context['league'].name, league)
+
+
+##--------------------------------------------------------------------------##
+##----------------------------------Shards-----------------------------------##
+@override_settings(FOOTBALL_TELEMETRY_DIR=None)
+class ShardTests(StandinApiMixin, TestCase):
+    def setUp(self):
+        TrackedLeague.objects.all().delete()
+        for league_id in range(1, 41):
+            TrackedLeague.objects.create(league_id=league_id, name=f"League {league_id}")
+        self.league_ids = set(range(1, 41))
+
+    def test_shards_split_the_tracked_leagues(self):
+        for count in range(1, 6):
+            with self.subTest(count=count):
+                shards = [{league.league_id for league in TrackedLeague.active_leagues((index, count))}
+                          for index in range(1, count + 1)]
+                # Every league in exactly one shard
+                self.assertEqual(set().union(*shards), self.league_ids)
+                self.assertEqual(sum(len(shard) for shard in shards), len(self.league_ids))
+        self.assertTrue(all(len(shard) > 0 for shard in shards))
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard('2/4'), (2, 4))
+        self.assertEqual(parse_shard('1/1'), (1, 1))
+        for value in ('0/0', '3/2', '0/2', 'a/b', '2', '1/2/3', ''):
+            with self.subTest(value=value), self.assertRaises(CommandError):
+                parse_shard(value)
+
+    def test_cleanup_only_runs_on_the_first_shard(self):
+        empty_plan = {'countries_and_leagues': [], 'team': [], 'venue': []}
+        for shard, cleans in ((None, True), ((1, 3), True), ((2, 3), False), ((3, 3), False)):
+            with self.subTest(shard=shard):
+                updater = DataUpdater(shard=shard, client=self.standin_client())
+                self.assertEqual(any(kind == 'clean_old_data' for kind, _, _ in plan_update_jobs(updater)), cleans)
+                # The run closes the client when it ends
+                with mock.patch.object(updater, 'update_fixtures'), \
+                        mock.patch.object(updater, 'plan_refreshes', return_value=empty_plan), \
+                        mock.patch.object(updater, 'clean_old_data') as clean_old_data:
+                    updater.update_all_data()
+                self.assertEqual(clean_old_data.called, cleans)
+
+
+##--------------------------------------------------------------------------##
+##---------------------------------Telemetry---------------------------------##
+class RunReportTests(StandinApiMixin, TestCase):
+    def setUp(self):
+        TrackedLeague.objects.all().delete()
+        TrackedLeague.objects.create(league_id=39, name='Premier League', refresh_teams=False)
+        self.server = self.start_standin()
+        self.directory = self.make_temp_dir()
+
+    def run_update(self):
+        # One fixtures-only run against the stand-in server; returns the updater
+        with self.settings(FOOTBALL_TELEMETRY_DIR=str(self.directory)):
+            updater = DataUpdater(client=self.standin_client(self.server))
+        updater.update_all_data()
+        return updater
+
+    def test_runs_in_the_same_second_keep_their_own_report(self):
+        self.run_update()
+        self.run_update()
+        reports = list(self.directory.glob('*/*.json'))
+        self.assertEqual(len(reports), 2)
+        self.assertEqual({json.loads(path.read_text())['instance'] for path in reports}, {'all'})
+
+    def test_report_covers_the_run(self):
+        self.run_update()
+        report = json.loads((self.directory / 'latest-all.json').read_text())
+        self.assertEqual(report['instance'], 'all')
+        self.assertIn('fixtures', report['phases'])
+        self.assertGreater(report['api']['calls'], 0)
+        self.assertIn('fixtures', report['api']['latency'])
+        latency = report['api']['latency']['fixtures']
+        self.assertEqual(latency['buckets']['+Inf'], latency['count'])
+        self.assertEqual(set(report['cache']), {'hits', 'stale_hits', 'misses', 'coalesced', 'hit_rate'})
+        self.assertEqual(report['rows']['Fixture']['inserted'], Fixture.objects.count())
+        self.assertGreater(report['db']['queries'], 0)
+
+    def test_prometheus_text_declares_each_family_once(self):
+        self.run_update()
+        report = json.loads((self.directory / 'latest-all.json').read_text())
+        other = dict(report, instance='teams')
+        lines = prometheus_text([report, other]).splitlines()
+        declarations = [line for line in lines if line.startswith('# TYPE ')]
+        self.assertEqual(len(declarations), len(set(declarations)))
+        self.assertEqual(len(declarations), len([line for line in lines if line.startswith('# HELP ')]))
+        self.assertIn('# TYPE football_api_request_duration_seconds histogram', lines)
+        self.assertIn('# TYPE football_update_api_calls gauge', lines)
+        self.assertIn(f'football_update_api_calls{{instance="all"}} {report["api"]["calls"]}', lines)
+        self.assertIn(f'football_update_api_calls{{instance="teams"}} {report["api"]["calls"]}', lines)
+        self.assertIn(
+            f'football_api_request_duration_seconds_bucket{{instance="all",endpoint="fixtures",le="+Inf"}} '
+            f'{report["api"]["latency"]["fixtures"]["count"]}', lines)
+        self.assertIn(
+            f'football_api_request_duration_seconds_count{{instance="all",endpoint="fixtures"}} '
+            f'{report["api"]["latency"]["fixtures"]["count"]}', lines)
+        self.assertTrue(any(line.startswith('football_api_request_duration_seconds_sum{instance="all",endpoint="fixtures"} ')
+                            for line in lines))
+
+    def test_metrics_view(self):
+        with self.settings(FOOTBALL_TELEMETRY_DIR=str(self.directory)):
+            response = self.client.get('/metrics/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+            self.assertEqual(response.content.decode().strip(), '')
+
+            self.run_update()
+            body = self.client.get('/metrics/').content.decode()
+        self.assertIn('# TYPE football_update_duration_seconds gauge', body)
+        self.assertIn('football_update_phase_seconds{instance="all",phase="fixtures"} ', body)
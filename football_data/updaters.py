@@ -1,338 +1,756 @@
-import random
-import time
+import asyncio
 import logging
+import time
+from django.conf import settings
 from django.utils import timezone
 from django.utils.timezone import localtime
 from django.db import transaction
-from .models import Country, League, Season, Team, Player, Fixture, Venue
+from .models import Country, League, Team, TeamSeason, Player, Fixture, Venue, SyncWatermark, TrackedLeague
 from .api_client import FootballApiClient
+from .async_client import AsyncFootballApiClient
+from .bulk_writes import batch_size, bulk_upsert
+from .exceptions import QuotaExceeded, UpstreamUnavailable
+from .identity_map import IdentityMap
+from .pipeline import WritePipeline
+from .refresh_scheduler import RefreshScheduler, content_hash
+from .telemetry import RunTelemetry
 
 logger = logging.getLogger(__name__)
 
+# Columns overwritten when a row that already exists is written again
+TEAM_UPDATE_FIELDS = ['name', 'code', 'country', 'founded', 'national', 'logo_url', 'last_updated']
+PLAYER_UPDATE_FIELDS = [
+    'name', 'firstname', 'lastname', 'age', 'birth_date', 'nationality',
+    'height', 'weight', 'photo_url', 'team', 'last_updated',
+]
+FIXTURE_UPDATE_FIELDS = [
+    'referee', 'time_zone', 'date', 'match_date', 'timestamp', 'venue', 'status_long', 'status_short', 'status_elapsed',
+    'league', 'season', 'round', 'team_home', 'team_away', 'goals_home', 'goals_away',
+    'score_halftime_home', 'score_halftime_away', 'score_fulltime_home', 'score_fulltime_away',
+    'score_extratime_home', 'score_extratime_away', 'score_penalty_home', 'score_penalty_away',
+    'last_updated',
+]
+
+
+def season_for(day):
+    # API-Football names a European season after the year it starts in, in July or August
+    return day.year if day.month >= 7 else day.year - 1
+
+
+def team_from_info(team_info, now):
+    # Maps the 'team' object of a teams response to an unsaved Team
+    return Team(
+        id=team_info['id'],
+        name=team_info['name'],
+        code=team_info.get('code'),
+        country_id=team_info.get('country', 'Unknown'),
+        founded=team_info.get('founded'),
+        national=team_info.get('national', False),
+        logo_url=team_info.get('logo'),
+        last_updated=now
+    )
+
+
+def player_from_info(player_info, team_obj, now):
+    # Maps the 'player' object of a players response to an unsaved Player of `team_obj`
+    return Player(
+        id=player_info['id'],
+        name=player_info['name'],
+        firstname=player_info.get('firstname'),
+        lastname=player_info.get('lastname'),
+        age=player_info.get('age'),
+        birth_date=player_info.get('birth', {}).get('date'),
+        nationality=player_info.get('nationality'),
+        height=player_info.get('height'),
+        weight=player_info.get('weight'),
+        photo_url=player_info.get('photo'),
+        team=team_obj,
+        last_updated=now
+    )
+
+
 class DataUpdater:
-    def __init__(self):
-        self.client = FootballApiClient()
-        # Dictionary of top leagues and their associated team IDs
+    def __init__(self, concurrency=None, shard=None, client=None):
+        self.client = client or FootballApiClient()
+        # Concurrent front-end sharing the same pooled session and rate limit
+        self.async_client = AsyncFootballApiClient(self.client, max_concurrency=concurrency)
+        # This process's share (index, count) of the tracked leagues, or None for all of them.
+        # Work that is not per league (countries and leagues, cleanup) is done by the first shard.
+        self.shard = shard
+        self.runs_global_tasks = shard is None or shard[0] == 1
+        leagues = TrackedLeague.active_leagues(shard)
+        # League ids mapped to the ids of the teams whose info, players and venues are refreshed
         self.top_leagues = {
-            '39': ['33', '34', '40', '42', '46', '47', '48', '49', '50', '51'],  # Premier League
-            '140': ['529', '530', '531', '532', '533', '536', '537', '538', '540', '541'],  # La Liga
-            '78': ['157', '159', '161', '162', '163', '164', '165', '167', '168', '169'],  # Bundesliga
-            '135': ['489', '492', '494', '496', '497', '498', '499', '500', '502', '503'],  # Serie A
-            '61': ['77', '79', '80', '81', '82', '83', '84', '85', '91', '93']  # Ligue 1
+            str(league.league_id): [str(team.team_id) for team in league.teams.all()] if league.refresh_teams else []
+            for league in leagues
         }
-        self.api_calls = 0
-        self.max_api_calls = 95  # Safety margin to avoid exceeding API limit
+        # Tracked team ids mapped to the ids of their tracked leagues, whose memberships are recorded on refresh
+        self.team_leagues = {}
+        for league_id, team_ids in self.top_leagues.items():
+            for team_id in team_ids:
+                self.team_leagues.setdefault(int(team_id), []).append(int(league_id))
+        # Leagues whose fixtures are synced daily and polled live
+        self.fixture_leagues = [str(league.league_id) for league in leagues if league.sync_fixtures]
+        self.quota_remaining = None  # Daily quota left when the last run finished
+        # Countries, leagues, teams and seasons known to exist, so fixtures can refer to them without queries
+        self.identity_map = IdentityMap()
+        self.scheduler = RefreshScheduler(
+            self.top_leagues,
+            league_priorities={str(league.league_id): league.priority for league in leagues},
+            global_tasks=self.runs_global_tasks,
+        )
+        self.write_counts = {}  # Model name -> rows created, updated and left unchanged in this run
+        # Writers of the parts of a team info response other than the team row. Each is given the team
+        # and the response, and returns the content hash to record as a refresh of its entity (or None).
+        self.team_info_persisters = {'venue': self.persist_venue}
+        # Phase times, API latencies, cache and row counts of each run, written as a JSON run report
+        self.telemetry = RunTelemetry(self)
+        self.last_report = None  # Telemetry of the last run
+
+    @property
+    def api_calls(self):
+        # Calls are counted by the client, which also enforces the rate limit and daily quota
+        return self.client.api_calls
+
+    def quota_exhausted(self):
+        return self.client.quota_remaining() <= 0
 
-    @transaction.atomic
     def update_all_data(self):
-        # Main method to update all data, runs different updates based on the day of the week
+        # Main method to update all data. Fixtures are always brought up to date; what else is
+        # refreshed is planned from staleness against the quota left after that.
+        # There is no run-wide transaction: each batch commits on its own, so work done before
+        # a failure is kept and the database is never locked while waiting on the API.
         logger.info("Starting data update...")
+        self.identity_map = IdentityMap()
+        self.write_counts = {}
+        self.client.retry_budget.reset()
+        self.telemetry.start()
         
         try:
-            current_time = localtime(timezone.now())
-            day_of_week = current_time.weekday()
-            logger.info(f"Current day of week: {day_of_week} (Current time: {current_time})")
-            
-            self.update_fixtures()  # Daily update
+            logger.info(f"Current time: {localtime(timezone.now())}")
             
-            if day_of_week == 0:  # Monday
-                logger.info("It's Monday. Updating countries and leagues.")
-                self.update_countries_and_leagues()
+            with self.telemetry.phase('fixtures'):
+                self.update_fixtures()  # Daily update
             
-            if day_of_week < 5:  # Monday to Friday
-                logger.info(f"Updating teams and players for day {day_of_week}.")
-                self.update_teams_and_players(day_of_week)
-            
-            if day_of_week == 5:  # Saturday
-                logger.info("It's Saturday. Updating venues.")
-                self.update_venues()
+            # Costs are estimates, so quota left over after a plan is offered to a new one
+            for _ in range(getattr(settings, 'FOOTBALL_REFRESH_MAX_ROUNDS', 3)):
+                plan = self.plan_refreshes()
+                if not any(plan.values()):
+                    break
+                if plan['countries_and_leagues']:
+                    with self.telemetry.phase('countries_and_leagues'):
+                        self.update_countries_and_leagues()
+                if plan['team'] or plan['venue']:
+                    # One team info fetch per team feeds the team, venue and player writers
+                    with self.telemetry.phase('teams'):
+                        self.update_teams_and_players(plan['team'], plan['venue'])
             
-            self.clean_old_data()
+            if self.runs_global_tasks:
+                with self.telemetry.phase('clean_old_data'):
+                    self.clean_old_data()
             
-            logger.info(f"Data update completed. Total API calls: {self.api_calls}")
+            logger.info(f"Data update completed. Total API calls: {self.api_calls}. Quota remaining: {self.client.quota_remaining()}")
+        except UpstreamUnavailable as e:
+            # Circuit open or retry budget spent: end the run now instead of stalling on every remaining call
+            logger.error(f"Football API unavailable, ending data update early: {str(e)}")
         except Exception as e:
             logger.error(f"Error during data update: {str(e)}")
+        finally:
+            self.log_connection_timings()
+            # Read before closing the client, which also closes the quota ledger
+            self.quota_remaining = self.client.quota_remaining()
+            self.async_client.close()
+            self.write_run_report()
+
+    def write_run_report(self):
+        # Writes the run's telemetry and keeps it as last_report; a failure here must not fail the run
+        try:
+            report = self.last_report = self.telemetry.report(self.quota_remaining)
+            path = self.telemetry.write(report)
+        except Exception as e:
+            logger.error(f"Error writing run report: {str(e)}")
+            return
+        logger.info(
+            f"Run took {report['seconds']:.2f}s ("
+            + ', '.join(f"{name}: {seconds:.2f}s" for name, seconds in report['phases'].items())
+            + f"); {report['db']['queries']} queries took {report['db']['seconds']:.2f}s"
+            + (f". Run report: {path}" if path else '')
+        )
+
+    def log_connection_timings(self):
+        # Logs how much time went into connection setup versus waiting for the API
+        summary = self.client.timing_summary()
+        logger.info(
+            f"HTTP requests: {summary['requests']} "
+            f"(new connections: {summary['new_connections']}, reused: {summary['reused_connections']}). "
+            f"Connect: {summary['connect']:.2f}s, TLS: {summary['tls']:.2f}s, "
+            f"first byte: {summary['first_byte']:.2f}s, total: {summary['total']:.2f}s"
+        )
+        stats = self.client.cache_stats
+        logger.info(
+            f"API cache: {stats['hits']} hits, {stats['stale_hits']} stale hits, {stats['misses']} misses, "
+            f"{stats['coalesced']} coalesced (hit rate {stats['hit_rate']:.0%})"
+        )
+        for model_name, counts in self.write_counts.items():
+            logger.info(
+                f"{model_name} rows: {counts['created']} created, {counts['updated']} changed, "
+                f"{counts['unchanged']} unchanged (not rewritten)"
+            )
+        lookups = self.identity_map.stats
+        logger.info(
+            f"Row lookups: {lookups['hits']} answered from memory, {lookups['misses']} new rows, "
+            f"{lookups['preload_queries']} preload queries"
+        )
+
+    def record_writes(self, model, result):
+        # Adds a bulk_upsert() result to the run's counts and passes it through
+        created_ids, updated_ids, unchanged_ids = result
+        counts = self.write_counts.setdefault(model.__name__, {'created': 0, 'updated': 0, 'unchanged': 0})
+        counts['created'] += len(created_ids)
+        counts['updated'] += len(updated_ids)
+        counts['unchanged'] += len(unchanged_ids)
+        return result
+
+    def plan_refreshes(self, pending_calls=0):
+        # Picks the refreshes worth the most freshness within the quota, keeping
+        # FOOTBALL_REFRESH_QUOTA_RESERVE calls for live polling and `pending_calls` for work planned already
+        budget = self.client.quota_remaining() - getattr(settings, 'FOOTBALL_REFRESH_QUOTA_RESERVE', 20) - pending_calls
+        if self.shard is not None:
+            # Shards running side by side draw on one quota; each plans with its share of what is left
+            budget //= self.shard[1]
+        return self.scheduler.plan(budget)
 
     def update_countries_and_leagues(self):
-        # Updates country and league data
+        # Updates country and league data; returns whether they were written
         logger.info("Updating countries and leagues...")
         try:
-            # Fetch and update countries
+            # Fetch both lists before writing, so the transaction is not held open during API calls
             countries_data = self.client.get_countries()
-            self.api_calls += 1
-            
-            for country in countries_data['response']:
-                Country.objects.update_or_create(
-                    name=country['name'],
-                    defaults={
-                        'code': country.get('code'),
-                        'flag_url': country.get('flag'),
-                        'last_updated': timezone.now()
-                    }
-                )
-            
-            # Fetch and update leagues
             leagues_data = self.client.get_leagues()
-            self.api_calls += 1
-            
-            for league in leagues_data['response']:
-                if str(league['league']['id']) in self.top_leagues:
-                    country, _ = Country.objects.get_or_create(name=league['country']['name'])
-                    League.objects.update_or_create(
-                        id=league['league']['id'],
-                        defaults={
-                            'name': league['league']['name'],
-                            'type': league['league'].get('type', 'Unknown'),
-                            'country': country,
-                            'logo_url': league['league'].get('logo'),
-                            'last_updated': timezone.now()
-                        }
-                    )
+
+            try:
+                with transaction.atomic():
+                    self.write_countries(countries_data)
+                    self.write_leagues(leagues_data)
+                    SyncWatermark.record_refresh('countries_and_leagues', {
+                        '': content_hash([countries_data['response'], leagues_data['response']])
+                    })
+            except Exception:
+                # Rows remembered inside the rolled back transaction do not exist
+                self.identity_map.clear()
+                raise
             
             logger.info(f"Countries and leagues updated. API calls: {self.api_calls}")
+            return True
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Error updating countries and leagues: {str(e)}")
+            return False
+
+    def write_countries(self, countries_data):
+        # Upserts the countries of a countries response; returns the number written
+        now = timezone.now()
+        countries = [
+            Country(name=country['name'], code=country.get('code'), flag_url=country.get('flag'), last_updated=now)
+            for country in countries_data['response']
+        ]
+        self.record_writes(Country, bulk_upsert(Country, countries, ['code', 'flag_url', 'last_updated']))
+        self.identity_map.remember(countries)
+        return len(countries)
+
+    def write_leagues(self, leagues_data):
+        # Upserts the tracked leagues of a leagues response (of every shard), creating their countries
+        # if needed; returns the number written
+        now = timezone.now()
+        tracked = set(TrackedLeague.objects.filter(active=True).values_list('league_id', flat=True))
+        leagues = []
+        for league in leagues_data['response']:
+            if int(league['league']['id']) in tracked:
+                leagues.append(League(
+                    id=league['league']['id'],
+                    name=league['league']['name'],
+                    type=league['league'].get('type', 'Unknown'),
+                    country_id=league['country']['name'],
+                    logo_url=league['league'].get('logo'),
+                    last_updated=now
+                ))
+        self.identity_map.ensure(Country, [Country(name=league.country_id) for league in leagues])
+        self.record_writes(League, bulk_upsert(League, leagues, ['name', 'type', 'country', 'logo_url', 'last_updated']))
+        self.identity_map.remember(leagues)
+        return len(leagues)
 
     def update_fixtures(self):
-        # Updates fixture data for the previous day
+        # Updates fixture data through yesterday, fetching only the days each league is missing
         logger.info("Updating fixtures...")
-        yesterday = (timezone.now() - timezone.timedelta(days=1)).strftime("%Y-%m-%d")
+        yesterday = (timezone.now() - timezone.timedelta(days=1)).date()
         try:
-            fixtures_data = self.client.get_fixtures(yesterday)
-            self.api_calls += 1
-            logger.info(f"Retrieved {len(fixtures_data['response'])} fixtures for {yesterday}")
-            
-            fixtures_created = 0
-            for fixture in fixtures_data['response']:
-                if str(fixture['league']['id']) not in self.top_leagues:
-                    continue  # Skip fixtures for leagues we're not interested in
-
-                try:
-                    # Create or update league, teams, and season
-                    league, _ = League.objects.get_or_create(
-                        id=fixture['league']['id'],
-                        defaults={
-                            'name': fixture['league']['name'],
-                            'country': Country.objects.get_or_create(name=fixture['league']['country'])[0],
-                            'type': 'Unknown',
-                            'last_updated': timezone.now()
-                        }
-                    )
-                    home_team, _ = Team.objects.get_or_create(
-                        id=fixture['teams']['home']['id'],
-                        defaults={
-                            'name': fixture['teams']['home']['name'],
-                            'national': False,
-                            'country': Country.objects.get_or_create(name=fixture['teams']['home'].get('country', 'Unknown'))[0]
-                        }
-                    )
-                    away_team, _ = Team.objects.get_or_create(
-                        id=fixture['teams']['away']['id'],
-                        defaults={
-                            'name': fixture['teams']['away']['name'],
-                            'national': False,
-                            'country': Country.objects.get_or_create(name=fixture['teams']['away'].get('country', 'Unknown'))[0]
-                        }
-                    )
-                    
-                    season, _ = Season.objects.get_or_create(
-                        year=fixture['league']['season'],
-                        league=league,
-                        defaults={
-                            'start_date': timezone.now().date(),
-                            'end_date': timezone.now().date() + timezone.timedelta(days=365),
-                            'current': True
-                        }
-                    )
-                    
-                    # Create or update fixture
-                    Fixture.objects.update_or_create(
-                        id=fixture['fixture']['id'],
-                        defaults={
-                            'referee': fixture['fixture'].get('referee'),
-                            'date': fixture['fixture']['date'],
-                            'timestamp': fixture['fixture']['timestamp'],
-                            'status_short': fixture['fixture']['status']['short'],
-                            'league': league,
-                            'season': season,
-                            'round': fixture['league']['round'],
-                            'team_home': home_team,
-                            'team_away': away_team,
-                            'goals_home': fixture['goals']['home'],
-                            'goals_away': fixture['goals']['away'],
-                            'last_updated': timezone.now()
-                        }
-                    )
-                    fixtures_created += 1
-                except Exception as e:
-                    logger.error(f"Error updating fixture: {str(e)}")
-            logger.info(f"Fixtures updated. Created/Updated: {fixtures_created}. API calls: {self.api_calls}")
+            windows = self.fixture_sync_windows(yesterday)
+            if not windows:
+                logger.info(f"Fixtures are already synced through {yesterday}")
+                return
+
+            # Fixtures are parsed one at a time; those of leagues we're not interested in are skipped unparsed.
+            # They are written in batches so the response never has to be held in memory as a whole.
+            parse_stats = {}
+            counts = [0, 0, 0]  # Created, updated, unchanged
+            if all(start == yesterday for start in windows.values()):
+                # Usual case: only yesterday is missing, and one request covers every league
+                self.sync_fixture_day(yesterday, list(windows), parse_stats, counts)
+            else:
+                # After a gap, ask for exactly the missing days of each league
+                for league_id, start in windows.items():
+                    self.sync_league_fixtures(league_id, start, yesterday, parse_stats, counts)
+            logger.info(
+                f"Retrieved {parse_stats.get('parsed', 0) + parse_stats.get('skipped', 0)} fixtures through {yesterday} "
+                f"({parse_stats.get('skipped', 0)} from untracked leagues skipped)"
+            )
+            logger.info(
+                f"Fixtures updated. Created: {counts[0]}, updated: {counts[1]}, unchanged: {counts[2]}. API calls: {self.api_calls}"
+            )
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Error updating fixtures: {str(e)}")
 
-    def update_teams_and_players(self, day_index):
-        # Updates team and player data, spreading the updates over the week
-        logger.info("Updating teams and players...")
-        teams_updated = 0
-        
-        start_index = day_index * 2
-        end_index = start_index + 2
-        
-        for league_id, team_ids in self.top_leagues.items():
-            if self.api_calls >= self.max_api_calls:
-                logger.warning("Approaching API call limit. Stopping update.")
-                return
-            
-            logger.info(f"Updating teams for league {league_id}")
-            
-            for team_id in team_ids[start_index:end_index]:
-                try:
-                    # Fetch and update team data
-                    team_data = self.client.get_team_info(team_id)
-                    self.api_calls += 1
-                    
-                    if not team_data['response']:
-                        logger.warning(f"No data found for team {team_id}")
-                        continue
-                    
-                    team_info = team_data['response'][0]['team']
-                    
-                    country, _ = Country.objects.get_or_create(name=team_info.get('country', 'Unknown'))
-                    team_obj, created = Team.objects.update_or_create(
+    def sync_fixture_day(self, day, league_ids, parse_stats, counts):
+        # Stores one day's fixtures of the leagues with a single request and advances their watermarks
+        # if every batch was written. Returns the number of failed batches.
+        fixtures = self.client.iter_fixtures(day.isoformat(), league_ids, parse_stats)
+        failed_batches = self.write_fixture_stream(fixtures, counts)
+        if not failed_batches:
+            SyncWatermark.advance('fixtures', league_ids, synced_until=day)
+        return failed_batches
+
+    def sync_league_fixtures(self, league_id, start, until, parse_stats, counts):
+        # Stores a league's fixtures from `start` through `until` (one request per season the window
+        # touches) and advances its watermark if every batch was written. Returns the number of failed batches.
+        failed_batches = 0
+        for season in sorted({season_for(start), season_for(until)}):
+            fixtures = self.client.iter_fixtures_range(league_id, season, start.isoformat(), until.isoformat(), parse_stats)
+            failed_batches += self.write_fixture_stream(fixtures, counts)
+        logger.info(f"Fetched fixtures of league {league_id} from {start} to {until}")
+        if not failed_batches:
+            SyncWatermark.advance('fixtures', [league_id], synced_until=until)
+        return failed_batches
+
+    def fixture_sync_windows(self, until):
+        # Returns {league_id: first missing day} for the leagues whose fixtures are not synced through `until`.
+        # A league never synced starts at `until`; gaps longer than FOOTBALL_SYNC_MAX_GAP_DAYS are truncated.
+        earliest = until - timezone.timedelta(days=getattr(settings, 'FOOTBALL_SYNC_MAX_GAP_DAYS', 7) - 1)
+        watermarks = SyncWatermark.for_entity('fixtures')
+        windows = {}
+        for league_id in self.fixture_leagues:
+            watermark = watermarks.get(league_id)
+            if watermark is None or watermark.synced_until is None:
+                start = until
+            else:
+                start = max(watermark.synced_until + timezone.timedelta(days=1), earliest)
+            if start <= until:
+                windows[league_id] = start
+        return windows
+
+    def write_fixture_stream(self, fixtures, counts):
+        # Writes incrementally decoded fixtures in batches, adding the numbers created, updated and unchanged
+        # to `counts`; returns the number of batches that failed
+        failed_batches = 0
+        pending = []
+        for fixture in fixtures:
+            pending.append(fixture)
+            if len(pending) >= batch_size():
+                failed_batches += self._write_counted(pending, counts)
+                pending = []
+        if pending:
+            failed_batches += self._write_counted(pending, counts)
+        return failed_batches
+
+    def _write_counted(self, fixtures, counts):
+        result = self.write_fixture_batch(fixtures)
+        if result is None:
+            return 1
+        for index, count in enumerate(result):
+            counts[index] += count
+        return 0
+
+    def write_fixture_batch(self, fixtures):
+        # Writes one batch of fixtures in its own transaction (a savepoint if the caller already has one),
+        # so a failing batch only loses its own fixtures. Returns the numbers of fixtures created, updated
+        # and unchanged, or None if the batch failed.
+        try:
+            with transaction.atomic():
+                return self.write_fixtures(fixtures)
+        except Exception as e:
+            self.identity_map.clear()
+            logger.error(f"Error writing {len(fixtures)} fixtures: {str(e)}")
+            return None
+
+    def write_fixtures(self, fixtures):
+        # Upserts a batch of fixtures, first creating any league, team or season they refer to.
+        # Returns the numbers of fixtures created, updated and unchanged.
+        now = timezone.now()
+        countries = {}
+        leagues = {}
+        teams = {}
+        rows = []
+        for fixture in fixtures:
+            try:
+                league_info = fixture['league']
+                countries.setdefault(league_info['country'], Country(name=league_info['country']))
+                leagues.setdefault(league_info['id'], League(
+                    id=league_info['id'],
+                    name=league_info['name'],
+                    country_id=league_info['country'],
+                    type='Unknown',
+                    last_updated=now
+                ))
+                for side in ('home', 'away'):
+                    team_info = fixture['teams'][side]
+                    country_name = team_info.get('country', 'Unknown')
+                    countries.setdefault(country_name, Country(name=country_name))
+                    teams.setdefault(team_info['id'], Team(
                         id=team_info['id'],
-                        defaults={
-                            'name': team_info['name'],
-                            'code': team_info.get('code'),
-                            'country': country,
-                            'founded': team_info.get('founded'),
-                            'national': team_info.get('national', False),
-                            'logo_url': team_info.get('logo'),
-                            'last_updated': timezone.now()
-                        }
+                        name=team_info['name'],
+                        national=False,
+                        country_id=country_name
+                    ))
+                rows.append(fixture)
+            except Exception as e:
+                logger.error(f"Error updating fixture: {str(e)}")
+
+        # Leagues, teams and countries seen in fixtures are only created, never overwritten
+        self.identity_map.ensure(Country, list(countries.values()))
+        self.identity_map.ensure(League, list(leagues.values()))
+        self.identity_map.ensure(Team, list(teams.values()))
+
+        season_defaults = self.season_defaults(now)
+        fixture_objs = []
+        memberships = {}
+        for fixture in rows:
+            # A malformed fixture is logged and skipped; the rest of the batch is still written
+            try:
+                status = fixture['fixture']['status']
+                score = fixture.get('score') or {}
+                venue_id = (fixture['fixture'].get('venue') or {}).get('id')
+                fixture_obj = Fixture(
+                    id=fixture['fixture']['id'],
+                    referee=fixture['fixture'].get('referee'),
+                    time_zone=fixture['fixture'].get('timezone') or 'UTC',
+                    date=fixture['fixture']['date'],
+                    timestamp=fixture['fixture']['timestamp'],
+                    # Venues are stored from team info; a fixture only links to one that is already known
+                    venue_id=self.identity_map.get(Venue, venue_id) if venue_id is not None else None,
+                    status_long=status.get('long') or '',
+                    status_short=status['short'],
+                    status_elapsed=status.get('elapsed'),
+                    league_id=fixture['league']['id'],
+                    season_id=self.identity_map.season_id(fixture['league']['id'], fixture['league']['season'], season_defaults),
+                    round=fixture['league']['round'],
+                    team_home_id=fixture['teams']['home']['id'],
+                    team_away_id=fixture['teams']['away']['id'],
+                    goals_home=fixture['goals']['home'],
+                    goals_away=fixture['goals']['away'],
+                    score_halftime_home=(score.get('halftime') or {}).get('home'),
+                    score_halftime_away=(score.get('halftime') or {}).get('away'),
+                    score_fulltime_home=(score.get('fulltime') or {}).get('home'),
+                    score_fulltime_away=(score.get('fulltime') or {}).get('away'),
+                    score_extratime_home=(score.get('extratime') or {}).get('home'),
+                    score_extratime_away=(score.get('extratime') or {}).get('away'),
+                    score_penalty_home=(score.get('penalty') or {}).get('home'),
+                    score_penalty_away=(score.get('penalty') or {}).get('away'),
+                    last_updated=now
+                )
+                fixture_objs.append(fixture_obj)
+                # Both teams play in the fixture's season
+                for team_id in (fixture_obj.team_home_id, fixture_obj.team_away_id):
+                    memberships.setdefault(
+                        (fixture_obj.season_id, team_id), TeamSeason(season_id=fixture_obj.season_id, team_id=team_id)
                     )
-                    
-                    teams_updated += 1
-                    logger.info(f"{'Created' if created else 'Updated'} team: {team_obj.name}")
-                    
-                    self.update_team_players(team_obj)
-                except Exception as e:
-                    logger.error(f"Error updating team {team_id}: {str(e)}")
+            except Exception as e:
+                logger.error(f"Error updating fixture: {str(e)}")
+        self.identity_map.ensure(TeamSeason, list(memberships.values()))
+
+        created_ids, updated_ids, unchanged_ids = self.record_writes(
+            Fixture, bulk_upsert(Fixture, fixture_objs, FIXTURE_UPDATE_FIELDS)
+        )
+        return len(created_ids), len(updated_ids), len(unchanged_ids)
+
+    def season_defaults(self, now):
+        # Fields of a season first seen in API data, which does not tell its dates
+        return {
+            'start_date': now.date(),
+            'end_date': now.date() + timezone.timedelta(days=365),
+            'current': True
+        }
+
+    def write_team_seasons(self, league_id, year, team_ids):
+        # Records that the teams play in the league's season `year` (e.g. from a league's team list).
+        # Returns the number of memberships created; none if the league is not stored.
+        if self.identity_map.get(League, league_id) is None:
+            return 0
+        season_id = self.identity_map.season_id(league_id, year, self.season_defaults(timezone.now()))
+        return self.identity_map.ensure(
+            TeamSeason, [TeamSeason(season_id=season_id, team_id=team_id) for team_id in team_ids]
+        )
+
+    def write_tracked_memberships(self, team_ids, season=None):
+        # Records refreshed tracked teams as playing in `season` (by default the current one) of their
+        # tracked leagues, so a team without a stored fixture still has a league. Returns the number created.
+        season = season or season_for(timezone.now().date())
+        league_teams = {}
+        for team_id in team_ids:
+            for league_id in self.team_leagues.get(team_id, ()):
+                league_teams.setdefault(league_id, []).append(team_id)
+        return sum(
+            self.write_team_seasons(league_id, season, league_team_ids)
+            for league_id, league_team_ids in league_teams.items()
+        )
+
+    def update_teams_and_players(self, team_ids, info_team_ids=()):
+        # Updates team and player data of `team_ids`, and the team info (team row, venue) of the
+        # teams in `info_team_ids`. Each team's info is fetched once and given to every persister.
+        # Returns the number of teams written.
+        info_team_ids = [team_id for team_id in info_team_ids if team_id not in team_ids]
+        logger.info(f"Updating teams and players of {len(team_ids)} teams and team info of {len(info_team_ids)} more...")
+
+        if self.quota_exhausted():
+            logger.warning("Approaching API call limit. Stopping update.")
+            return 0
+
+        # Teams and their player pages are fetched concurrently in the background while
+        # this thread, the only one writing to the database, stores them as they arrive
+        season = timezone.now().year
+        calls = self.api_calls
+        pipeline = WritePipeline(self.write_team_bundles)
+        try:
+            pipeline.run(lambda p: asyncio.run(self._produce_team_bundles(team_ids, info_team_ids, season, p)))
+        finally:
+            self.log_pipeline_stats(pipeline)
         
-        logger.info(f"Total teams updated: {teams_updated}")
+        written = pipeline.stats['written']
+        calls = self.api_calls - calls
+        logger.info(
+            f"Total teams updated: {written} with {calls} API calls "
+            f"({calls / written if written else 0:.1f} per team); one team info fetch per team fed "
+            f"{', '.join(['team', *self.team_info_persisters])}"
+        )
+        return written
 
-    def update_team_players(self, team_obj):
-        # Updates player data for a specific team
-        logger.info(f"Updating players for team {team_obj.name}")
-        players_created = 0
-        players_updated = 0
-        for page in range(1, 5):  # 4 pages of players
-            if self.api_calls >= self.max_api_calls:
-                logger.warning("Approaching API call limit. Stopping player update.")
-                return
-            
+    async def _produce_team_bundles(self, team_ids, info_team_ids, season, pipeline):
+        # Fetches each team's bundle and queues (team_id, bundle) or (team_id, exception) for the writer.
+        # Teams not fetched yet when the writer fails are not fetched at all.
+        async def produce(team_id, with_players):
+            started = time.monotonic()
             try:
-                time.sleep(random.uniform(1, 3))  # Random delay to avoid API rate limiting
+                bundle = await self._fetch_team_bundle(team_id, season, with_players)
+            except Exception as e:
+                bundle = e
+            await pipeline.aput((team_id, bundle), time.monotonic() - started)
+
+        await pipeline.gather(
+            *(produce(team_id, True) for team_id in team_ids),
+            *(produce(team_id, False) for team_id in info_team_ids),
+        )
+
+    def write_team_bundles(self, items):
+        # Writes a batch of fetched (team_id, bundle) pairs; returns the number of teams written
+        now = timezone.now()
+        teams = []  # (Team, team_data, players_pages, complete, content hash)
+        for team_id, bundle in items:
+            try:
+                if isinstance(bundle, UpstreamUnavailable):
+                    raise bundle
+                if isinstance(bundle, QuotaExceeded):
+                    logger.warning(f"Approaching API call limit. Skipping team {team_id}.")
+                    continue
+                if isinstance(bundle, Exception):
+                    raise bundle
+
+                team_data, players_pages, complete = bundle
                 
-                players_data = self.client.get_players(team=team_obj.id, season=timezone.now().year, page=page)
-                self.api_calls += 1
+                if not team_data['response']:
+                    logger.warning(f"No data found for team {team_id}")
+                    continue
+                
+                teams.append((
+                    team_from_info(team_data['response'][0]['team'], now),
+                    team_data, players_pages, complete, content_hash([team_data['response'], players_pages])
+                ))
+            except UpstreamUnavailable:
+                raise
+            except Exception as e:
+                logger.error(f"Error updating team {team_id}: {str(e)}")
+
+        if not teams:
+            return 0
+
+        # One transaction per batch; each team's players get a savepoint inside it
+        try:
+            with transaction.atomic():
+                created_ids, _, unchanged_ids = self.write_teams([team[0] for team in teams])
+                self.write_tracked_memberships([team[0].id for team in teams])
+                created_ids = set(created_ids)
+                unchanged_ids = set(unchanged_ids)
+
+                synced = {}
+                refreshed = {entity: {} for entity in self.team_info_persisters}
+                for team_obj, team_data, players_pages, complete, team_hash in teams:
+                    action = 'Created' if team_obj.id in created_ids else 'Unchanged' if team_obj.id in unchanged_ids else 'Updated'
+                    logger.info(f"{action} team: {team_obj.name}")
+                    # Players are None when only the team info was refreshed
+                    if players_pages is not None and self.update_team_players(team_obj, players_pages) and complete:
+                        synced[team_obj.id] = team_hash
+                    self.persist_team_info(team_obj, team_data, refreshed)
+                # Teams whose players were cut short (quota, errors) stay stale
+                SyncWatermark.record_refresh('team', synced)
+                for entity, hashes in refreshed.items():
+                    SyncWatermark.record_refresh(entity, hashes)
+        except Exception as e:
+            self.identity_map.clear()
+            logger.error(f"Error writing {len(teams)} teams: {str(e)}")
+            return 0
+        return len(teams)
+
+    def persist_team_info(self, team_obj, team_data, refreshed):
+        # Gives a team info response to every persister, each in its own savepoint, adding the
+        # content hashes they return to `refreshed` ({entity: {team id: hash}})
+        for entity, persister in self.team_info_persisters.items():
+            try:
+                with transaction.atomic():
+                    digest = persister(team_obj, team_data)
+            except Exception as e:
+                logger.error(f"Error storing {entity} of team {team_obj.name}: {str(e)}")
+                continue
+            if digest is not None:
+                refreshed[entity][team_obj.id] = digest
+
+    def persist_venue(self, team_obj, team_data):
+        venue_info = team_data['response'][0].get('venue') or {}
+        if venue_info.get('id') is None:
+            logger.warning(f"No venue found for team {team_obj.name}")
+            return None
+        venue_obj, created = self.write_venue(venue_info, team_obj)
+        self.record_writes(Venue, ([venue_obj.id], [], []) if created else ([], [venue_obj.id], []))
+        logger.info(f"{'Created' if created else 'Updated'} venue: {venue_obj.name} for team {team_obj.name}")
+        return content_hash(venue_info)
+
+    def write_teams(self, teams):
+        # Upserts Team objects, creating their countries if needed; returns the bulk_upsert() result
+        self.identity_map.ensure(Country, [Country(name=team.country_id) for team in teams])
+        result = self.record_writes(Team, bulk_upsert(Team, teams, TEAM_UPDATE_FIELDS))
+        self.identity_map.remember(teams)
+        return result
+
+    def log_pipeline_stats(self, pipeline, name='Team', items='teams'):
+        summary = pipeline.summary()
+        logger.info(
+            f"{name} pipeline: {summary['items']} {items} fetched, {summary['written']} written in {summary['batches']} batches. "
+            f"Queue depth max {summary['max_queue_depth']}, avg {summary['avg_queue_depth']:.1f}; "
+            f"backpressure events: {summary['backpressure_events']}"
+        )
+        logger.info(
+            f"{name} pipeline latency (p50/max): fetch {summary['fetch_p50']:.2f}s/{summary['fetch_max']:.2f}s, "
+            f"queued {summary['queue_wait_p50']:.2f}s/{summary['queue_wait_max']:.2f}s, "
+            f"write {summary['write_p50']:.2f}s/{summary['write_max']:.2f}s; writer idle {summary['writer_idle']:.2f}s"
+        )
+
+    async def _fetch_team_bundle(self, team_id, season, with_players=True):
+        team_data = await self.async_client.get_team_info(team_id)
+        if not team_data['response']:
+            return team_data, [], True
+        if not with_players:
+            return team_data, None, False
+
+        # The first page tells how many pages there are; the rest are fetched together
+        try:
+            first_page = await self.async_client.get_players(team=team_id, season=season, page=1)
+        except QuotaExceeded:
+            logger.warning(f"API quota used up before fetching players for team {team_id}")
+            return team_data, [], False
+        total_pages = min(first_page.get('paging', {}).get('total', 1), 4)  # 4 pages of players
+        other_pages = await asyncio.gather(*(
+            self.async_client.get_players(team=team_id, season=season, page=page)
+            for page in range(2, total_pages + 1)
+        ), return_exceptions=True)
+
+        players_pages = []
+        complete = True
+        for page_data in [first_page, *other_pages]:
+            if isinstance(page_data, QuotaExceeded):
+                logger.warning(f"API quota used up while fetching players for team {team_id}")
+                complete = False
+                break
+            if isinstance(page_data, Exception):
+                raise page_data
+            players_pages.append(page_data)
+        return team_data, players_pages, complete
+
+    def update_team_players(self, team_obj, players_pages):
+        # Updates player data for a specific team from the fetched player pages, in one batched upsert.
+        # Returns True if every page was written.
+        logger.info(f"Updating players for team {team_obj.name}")
+        now = timezone.now()
+        players = []
+        complete = True
+        for page, players_data in enumerate(players_pages, start=1):
+            try:
                 logger.info(f"Retrieved players for team {team_obj.name}, page {page}")
                 
                 if not players_data['response']:
                     break
                 
                 for player in players_data['response']:
-                    player_info = player['player']
-                    player_obj, created = Player.objects.update_or_create(
-                        id=player_info['id'],
-                        defaults={
-                            'name': player_info['name'],
-                            'firstname': player_info.get('firstname'),
-                            'lastname': player_info.get('lastname'),
-                            'age': player_info.get('age'),
-                            'birth_date': player_info.get('birth', {}).get('date'),
-                            'nationality': player_info.get('nationality'),
-                            'height': player_info.get('height'),
-                            'weight': player_info.get('weight'),
-                            'photo_url': player_info.get('photo'),
-                            'team': team_obj,
-                            'last_updated': timezone.now()
-                        }
-                    )
-                    if created:
-                        players_created += 1
-                    else:
-                        players_updated += 1
+                    players.append(player_from_info(player['player'], team_obj, now))
             except Exception as e:
                 logger.error(f"Error updating players for team {team_obj.name}, page {page}: {str(e)}")
+                complete = False
                 break
-        logger.info(f"Created {players_created} and updated {players_updated} players for team {team_obj.name}")
 
-    def update_venues(self):
-        # Updates venue data for the top 10 teams in each of the 5 main leagues
-        logger.info("Starting venue update for the top 10 teams in each of the 5 main leagues...")
-        venues_updated = 0
-        
-        for league_id, team_ids in self.top_leagues.items():
-            if self.api_calls >= self.max_api_calls:
-                logger.warning("Approaching API call limit. Stopping venue update.")
-                return
-            
-            logger.info(f"Updating venues for league {league_id}")
-            
-            for team_id in team_ids:
-                if self.api_calls >= self.max_api_calls:
-                    logger.warning("Approaching API call limit. Stopping venue update.")
-                    return
-
-                logger.info(f"Attempting to update venue for team {team_id}")
-                try:
-                    team_obj = Team.objects.get(id=team_id)
-                except Team.DoesNotExist:
-                    logger.warning(f"Team with id {team_id} does not exist in the database. Skipping venue update.")
-                    continue
+        try:
+            # A savepoint, so a failed write is rolled back without breaking the caller's transaction
+            with transaction.atomic():
+                created_ids, updated_ids, unchanged_ids = self.record_writes(
+                    Player, bulk_upsert(Player, players, PLAYER_UPDATE_FIELDS)
+                )
+        except Exception as e:
+            logger.error(f"Error writing players for team {team_obj.name}: {str(e)}")
+            return False
+        logger.info(
+            f"Created {len(created_ids)}, updated {len(updated_ids)} and left {len(unchanged_ids)} unchanged players "
+            f"for team {team_obj.name}"
+        )
+        return complete
 
-                try:
-                    team_data = self.client.get_team_info(team_id)
-                    self.api_calls += 1
-                    
-                    if not team_data['response']:
-                        logger.warning(f"No data found for team {team_id}")
-                        continue
-                    
-                    venue_info = team_data['response'][0]['venue']
-                    
-                    venue_obj, created = Venue.objects.update_or_create(
-                        id=venue_info['id'],
-                        defaults={
-                            'name': venue_info['name'],
-                            'address': venue_info.get('address'),
-                            'city': venue_info.get('city'),
-                            'capacity': venue_info.get('capacity'),
-                            'surface': venue_info.get('surface'),
-                            'image_url': venue_info.get('image'),
-                            'team': team_obj,
-                            'last_updated': timezone.now()
-                        }
-                    )
-                    
-                    venues_updated += 1
-                    logger.info(f"{'Created' if created else 'Updated'} venue: {venue_obj.name} for team {team_obj.name}")
-                except Exception as e:
-                    logger.error(f"Error updating venue for team {team_id}: {str(e)}")
-        
-        logger.info(f"Total venues updated: {venues_updated}")
-        if venues_updated == 0:
-            logger.warning("No venues were updated. This may indicate an issue.")
-        elif venues_updated < len(self.top_leagues) * 10:
-            logger.warning(f"Only {venues_updated} venues were updated out of {len(self.top_leagues) * 10} expected. Some updates may have failed.")
+    def write_venue(self, venue_info, team_obj):
+        # Creates or updates a team's venue; returns (venue, created)
+        venue_obj, created = Venue.objects.update_or_create(
+            id=venue_info['id'],
+            defaults={
+                'name': venue_info['name'],
+                'address': venue_info.get('address'),
+                'city': venue_info.get('city'),
+                'capacity': venue_info.get('capacity'),
+                'surface': venue_info.get('surface'),
+                'image_url': venue_info.get('image'),
+                'team': team_obj,
+                'last_updated': timezone.now()
+            }
+        )
+        self.identity_map.remember([venue_obj])
+        return venue_obj, created
 
     def clean_old_data(self):
-        # Removes data older than 7 days to keep the database clean
+        # Removes data older than 7 days to keep the database clean; returns whether it did
         logger.info("Cleaning old data...")
         try:
             seven_days_ago = timezone.now() - timezone.timedelta(days=7)
-            Team.objects.filter(last_updated__lt=seven_days_ago).delete()
-            Player.objects.filter(last_updated__lt=seven_days_ago).delete()
+            with transaction.atomic():
+                # last_seen, not last_updated: unchanged rows are not rewritten
+                Team.objects.filter(last_seen__lt=seven_days_ago).delete()
+                Player.objects.filter(last_seen__lt=seven_days_ago).delete()
+            self.identity_map.forget(Team)
+            self.identity_map.forget(TeamSeason)
             logger.info("Old data cleaned.")
+            return True
         except Exception as e:
-            logger.error(f"Error cleaning old data: {str(e)}")
\ No newline at end of file
+            logger.error(f"Error cleaning old data: {str(e)}")
+            return False
\ No newline at end of file
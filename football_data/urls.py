@@ -31,6 +31,10 @@ urlpatterns = [
     ##--------------------------------------------------------------------------##
     ##---------------------------------Search-----------------------------------##
     path('search/', views.search, name='search'),
+    
+    ##--------------------------------------------------------------------------##
+    ##---------------------------------Metrics----------------------------------##
+    path('metrics/', views.metrics, name='metrics'),
 ]
 
 # Serve static files during development
@@ -2,10 +2,11 @@ from django.shortcuts import render, get_object_or_404
 from django.templatetags.static import static
 from django.utils import timezone
 from datetime import datetime, timedelta
-from .models import League, Team, Player, Fixture, Country
+from .models import League, Team, TeamSeason, Player, Fixture, Country
 from django.db.models import Q, Prefetch
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from .telemetry import latest_reports, prometheus_text
 
 def home(request):
     """
@@ -53,7 +54,7 @@ def league_detail(request, league_id):
     Display details of a specific league.
     """
     league = get_object_or_404(League, id=league_id)
-    teams = Team.objects.filter(country=league.country)
+    teams = Team.objects.filter(id__in=TeamSeason.current_team_ids(league.id))
     context = {
         'league': league,
         'teams': teams,
@@ -67,7 +68,8 @@ def teams(request):
     search_query = request.GET.get('search', '')
     league_filter = request.GET.get('league', '')
     
-    teams = Team.objects.select_related('country').all()
+    # Each team's league comes from its prefetched memberships: one query per page, not per team
+    teams = Team.objects.select_related('country').prefetch_related(TeamSeason.prefetch())
     leagues = League.objects.all()
 
     # Apply filters if provided
@@ -75,7 +77,7 @@ def teams(request):
         teams = teams.filter(name__icontains=search_query)
     
     if league_filter:
-        teams = teams.filter(country__league__id=league_filter)
+        teams = teams.filter(id__in=TeamSeason.current_team_ids(league_filter))
 
     # Set up pagination
     paginator = Paginator(teams, 12)  
@@ -88,7 +90,7 @@ def teams(request):
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         team_data = []
         for team in page_obj:
-            league = League.objects.filter(country=team.country).first()
+            league = team.current_league()
             team_data.append({
                 'id': team.id,
                 'name': team.name,
@@ -111,14 +113,11 @@ def team_detail(request, team_id):
     """
     Display details of a specific team.
     """
-    team = get_object_or_404(Team.objects.select_related('country', 'venue'), id=team_id)
+    team = get_object_or_404(
+        Team.objects.select_related('country', 'venue').prefetch_related(TeamSeason.prefetch()), id=team_id
+    )
     players = Player.objects.filter(team=team)
-    
-    # Try to get the league of the team
-    try:
-        league = League.objects.get(country=team.country)
-    except League.DoesNotExist:
-        league = None
+    league = team.current_league()
 
     context = {
         'team': team,
@@ -135,7 +134,7 @@ def players(request):
     league_filter = request.GET.get('league', '')
     team_filter = request.GET.get('team', '')
     
-    players = Player.objects.all()
+    players = Player.objects.select_related('team')
     leagues = League.objects.all()
     teams = Team.objects.all()
 
@@ -144,9 +143,9 @@ def players(request):
         players = players.filter(name__icontains=search_query)
     
     if league_filter:
-        teams_in_league = Team.objects.filter(country__league__id=league_filter)
+        teams_in_league = TeamSeason.current_team_ids(league_filter)
         players = players.filter(team__in=teams_in_league)
-        teams = teams.filter(country__league__id=league_filter)
+        teams = teams.filter(id__in=teams_in_league)
     
     if team_filter:
         players = players.filter(team__id=team_filter)
@@ -200,7 +199,8 @@ def fixtures(request):
         except ValueError:
             selected_date = timezone.now().date()
 
-    fixtures = Fixture.objects.filter(date__date=selected_date)
+    # match_date is indexed; date__date would convert the date of every row
+    fixtures = Fixture.objects.filter(match_date=selected_date)
     if selected_league:
         fixtures = fixtures.filter(league__id=selected_league)
 
@@ -249,4 +249,10 @@ def search(request):
         'teams': teams,
         'players': players,
     }
-    return render(request, 'football_data/search.html', context)
\ No newline at end of file
+    return render(request, 'football_data/search.html', context)
+
+def metrics(request):
+    """
+    Expose the latest update run reports in the Prometheus text format.
+    """
+    return HttpResponse(prometheus_text(latest_reports()), content_type='text/plain; version=0.0.4; charset=utf-8')
\ No newline at end of file